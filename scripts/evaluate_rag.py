@@ -6,7 +6,8 @@ from pathlib import Path
 from ragas import evaluate
 from ragas.metrics import answer_relevancy, faithfulness, context_precision, context_recall
 
-from src.rag.chain import answer_question
+from src.eval.llm_cache import DiskCachedLLM
+from src.rag.chain import answer_questions, get_shared_components
 
 
 DATASET_PATH = Path("data/eval/eval_set.jsonl")
@@ -30,12 +31,15 @@ def main():
 
     dataset = {"question": [], "answer": [], "contexts": [], "ground_truth": []}
 
-    for r in rows:
+    # appels LLM en parallèle (8 au plus), réponses déjà générées relues depuis data/eval/llm_cache
+    llm = DiskCachedLLM(get_shared_components()[3])
+    rag_results = answer_questions([r["question"] for r in rows], llm_override=llm, max_workers=8)
+    print(f"LLM cache: {llm.stats()}")
+
+    for r, rag_res in zip(rows, rag_results):
         q = r["question"]
         gt = r["reference_answer"]
 
-        rag_res = answer_question(q)  # RAGResult(answer, sources)
-
         contexts = []
         for s in rag_res.sources:
             excerpt = (s.get("excerpt") or "").strip()
@@ -0,0 +1,360 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from src.rag.fakes import HashingEmbeddings
+
+
+# Benchmark de bout en bout de /ask: index synthétique, LLM factice à latence fixe,
+# plusieurs niveaux de concurrence. Le rapport JSON sert à comparer deux commits:
+#   python -m src.api.benchmark_load --events 20000 --concurrency 1 8 32 64
+#   python -m src.api.benchmark_load --compare data/bench/load_report_old.json
+
+OUT_PATH = Path("data/bench/load_report.json")
+EMBED_DIM = 384  # comme le modèle MiniLM servi, pour un index de taille réaliste
+
+CITIES = ["Orsay", "Gif-sur-Yvette", "Paris", "Sceaux", "Évry", "Lyon"]
+TOPICS = [
+    "conférence", "exposition", "atelier", "concert", "projection", "visite", "débat", "festival",
+    "climat", "astronomie", "robotique", "musique", "peinture", "santé", "numérique", "jeunesse",
+    "théâtre", "biodiversité", "histoire", "photographie", "cinéma", "danse", "sciences", "lecture",
+]
+
+
+@dataclass
+class FakeMessage:
+    content: str
+
+
+class FakeLLM:
+    """LLM factice: répond après latency_s secondes (ainvoke, invoke et astream en tokens_per_answer morceaux)."""
+
+    def __init__(self, latency_s: float = 0.5, tokens_per_answer: int = 20):
+        self.latency_s = latency_s
+        self.tokens_per_answer = tokens_per_answer
+        self.calls = 0
+
+    def _answer(self) -> str:
+        self.calls += 1
+        return "Réponse de benchmark. " * 3
+
+    def invoke(self, messages):
+        time.sleep(self.latency_s)
+        return FakeMessage(self._answer())
+
+    async def ainvoke(self, messages):
+        await asyncio.sleep(self.latency_s)
+        return FakeMessage(self._answer())
+
+    async def astream(self, messages):
+        n = max(1, self.tokens_per_answer)
+        text = self._answer()
+        step = max(1, len(text) // n)
+        for i in range(0, len(text), step):
+            await asyncio.sleep(self.latency_s / n)
+            yield FakeMessage(text[i:i + step])
+
+
+def synthetic_events(n: int, seed: int = 0) -> List[tuple]:
+    """(texte, métadonnées) d'événements factices, dates à venir et villes variées."""
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc)
+    events = []
+    for i in range(n):
+        words = rng.sample(TOPICS, 4)
+        begin = now + timedelta(days=rng.randint(-30, 180), hours=rng.randint(0, 23))
+        md = {
+            "uid": f"bench-{i}",
+            "title": f"{words[0].capitalize()} {words[1]} #{i}",
+            "location_city": rng.choice(CITIES),
+            "first_begin_dt": begin.strftime("%Y-%m-%dT%H:%M:%S.000Z"),
+            "first_begin_ts": int(begin.timestamp()),
+        }
+        text = f"Titre: {md['title']}\nDescription: {' '.join(words)} à {md['location_city']}."
+        events.append((text, md))
+    return events
+
+
+def synthetic_questions(n: int, seed: int = 1) -> List[str]:
+    rng = random.Random(seed)
+    return [f"Un {' '.join(rng.sample(TOPICS, 2))} à {rng.choice(CITIES)} ? ({i})" for i in range(n)]
+
+
+def build_synthetic_components(n_events: int, llm, index_kind: str = "flat", embeddings: Optional[Embeddings] = None):
+    """Composants partagés (format de src.rag.chain._SHARED_CACHE) sur un index synthétique."""
+    from langchain_community.vectorstores import FAISS
+    from langchain_core.prompts import ChatPromptTemplate
+
+    from src.indexing.index_factory import IndexConfig, compress_index
+    from src.indexing.metadata_index import build_metadata_index
+    from src.rag.prompt import HUMAN_PROMPT, SYSTEM_PROMPT
+
+    events = synthetic_events(n_events)
+    vs = FAISS.from_texts(
+        [t for t, _ in events],
+        embeddings or HashingEmbeddings(EMBED_DIM),
+        metadatas=[md for _, md in events],
+        ids=[md["uid"] for _, md in events],
+    )
+    vs.index = compress_index(vs.index, IndexConfig(index_kind))
+    prompt = ChatPromptTemplate.from_messages([("system", SYSTEM_PROMPT.strip()), ("human", HUMAN_PROMPT.strip())])
+    return (vs, build_metadata_index(vs), prompt, llm, f"bench-{n_events}")
+
+
+def percentiles_ms(latencies_s: Sequence[float]) -> Dict[str, Optional[float]]:
+    if not latencies_s:
+        return {"p50": None, "p95": None, "p99": None, "mean": None, "max": None}
+    ms = np.asarray(latencies_s) * 1000
+    return {
+        "p50": round(float(np.percentile(ms, 50)), 2),
+        "p95": round(float(np.percentile(ms, 95)), 2),
+        "p99": round(float(np.percentile(ms, 99)), 2),
+        "mean": round(float(ms.mean()), 2),
+        "max": round(float(ms.max()), 2),
+    }
+
+
+@dataclass
+class LevelResult:
+    concurrency: int
+    requests: int
+    duration_s: float
+    throughput_rps: float
+    latency_ms: Dict[str, Optional[float]]
+    status_counts: Dict[str, int] = field(default_factory=dict)
+    errors: int = 0
+    rss_mb: Optional[float] = None
+
+
+async def run_level(client, endpoint: str, questions: Sequence[str], concurrency: int) -> LevelResult:
+    """Charge en boucle fermée: concurrency clients envoient chacun leur requête suivante dès la réponse reçue."""
+    from src.indexing.embedding_pipeline import process_memory_mb
+
+    pending = list(questions)
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    errors = 0
+
+    async def worker():
+        nonlocal errors
+        while pending:
+            question = pending.pop()
+            start = time.perf_counter()
+            try:
+                response = await client.post(endpoint, json={"question": question, "allowed_cities": CITIES[:5]})
+                await response.aread()
+                status = str(response.status_code)
+            except Exception as e:
+                status = type(e).__name__
+            elapsed = time.perf_counter() - start
+            statuses[status] = statuses.get(status, 0) + 1
+            if status == "200":
+                latencies.append(elapsed)
+            else:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    duration = time.perf_counter() - start
+    return LevelResult(
+        concurrency=concurrency,
+        requests=len(questions),
+        duration_s=round(duration, 3),
+        throughput_rps=round(len(latencies) / duration, 2) if duration else 0.0,
+        latency_ms=percentiles_ms(latencies),
+        status_counts=statuses,
+        errors=errors,
+        rss_mb=process_memory_mb()["rss"],
+    )
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class _UvicornThread:
+    """Serveur uvicorn local dans un thread du process (mêmes composants injectés que le mode in-process)."""
+
+    def __init__(self, app):
+        import uvicorn
+
+        self.port = _free_port()
+        self.server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=self.port, log_level="warning"))
+        self.thread = threading.Thread(target=self.server.run, name="bench-uvicorn", daemon=True)
+
+    def __enter__(self) -> str:
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.01)
+        return f"http://127.0.0.1:{self.port}"
+
+    def __exit__(self, *exc) -> None:
+        self.server.should_exit = True
+        self.thread.join(timeout=10)
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return out.stdout.strip() or None
+
+
+def run_benchmark(
+    n_events: int = 5000,
+    concurrency_levels: Sequence[int] = (1, 8, 32, 64),
+    requests_per_level: int = 200,
+    llm_latency_s: float = 0.5,
+    mode: str = "inprocess",
+    endpoint: str = "/ask",
+    index_kind: str = "flat",
+) -> Dict[str, Any]:
+    """
+    Lance le benchmark et renvoie le rapport. Les composants partagés, le cache de réponses
+    et le limiteur de l'API sont remplacés le temps du run (warm-up désactivé), puis restaurés.
+    """
+    import httpx
+
+    import src.api.main as api
+    import src.rag.chain as chain
+    from src.api.limiter import ConcurrencyLimiter
+    from src.api.warmup import Warmup
+    from src.indexing.embedding_pipeline import process_memory_mb
+    from src.rag.answer_cache import SemanticAnswerCache
+
+    rss_start = process_memory_mb()["rss"]
+    llm = FakeLLM(latency_s=llm_latency_s)
+    t0 = time.perf_counter()
+    components = build_synthetic_components(n_events, llm, index_kind=index_kind)
+    build_s = time.perf_counter() - t0
+    rss_built = process_memory_mb()["rss"]
+
+    saved = (chain._SHARED_CACHE, chain.ANSWER_CACHE, api.LIMITER, api.WARMUP)
+    saved_warmup = os.environ.get("RAG_WARMUP")
+    # mode uvicorn: le lifespan ne lance pas le warm-up (il chargerait le vrai modèle d'embeddings)
+    os.environ["RAG_WARMUP"] = "0"
+    api.WARMUP = Warmup()
+    chain._SHARED_CACHE = components
+    chain.ANSWER_CACHE = SemanticAnswerCache(max_entries=0)  # chaque requête fait tout le trajet
+    # pas de 429: on mesure la latence, pas la contre-pression
+    api.LIMITER = ConcurrencyLimiter(max_concurrency=max(concurrency_levels), max_queue=max(concurrency_levels))
+
+    async def drive(base_url: str, transport=None) -> List[LevelResult]:
+        limits = httpx.Limits(max_connections=max(concurrency_levels))
+        async with httpx.AsyncClient(base_url=base_url, transport=transport, limits=limits, timeout=120) as client:
+            # chauffe: premier passage dans les imports paresseux et le code FAISS
+            await client.post(endpoint, json={"question": "conférence à venir"})
+            results = []
+            for level in concurrency_levels:
+                questions = synthetic_questions(requests_per_level, seed=level)
+                results.append(await run_level(client, endpoint, questions, level))
+            return results
+
+    try:
+        if mode == "uvicorn":
+            with _UvicornThread(api.app) as base_url:
+                levels = asyncio.run(drive(base_url))
+        else:
+            levels = asyncio.run(drive("http://bench", transport=httpx.ASGITransport(app=api.app)))
+    finally:
+        chain._SHARED_CACHE, chain.ANSWER_CACHE, api.LIMITER, api.WARMUP = saved
+        if saved_warmup is None:
+            os.environ.pop("RAG_WARMUP", None)
+        else:
+            os.environ["RAG_WARMUP"] = saved_warmup
+
+    return {
+        "commit": _git_commit(),
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "params": {
+            "events": n_events,
+            "index": index_kind,
+            "mode": mode,
+            "endpoint": endpoint,
+            "llm_latency_s": llm_latency_s,
+            "requests_per_level": requests_per_level,
+        },
+        "index_build_s": round(build_s, 3),
+        "rss_mb": {"start": rss_start, "after_build": rss_built, "end": process_memory_mb()["rss"]},
+        "llm_calls": llm.calls,
+        "levels": [asdict(r) for r in levels],
+    }
+
+
+def compare_reports(old: Dict[str, Any], new: Dict[str, Any]) -> List[str]:
+    """Écarts p95 et débit par niveau de concurrence (new - old, en %)."""
+    def pct(a, b):
+        return f"{(b - a) / a * 100:+.1f}%" if a and b is not None else "n/a"
+
+    old_levels = {r["concurrency"]: r for r in old.get("levels", [])}
+    lines = [f"{old.get('commit')} -> {new.get('commit')}"]
+    for r in new.get("levels", []):
+        before = old_levels.get(r["concurrency"])
+        if before is None:
+            continue
+        lines.append(
+            f"c={r['concurrency']:<4} p95 {before['latency_ms']['p95']} -> {r['latency_ms']['p95']} ms "
+            f"({pct(before['latency_ms']['p95'], r['latency_ms']['p95'])}), "
+            f"rps {before['throughput_rps']} -> {r['throughput_rps']} ({pct(before['throughput_rps'], r['throughput_rps'])})"
+        )
+    return lines
+
+
+def main(argv: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+    parser = argparse.ArgumentParser(description="Benchmark de charge de /ask (LLM factice).")
+    parser.add_argument("--events", type=int, default=5000, help="taille de l'index synthétique")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32, 64])
+    parser.add_argument("--requests", type=int, default=200, help="requêtes par niveau de concurrence")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="latence du LLM factice (s)")
+    parser.add_argument("--mode", choices=["inprocess", "uvicorn"], default="inprocess")
+    parser.add_argument("--endpoint", choices=["/ask", "/ask/stream"], default="/ask")
+    parser.add_argument("--index", default="flat", help="type d'index FAISS (flat, hnsw, ivfpq, sq8)")
+    parser.add_argument("--out", type=Path, default=OUT_PATH)
+    parser.add_argument("--compare", type=Path, help="rapport précédent à comparer")
+    args = parser.parse_args(argv)
+
+    report = run_benchmark(
+        n_events=args.events,
+        concurrency_levels=args.concurrency,
+        requests_per_level=args.requests,
+        llm_latency_s=args.llm_latency,
+        mode=args.mode,
+        endpoint=args.endpoint,
+        index_kind=args.index,
+    )
+
+    args.out.parent.mkdir(parents=True, exist_ok=True)
+    args.out.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    for r in report["levels"]:
+        lat = r["latency_ms"]
+        print(
+            f"c={r['concurrency']:<4} {r['throughput_rps']:>8.1f} req/s  "
+            f"p50={lat['p50']}ms p95={lat['p95']}ms p99={lat['p99']}ms  errors={r['errors']}  rss={r['rss_mb']}MB"
+        )
+    if args.compare and args.compare.exists():
+        print("\n".join(compare_reports(json.loads(args.compare.read_text(encoding="utf-8")), report)))
+    print(f"Saved: {args.out}")
+    return report
+
+
+if __name__ == "__main__":
+    main()
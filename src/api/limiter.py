@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+
+
+class LimiterFull(Exception):
+    """File d'attente pleine: la requête doit être refusée (HTTP 429)."""
+
+
+class ConcurrencyLimiter:
+    """
+    Limite le nombre de générations en cours (sémaphore) et la profondeur de la file
+    d'attente. Au-delà de max_concurrency + max_queue requêtes, slot() lève LimiterFull.
+    Utilisé depuis une seule boucle asyncio: les compteurs n'ont pas besoin de verrou.
+    """
+
+    def __init__(self, max_concurrency: int, max_queue: int):
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency doit être >= 1")
+        self.max_concurrency = max_concurrency
+        self.max_queue = max(0, max_queue)
+        self.in_flight = 0
+        self.waiting = 0
+        self.rejected = 0
+        self._sem: Optional[asyncio.Semaphore] = None
+        self._batch_lock: Optional[asyncio.Lock] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        # un sémaphore asyncio est lié à sa boucle (ex: plusieurs TestClient)
+        loop = asyncio.get_running_loop()
+        if self._sem is None or self._loop is not loop:
+            self._sem = asyncio.Semaphore(self.max_concurrency)
+            self._batch_lock = asyncio.Lock()
+            self._loop = loop
+        return self._sem
+
+    async def _acquire(self, sem: asyncio.Semaphore, weight: int) -> None:
+        if weight == 1:
+            await sem.acquire()
+            return
+        # une seule acquisition multiple à la fois: deux batchs ne peuvent pas se bloquer
+        # mutuellement en détenant chacun une partie des places
+        acquired = 0
+        try:
+            async with self._batch_lock:
+                for _ in range(weight):
+                    await sem.acquire()
+                    acquired += 1
+        except BaseException:
+            for _ in range(acquired):
+                sem.release()
+            raise
+
+    def full(self) -> bool:
+        """Une nouvelle requête serait refusée (toutes les places et la file sont prises)."""
+        return self.in_flight >= self.max_concurrency and self.waiting >= self.max_queue
+
+    def try_reject(self) -> bool:
+        """True (et refus compté) si la file est pleine: la requête doit être refusée."""
+        if not self.full():
+            return False
+        self.rejected += 1
+        return True
+
+    @asynccontextmanager
+    async def slot(self, weight: int = 1):
+        """weight: générations couvertes par la requête (un batch de N questions en occupe N, au plus max_concurrency)."""
+        weight = max(1, min(weight, self.max_concurrency))
+        sem = self._semaphore()
+        if self.try_reject():
+            raise LimiterFull()
+
+        self.waiting += 1
+        try:
+            await self._acquire(sem, weight)
+        finally:
+            self.waiting -= 1
+
+        self.in_flight += weight
+        try:
+            yield
+        finally:
+            self.in_flight -= weight
+            for _ in range(weight):
+                sem.release()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "rejected": self.rejected,
+        }
+
+
+def limiter_from_env() -> ConcurrencyLimiter:
+    return ConcurrencyLimiter(
+        max_concurrency=int(os.getenv("RAG_MAX_CONCURRENCY", "64")),
+        max_queue=int(os.getenv("RAG_MAX_QUEUE", "256")),
+    )
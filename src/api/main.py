@@ -1,22 +1,90 @@
 from __future__ import annotations
 
+import asyncio
+import importlib
+import json
+import time
+from contextlib import asynccontextmanager
 from dataclasses import asdict, is_dataclass
+from functools import partial
 from typing import Any, Dict, Optional, List, Set
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel, Field
 
-from src.rag.chain import answer_question, DEFAULT_ALLOWED_CITIES, RAGResult
-from src.rag.index import rebuild_vectorstore, RebuildResult
+from src.api.limiter import LimiterFull, limiter_from_env
+from src.api.warmup import Warmup, warmup_enabled_from_env
+from src.rag.cities import DEFAULT_ALLOWED_CITIES
+from src.rag.metrics import (
+    REGISTRY,
+    REQUEST_SECONDS,
+    REQUESTS_TOTAL,
+    run_with_context,
+    server_timing_header,
+    span,
+    start_request_timings,
+    timing_header_from_env,
+)
+
+# src.rag.* (langchain, FAISS, pandas, modèles) est importé dans les routes, pas ici
+# (sauf src.rag.metrics et src.rag.cities, sans dépendance):
+# l'import du module reste rapide, le chargement se fait dans le warm-up de fond.
+
+
+MAX_BATCH_QUESTIONS = 32
+
+# générations simultanées + file d'attente (RAG_MAX_CONCURRENCY / RAG_MAX_QUEUE)
+LIMITER = limiter_from_env()
+
+
+# préchargement des composants (index, embedder, client LLM), suivi par /ready
+WARMUP = Warmup()
+
+# en-tête Server-Timing (durée de chaque étape) sur les réponses (RAG_TIMING_HEADER)
+TIMING_HEADER = timing_header_from_env()
+
+REGISTRY.gauge("rag_limiter_in_flight", "Générations en cours.", lambda: LIMITER.in_flight)
+REGISTRY.gauge("rag_limiter_waiting", "Requêtes en attente d'une place de génération.", lambda: LIMITER.waiting)
+REGISTRY.gauge("rag_ready", "1 une fois le warm-up terminé.", lambda: int(WARMUP.ready))
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if warmup_enabled_from_env():
+        WARMUP.start()  # thread de fond: le serveur accepte les requêtes immédiatement
+    else:
+        WARMUP.skip()  # sinon /ready resterait à 503 (étapes "pending") pour toute la vie du process
+    yield
 
 
 app = FastAPI(
     title="RAG API",
     description="API REST locale pour interroger un système RAG (RAG + base vectorielle FAISS).",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 
+@app.middleware("http")
+async def record_timings(request: Request, call_next):
+    # durées d'étapes de cette requête (contextvar, partagée avec les threads de l'executor)
+    timings = start_request_timings()
+    start = time.perf_counter()
+    response = await call_next(request)
+    elapsed = time.perf_counter() - start
+
+    # gabarit de route (/ask, ...) plutôt que le chemin brut: cardinalité bornée
+    route = getattr(request.scope.get("route"), "path", "unmatched")
+    REQUEST_SECONDS.observe(elapsed, route=route)
+    REQUESTS_TOTAL.inc(route=route, status=response.status_code)
+
+    # en streaming les en-têtes partent avant la génération: pas de Server-Timing
+    if TIMING_HEADER and not isinstance(response, StreamingResponse) and response.media_type != "text/event-stream":
+        response.headers["Server-Timing"] = server_timing_header({**timings, "total": elapsed})
+    return response
+
+
 # ---------
 # Schemas
 # ---------
@@ -34,6 +102,19 @@ class AskResponse(BaseModel):
     sources: List[Dict[str, Any]] = Field(default_factory=list)
 
 
+class AskBatchRequest(BaseModel):
+    questions: List[str] = Field(..., min_length=1, max_length=MAX_BATCH_QUESTIONS)
+    allowed_cities: Optional[List[str]] = None
+    future_only: bool = Field(
+        default=True,
+        description="Si true, ne renvoie que les événements à venir (par rapport à maintenant).",
+    )
+
+
+class AskBatchResponse(BaseModel):
+    results: List[AskResponse] = Field(default_factory=list)
+
+
 class RebuildResponse(BaseModel):
     status: str
     message: str
@@ -52,6 +133,32 @@ def _dataclass_to_dict(obj: Any) -> Dict[str, Any]:
     raise TypeError("Object is not a dataclass or dict")
 
 
+def _validate_allowed_cities(raw: Optional[List[str]]) -> Optional[Set[str]]:
+    # Validation allowed_cities si fourni
+    if raw is None:
+        return None
+
+    # on clean et on garde les non-vides
+    cities = {c.strip() for c in raw if c and c.strip()}
+    if not cities:
+        raise HTTPException(status_code=400, detail="allowed_cities fourni mais vide après nettoyage")
+
+    # Optionnel mais utile: vérifier que les villes sont dans la whitelist
+    unknown = sorted(cities - DEFAULT_ALLOWED_CITIES)
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Villes non autorisées: {unknown}. Autorisées: {sorted(DEFAULT_ALLOWED_CITIES)}",
+        )
+    return cities
+
+
+async def _import_chain():
+    # premier import de src.rag.chain (plusieurs secondes, ou attente du warm-up qui le tient):
+    # dans l'executor, pour ne pas bloquer la boucle (/ et /ready restent servis)
+    return await asyncio.get_running_loop().run_in_executor(None, importlib.import_module, "src.rag.chain")
+
+
 # ---------
 # Routes
 # ---------
@@ -60,34 +167,37 @@ def health() -> Dict[str, str]:
     return {"status": "ok", "message": "RAG API is running"}
 
 
+@app.get("/ready")
+def ready() -> Any:
+    # 200 une fois index, embedder et client LLM chargés; 503 pendant le warm-up ou après un échec
+    snapshot = WARMUP.snapshot()
+    return snapshot if snapshot["ready"] else JSONResponse(status_code=503, content=snapshot)
+
+
 @app.post("/ask", response_model=AskResponse)
-def ask(payload: AskRequest) -> Dict[str, Any]:
+async def ask(payload: AskRequest) -> Dict[str, Any]:
     question = payload.question.strip()
     if not question:
         raise HTTPException(status_code=400, detail="Question vide")
 
-    # Validation allowed_cities si fourni
-    allowed_cities: Optional[Set[str]] = None
-    if payload.allowed_cities is not None:
-        # on clean et on garde les non-vides
-        cities = {c.strip() for c in payload.allowed_cities if c and c.strip()}
-        if not cities:
-            raise HTTPException(status_code=400, detail="allowed_cities fourni mais vide après nettoyage")
-
-        # Optionnel mais utile: vérifier que les villes sont dans la whitelist
-        unknown = sorted(cities - DEFAULT_ALLOWED_CITIES)
-        if unknown:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Villes non autorisées: {unknown}. Autorisées: {sorted(DEFAULT_ALLOWED_CITIES)}",
-            )
-        allowed_cities = cities
+    allowed_cities = _validate_allowed_cities(payload.allowed_cities)
+    chain = await _import_chain()
 
     try:
-        res: RAGResult = answer_question(question, allowed_cities=allowed_cities, future_only=payload.future_only)
+        async with LIMITER.slot():
+            res = await chain.answer_question_async(
+                question, allowed_cities=allowed_cities, future_only=payload.future_only
+            )
         # RAGResult est un dataclass -> asdict
-        data = _dataclass_to_dict(res)
-        return {"answer": data.get("answer", ""), "sources": data.get("sources", [])}
+        with span("serialize"):
+            data = _dataclass_to_dict(res)
+            return {"answer": data.get("answer", ""), "sources": data.get("sources", [])}
+    except LimiterFull:
+        raise HTTPException(
+            status_code=429,
+            detail="Trop de requêtes en cours, réessayez dans un instant",
+            headers={"Retry-After": "1"},
+        )
     except HTTPException:
         raise
     except Exception:
@@ -95,10 +205,123 @@ def ask(payload: AskRequest) -> Dict[str, Any]:
         raise HTTPException(status_code=500, detail="Erreur interne lors de la génération")
 
 
+def _sse(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@app.post("/ask/stream")
+async def ask_stream(payload: AskRequest) -> StreamingResponse:
+    """
+    Réponse en Server-Sent Events: `sources` dès la fin de la recherche, puis `token`
+    au fil de la génération, `trailer` (bloc Sources) et `done` (réponse complète).
+    """
+    question = payload.question.strip()
+    if not question:
+        raise HTTPException(status_code=400, detail="Question vide")
+
+    allowed_cities = _validate_allowed_cities(payload.allowed_cities)
+    chain = await _import_chain()
+
+    # refus avant l'ouverture du flux, pour pouvoir encore répondre 429
+    if LIMITER.try_reject():
+        raise HTTPException(
+            status_code=429,
+            detail="Trop de requêtes en cours, réessayez dans un instant",
+            headers={"Retry-After": "1"},
+        )
+
+    async def events():
+        try:
+            async with LIMITER.slot():
+                async for event, data in chain.answer_question_stream(
+                    question, allowed_cities=allowed_cities, future_only=payload.future_only
+                ):
+                    yield _sse(event, data)
+        except LimiterFull:
+            yield _sse("error", {"detail": "Trop de requêtes en cours, réessayez dans un instant"})
+        except Exception:
+            # en-têtes déjà envoyés: l'erreur est signalée dans le flux
+            yield _sse("error", {"detail": "Erreur interne lors de la génération"})
+
+    # X-Accel-Buffering: pas de mise en tampon par un proxy nginx
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/ask/queue")
+def ask_queue() -> Dict[str, int]:
+    return LIMITER.stats()
+
+
+@app.get("/cache/stats")
+def cache_stats() -> Dict[str, Any]:
+    from src.rag.chain import ANSWER_CACHE
+
+    return ANSWER_CACHE.stats()
+
+
+@app.get("/retrieval/stats")
+def retrieval_stats() -> Dict[str, Any]:
+    from src.rag.retrieval_scored import RETRIEVAL_STATS
+
+    return RETRIEVAL_STATS.snapshot()
+
+
+@app.get("/index/stats")
+def index_stats() -> Dict[str, Any]:
+    # chargement de l'index servi par ce worker (durée, mmap, écart de mémoire)
+    from src.indexing.faiss_store import load_stats
+
+    return {"load": load_stats()}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics() -> PlainTextResponse:
+    # format texte Prometheus: durées par étape, compteurs du retriever, requêtes HTTP
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.post("/ask/batch", response_model=AskBatchResponse)
+async def ask_batch(payload: AskBatchRequest) -> Dict[str, Any]:
+    questions = [q.strip() for q in payload.questions]
+    if any(not q for q in questions):
+        raise HTTPException(status_code=400, detail="Question vide dans le batch")
+
+    allowed_cities = _validate_allowed_cities(payload.allowed_cities)
+    chain = await _import_chain()
+    answer = partial(chain.answer_questions, questions, allowed_cities=allowed_cities, future_only=payload.future_only)
+
+    try:
+        # un batch compte pour autant de générations que de questions (plafond et 429 comme /ask)
+        async with LIMITER.slot(weight=len(questions)):
+            results = await asyncio.get_running_loop().run_in_executor(None, run_with_context(answer))
+        out = []
+        with span("serialize"):
+            for res in results:
+                data = _dataclass_to_dict(res)
+                out.append({"answer": data.get("answer", ""), "sources": data.get("sources", [])})
+        return {"results": out}
+    except LimiterFull:
+        raise HTTPException(
+            status_code=429,
+            detail="Trop de requêtes en cours, réessayez dans un instant",
+            headers={"Retry-After": "1"},
+        )
+    except HTTPException:
+        raise
+    except Exception:
+        raise HTTPException(status_code=500, detail="Erreur interne lors de la génération")
+
+
 @app.post("/rebuild", response_model=RebuildResponse)
-def rebuild() -> Dict[str, Any]:
+def rebuild(full: bool = False) -> Dict[str, Any]:
+    from src.rag.index import rebuild_vectorstore
+
     try:
-        res: RebuildResult = rebuild_vectorstore()
+        res = rebuild_vectorstore(full=full)
         data = _dataclass_to_dict(res)
         return data
     except Exception:
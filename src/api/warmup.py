@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+import importlib
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Dict, Optional
+
+
+# question de chauffe: un embedding + une recherche FAISS, sans appel au LLM
+WARMUP_QUESTION = "conférence à venir"
+
+# étapes, dans l'ordre d'exécution
+STEPS = ("imports", "embedder", "index", "llm", "warmup_query")
+
+
+def warmup_enabled_from_env() -> bool:
+    """RAG_WARMUP (défaut 1): préchargement en tâche de fond au démarrage de l'API."""
+    return os.getenv("RAG_WARMUP", "1").strip().lower() not in {"0", "false", "no"}
+
+
+@dataclass
+class StepStatus:
+    status: str = "pending"  # pending | running | ready | failed | skipped
+    duration_s: Optional[float] = None
+    error: Optional[str] = None
+
+
+class Warmup:
+    """
+    Préchargement des composants du RAG dans un thread, hors du chemin des requêtes:
+    imports lourds, modèle d'embeddings, index, client LLM, puis une requête de chauffe.
+    Une requête qui arrive avant la fin attend simplement le chargement en cours.
+    """
+
+    def __init__(self):
+        self.steps: Dict[str, StepStatus] = {name: StepStatus() for name in STEPS}
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def start(self) -> threading.Thread:
+        with self._lock:
+            if self._thread is None:
+                self.started_at = time.time()
+                self._thread = threading.Thread(target=self.run, name="rag-warmup", daemon=True)
+                self._thread.start()
+            return self._thread
+
+    def skip(self) -> None:
+        """Warm-up désactivé (RAG_WARMUP=0): chargement à la première requête, l'API est prête d'emblée."""
+        with self._lock:
+            if self._thread is None:
+                self.steps = {name: StepStatus(status="skipped") for name in STEPS}
+
+    def _set(self, name: str, status: str, duration_s: Optional[float] = None, error: Optional[str] = None) -> None:
+        with self._lock:
+            self.steps[name] = StepStatus(
+                status=status,
+                duration_s=round(duration_s, 4) if duration_s is not None else None,
+                error=error,
+            )
+
+    def _step(self, name: str, fn: Callable[[], Any]) -> bool:
+        self._set(name, "running")
+        start = time.perf_counter()
+        try:
+            fn()
+        except Exception as e:
+            self._set(name, "failed", time.perf_counter() - start, f"{type(e).__name__}: {e}"[:300])
+            return False
+        self._set(name, "ready", time.perf_counter() - start)
+        return True
+
+    def _load_embedder(self) -> None:
+        # même verrou que get_shared_components: une requête arrivée pendant cette étape
+        # attend le modèle en cours de chargement au lieu d'en construire un second
+        from src.indexing.faiss_store import get_query_embeddings
+
+        chain = importlib.import_module("src.rag.chain")
+        with chain._LOAD_LOCK:
+            embeddings = get_query_embeddings()
+        embeddings.embed_query(WARMUP_QUESTION)
+
+    def _warmup_query(self) -> None:
+        # embedding + recherche FAISS + lecture du docstore, sans passer par le retriever:
+        # la question de chauffe ne compte pas dans RETRIEVAL_STATS ni dans /metrics
+        import numpy as np
+
+        chain = importlib.import_module("src.rag.chain")
+        vs = chain.get_shared_components()[0]
+        vector = np.asarray([vs.embedding_function.embed_query(WARMUP_QUESTION)], dtype=np.float32)
+        _, indices = vs.index.search(vector, 5)
+        for i in indices[0]:
+            if i != -1:
+                vs.docstore.search(vs.index_to_docstore_id[int(i)])
+
+    def _load_components(self) -> bool:
+        # index et client LLM sont créés ensemble par get_shared_components: durées mesurées à l'intérieur
+        chain = importlib.import_module("src.rag.chain")
+        self._set("index", "running")
+        timings: Dict[str, float] = {}
+        try:
+            chain.get_shared_components(timings=timings)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"[:300]
+            if "index" in timings:
+                self._set("index", "ready", timings["index"])
+                self._set("llm", "failed", error=error)
+            else:
+                self._set("index", "failed", error=error)
+            return False
+        # déjà chargés par une requête: rien n'a été exécuté ici
+        self._set("index", "ready", timings.get("index", 0.0))
+        self._set("llm", "ready", timings.get("llm", 0.0))
+        return True
+
+    def run(self) -> None:
+        try:
+            if not self._step("imports", lambda: [importlib.import_module(m) for m in ("src.rag.chain", "src.rag.index")]):
+                return
+            if not self._step("embedder", self._load_embedder):
+                return
+            if not self._load_components():
+                return
+            self._step("warmup_query", self._warmup_query)
+        finally:
+            self.finished_at = time.time()
+
+    @property
+    def ready(self) -> bool:
+        return all(step.status in ("ready", "skipped") for step in self.steps.values())
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            steps = {name: asdict(step) for name, step in self.steps.items()}
+        total = None
+        if self.started_at is not None and self.finished_at is not None:
+            total = round(self.finished_at - self.started_at, 4)
+        return {"ready": self.ready, "started": self.started_at is not None, "total_s": total, "steps": steps}
@@ -1,16 +1,22 @@
 from __future__ import annotations
 
+import argparse
+import itertools
 import json
+import time
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, List, Set, Any
+from typing import Dict, List, Optional, Sequence, Set, Any, Tuple
 
-from src.rag.chain import answer_question
+from src.eval.llm_cache import DEFAULT_CACHE_DIR, DiskCachedLLM
 
 GOLD_PATH = Path("data/eval/qa_gold.jsonl")
 OUT_DIR = Path("data/eval")
 OUT_DIR.mkdir(parents=True, exist_ok=True)
 
+# paramètres du retriever balayables en mode --retrieval-only (voir build_components)
+SWEEP_PARAMS = {"k_fetch": int, "k_final": int, "max_distance": float}
+
 
 def load_jsonl(path: Path) -> List[Dict[str, Any]]:
     rows = []
@@ -68,18 +74,43 @@ def score_uids(expected: Set[str], predicted: Set[str]) -> RowScore:
     return RowScore(exact, precision, recall, f1, verdict)
 
 
-def main():
-    gold = load_jsonl(GOLD_PATH)
+def _expected_uids(row: Dict[str, Any]) -> Set[str]:
+    return {str(x).strip() for x in (row.get("expected_uids") or []) if str(x).strip()}
+
+
+def predict(
+    gold: List[Dict[str, Any]],
+    retrieval_only: bool = False,
+    workers: int = 8,
+    llm_cache_dir: Optional[Path] = DEFAULT_CACHE_DIR,
+    retriever_params: Optional[Dict[str, Any]] = None,
+    index: Optional[Tuple[Any, Any]] = None,
+) -> Tuple[list, Optional[Dict[str, Any]]]:
+    """
+    RAGResult de chaque question gold, dans l'ordre, et statistiques du cache LLM.
+    - retrieval_only: sources seules (mêmes uids que la réponse complète), aucun appel LLM;
+    - sinon: un embedding + une recherche FAISS pour tout le lot, puis au plus `workers`
+      appels LLM simultanés, servis depuis le cache disque quand le prompt est inchangé.
+    """
+    from src.rag.chain import answer_questions, get_shared_components, retrieve_sources
+
+    questions = [row.get("question", "") for row in gold]
+    if retrieval_only:
+        return retrieve_sources(questions, retriever_params=retriever_params, index=index), None
+
+    llm = get_shared_components()[3]
+    if llm_cache_dir is not None:
+        llm = DiskCachedLLM(llm, llm_cache_dir)
+    preds = answer_questions(questions, llm_override=llm, max_workers=workers, retriever_params=retriever_params)
+    return preds, llm.stats() if isinstance(llm, DiskCachedLLM) else None
+
 
+def score_predictions(gold: List[Dict[str, Any]], preds: Sequence) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
     results = []
     totals = {"correct": 0, "partial": 0, "incorrect": 0}
 
-    for row in gold:
-        qid = row.get("id")
-        question = row.get("question", "")
-        expected_uids = {str(x).strip() for x in (row.get("expected_uids") or []) if str(x).strip()}
-
-        rag = answer_question(question)
+    for row, rag in zip(gold, preds):
+        expected_uids = _expected_uids(row)
         pred_uids = extract_pred_uids(rag)
 
         s = score_uids(expected_uids, pred_uids)
@@ -87,8 +118,8 @@ def main():
 
         results.append(
             {
-                "id": qid,
-                "question": question,
+                "id": row.get("id"),
+                "question": row.get("question", ""),
                 "expected_uids": sorted(expected_uids),
                 "predicted_uids": sorted(pred_uids),
                 "exact_match": s.exact_match,
@@ -106,9 +137,36 @@ def main():
         "accuracy_correct": round(totals["correct"] / n, 4),
         "rate_partial": round(totals["partial"] / n, 4),
         "rate_incorrect": round(totals["incorrect"] / n, 4),
+        "mean_f1": round(sum(r["f1"] for r in results) / n, 4),
         "counts": totals,
     }
+    return results, summary
+
+
+def parse_sweep(specs: Sequence[str]) -> List[Dict[str, Any]]:
+    """["k_final=3,5", "max_distance=1.0,1.3"] -> produit cartésien des réglages."""
+    axes = []
+    for spec in specs:
+        name, _, values = spec.partition("=")
+        if name not in SWEEP_PARAMS or not values:
+            raise ValueError(f"Invalid sweep spec {spec!r} (expected one of {', '.join(SWEEP_PARAMS)}=v1,v2)")
+        axes.append([(name, SWEEP_PARAMS[name](v)) for v in values.split(",")])
+    return [dict(combo) for combo in itertools.product(*axes)]
+
+
+def run_sweep(gold: List[Dict[str, Any]], combos: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Mode retrieval seul pour chaque réglage; l'index est chargé une fois pour tout le balayage."""
+    from src.rag.chain import index_components
+
+    index = index_components()
+    rows = []
+    for params in combos:
+        preds, _ = predict(gold, retrieval_only=True, retriever_params=params, index=index)
+        rows.append({"params": params, "summary": score_predictions(gold, preds)[1]})
+    return rows
 
+
+def write_reports(results: List[Dict[str, Any]], summary: Dict[str, Any]) -> None:
     # Ecrit un rapport JSON
     out_json = OUT_DIR / "eval_report.json"
     out_json.write_text(json.dumps({"summary": summary, "results": results}, ensure_ascii=False, indent=2), encoding="utf-8")
@@ -135,11 +193,49 @@ def main():
         )
     out_csv.write_text("\n".join(lines), encoding="utf-8")
 
-    print("=== EVAL SUMMARY ===")
-    print(summary)
     print(f"\nWrote: {out_json}")
     print(f"Wrote: {out_csv}")
 
 
+def main(argv: Optional[Sequence[str]] = None):
+    parser = argparse.ArgumentParser(description="Évaluation du RAG sur le jeu gold (uids des sources).")
+    parser.add_argument("--workers", type=int, default=8, help="appels LLM simultanés")
+    parser.add_argument("--retrieval-only", action="store_true", help="score des sources sans appeler le LLM")
+    parser.add_argument("--llm-cache-dir", type=Path, default=DEFAULT_CACHE_DIR)
+    parser.add_argument("--no-llm-cache", action="store_true")
+    parser.add_argument("--sweep", nargs="+", metavar="PARAM=V1,V2",
+                        help="balayage en mode retrieval seul, ex: k_final=3,5,8 max_distance=1.0,1.3")
+    args = parser.parse_args(argv)
+
+    gold = load_jsonl(GOLD_PATH)
+
+    if args.sweep:
+        rows = run_sweep(gold, parse_sweep(args.sweep))
+        out_sweep = OUT_DIR / "retrieval_sweep.json"
+        out_sweep.write_text(json.dumps(rows, ensure_ascii=False, indent=2), encoding="utf-8")
+        for r in sorted(rows, key=lambda r: r["summary"]["mean_f1"], reverse=True):
+            print(f"{r['params']}  correct={r['summary']['accuracy_correct']}  f1={r['summary']['mean_f1']}")
+        print(f"\nWrote: {out_sweep}")
+        return rows
+
+    start = time.perf_counter()
+    preds, cache_stats = predict(
+        gold,
+        retrieval_only=args.retrieval_only,
+        workers=args.workers,
+        llm_cache_dir=None if args.no_llm_cache else args.llm_cache_dir,
+    )
+    results, summary = score_predictions(gold, preds)
+    summary["mode"] = "retrieval_only" if args.retrieval_only else "full"
+    summary["duration_s"] = round(time.perf_counter() - start, 2)
+    if cache_stats is not None:
+        summary["llm_cache"] = cache_stats
+
+    print("=== EVAL SUMMARY ===")
+    print(summary)
+    write_reports(results, summary)
+    return summary
+
+
 if __name__ == "__main__":
     main()
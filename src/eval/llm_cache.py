@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+
+# Réponses du LLM mises en cache sur disque pour l'évaluation: relancer l'éval après un
+# changement de retrieval ne repaie que les prompts qui ont effectivement changé.
+# Un fichier JSON par clé: <cache_dir>/<clé[:2]>/<clé>.json
+DEFAULT_CACHE_DIR = Path("data/eval/llm_cache")
+
+
+@dataclass
+class CachedMessage:
+    content: str
+
+
+def prompt_hash(messages: List[Any]) -> str:
+    """Empreinte des messages envoyés au LLM (rôle + contenu, dans l'ordre)."""
+    payload = [(getattr(m, "type", type(m).__name__), getattr(m, "content", m)) for m in messages]
+    return hashlib.sha256(json.dumps(payload, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def llm_identity(llm) -> Dict[str, Any]:
+    """Modèle et température du client (ChatMistralAI: model, temperature)."""
+    model = getattr(llm, "model", None) or getattr(llm, "model_name", None) or type(llm).__name__
+    return {"model": str(model), "temperature": getattr(llm, "temperature", None)}
+
+
+class DiskCachedLLM:
+    """
+    Enveloppe un client LLM (invoke / ainvoke): clé = (empreinte du prompt, modèle, température).
+    Thread-safe; une écriture passe par un fichier temporaire renommé (jamais de JSON tronqué).
+    """
+
+    def __init__(self, llm, cache_dir: Path = DEFAULT_CACHE_DIR):
+        self.llm = llm
+        self.cache_dir = Path(cache_dir)
+        self.identity = llm_identity(llm)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def key(self, messages: List[Any]) -> str:
+        raw = json.dumps([prompt_hash(messages), self.identity["model"], self.identity["temperature"]])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.json"
+
+    def _lookup(self, key: str) -> Optional[CachedMessage]:
+        path = self._path(key)
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return CachedMessage(content=data["content"])
+
+    def _store(self, key: str, content: str) -> None:
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_text(json.dumps({**self.identity, "content": content}, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, path)
+
+    def invoke(self, messages):
+        key = self.key(messages)
+        cached = self._lookup(key)
+        if cached is not None:
+            return cached
+        res = self.llm.invoke(messages)
+        self._store(key, res.content)
+        return res
+
+    async def ainvoke(self, messages):
+        key = self.key(messages)
+        cached = self._lookup(key)
+        if cached is not None:
+            return cached
+        res = await self.llm.ainvoke(messages)
+        self._store(key, res.content)
+        return res
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            **self.identity,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
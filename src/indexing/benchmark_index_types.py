@@ -0,0 +1,177 @@
+from __future__ import annotations
+
+import json
+import os
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Set
+
+import numpy as np
+
+from src.indexing.embedding_pipeline import iter_batches
+from src.indexing.faiss_store import load_vectorstore
+from src.indexing.index_factory import IndexConfig, create_index, index_size_bytes
+
+
+GOLD_PATH = Path("data/eval/qa_gold.jsonl")
+OUT_PATH = Path("data/eval/index_types_report.json")
+
+K = 5  # k_final du retriever
+K_FETCH = 20  # candidats récupérés avant filtrage
+
+# réglages comparés à l'index flat (référence exacte)
+CANDIDATES = [
+    IndexConfig("flat"),
+    IndexConfig("hnsw", ef_search=16),
+    IndexConfig("hnsw", ef_search=64),
+    IndexConfig("hnsw", ef_search=128),
+    IndexConfig("ivfpq", nprobe=4),
+    IndexConfig("ivfpq", nprobe=16),
+    IndexConfig("ivfpq", nprobe=64),
+    IndexConfig("sq8"),
+]
+
+
+def recall_at_k(reference: np.ndarray, found: np.ndarray, k: int) -> float:
+    """Part des k plus proches voisins exacts retrouvés, moyennée sur les requêtes."""
+    scores = []
+    for ref_row, got_row in zip(reference[:, :k], found[:, :k]):
+        expected = {int(i) for i in ref_row if i != -1}
+        if expected:
+            scores.append(len(expected & {int(i) for i in got_row}) / len(expected))
+    return round(float(np.mean(scores)), 4) if scores else 1.0
+
+
+def _latencies_ms(index, queries: np.ndarray, k: int) -> List[float]:
+    out = []
+    for q in queries:
+        t0 = time.perf_counter()
+        index.search(q[None, :], k)
+        out.append((time.perf_counter() - t0) * 1000)
+    return out
+
+
+def gold_hit_rate(found: np.ndarray, row_uids: Sequence[str], expected: Sequence[Set[str]]) -> Optional[float]:
+    """Questions gold dont au moins un uid attendu figure parmi les candidats (avant filtrage)."""
+    rows = [(ids, exp) for ids, exp in zip(found, expected) if exp]
+    if not rows:
+        return None
+    hits = sum(1 for ids, exp in rows if exp & {row_uids[int(i)] for i in ids if i != -1})
+    return round(hits / len(rows), 4)
+
+
+def evaluate_config(
+    config: IndexConfig,
+    vectors: np.ndarray,
+    query_sets: Dict[str, np.ndarray],
+    references: Dict[str, np.ndarray],
+    row_uids: Sequence[str],
+    gold_expected: Sequence[Set[str]],
+) -> dict:
+    t0 = time.perf_counter()
+    index = create_index(config, vectors)
+    build_s = time.perf_counter() - t0
+
+    result = {
+        "index": config.to_dict(),
+        "label": config.label,
+        "build_s": round(build_s, 3),
+        "size_mb": round(index_size_bytes(index) / 1e6, 3),
+    }
+    for name, queries in query_sets.items():
+        if not len(queries):
+            continue
+        _, found = index.search(queries, K_FETCH)
+        lat = _latencies_ms(index, queries, K_FETCH)
+        result[name] = {
+            "queries": len(queries),
+            f"recall@{K}": recall_at_k(references[name], found, K),
+            f"recall@{K_FETCH}": recall_at_k(references[name], found, K_FETCH),
+            "latency_ms_p50": round(float(np.percentile(lat, 50)), 3),
+            "latency_ms_p95": round(float(np.percentile(lat, 95)), 3),
+        }
+        if name == "gold":
+            result[name]["gold_hit_rate"] = gold_hit_rate(found, row_uids, gold_expected)
+    return result
+
+
+def run_report(
+    vectors: np.ndarray,
+    query_sets: Dict[str, np.ndarray],
+    row_uids: Sequence[str],
+    gold_expected: Sequence[Set[str]] = (),
+    configs: Sequence[IndexConfig] = CANDIDATES,
+) -> dict:
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    query_sets = {name: np.ascontiguousarray(q, dtype=np.float32) for name, q in query_sets.items()}
+
+    # référence: voisins exacts (flat)
+    flat = create_index(IndexConfig("flat"), vectors)
+    references = {name: flat.search(q, K_FETCH)[1] for name, q in query_sets.items() if len(q)}
+
+    return {
+        "vectors": int(vectors.shape[0]),
+        "dim": int(vectors.shape[1]),
+        "k": K,
+        "k_fetch": K_FETCH,
+        "results": [evaluate_config(c, vectors, query_sets, references, row_uids, gold_expected) for c in configs],
+    }
+
+
+def _load_gold(path: Path = GOLD_PATH) -> List[dict]:
+    lines = path.read_text(encoding="utf-8").splitlines() if path.exists() else []
+    return [json.loads(line) for line in lines if line.strip()]
+
+
+def _index_vectors(vs) -> np.ndarray:
+    """Vecteurs exacts de l'index servi: relus s'il les stocke en float32, sinon ré-embeddés."""
+    import faiss
+
+    if isinstance(vs.index, (faiss.IndexFlat, faiss.IndexHNSWFlat)):
+        return vs.index.reconstruct_n(0, vs.index.ntotal)
+
+    from src.indexing.build_faiss_index import get_build_embeddings
+
+    docs = (vs.docstore.search(vs.index_to_docstore_id[i]) for i in range(vs.index.ntotal))
+    with get_build_embeddings() as embeddings:
+        rows = [v for batch in iter_batches(docs, embeddings.batch_size)
+                for v in embeddings.embed_documents([d.page_content for d in batch])]
+    return np.asarray(rows, dtype=np.float32)
+
+
+def main() -> dict:
+    vs = load_vectorstore()
+    vectors = _index_vectors(vs)
+    row_uids = [vs.index_to_docstore_id[i].split("#")[0] for i in range(vs.index.ntotal)]
+
+    gold = _load_gold()
+    gold_vectors = np.asarray([vs.embedding_function.embed_query(r["question"]) for r in gold], dtype=np.float32)
+    gold_expected = [{str(u) for u in (r.get("expected_uids") or [])} for r in gold]
+
+    # requêtes complémentaires: chunks de l'index tirés au hasard (recall sur plus de points)
+    n_sample = min(int(os.getenv("BENCH_SAMPLE_QUERIES", "200")), len(vectors))
+    sample = vectors[np.random.default_rng(0).choice(len(vectors), size=n_sample, replace=False)]
+
+    report = run_report(
+        vectors,
+        {"gold": gold_vectors.reshape(-1, vectors.shape[1]), "sampled": sample},
+        row_uids,
+        gold_expected,
+    )
+
+    OUT_PATH.parent.mkdir(parents=True, exist_ok=True)
+    OUT_PATH.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    for r in report["results"]:
+        g, s = r.get("gold", {}), r.get("sampled", {})
+        print(
+            f"{r['label']:<50} size={r['size_mb']:>8.2f}MB "
+            f"gold recall@{K}={g.get(f'recall@{K}')} p50={g.get('latency_ms_p50')}ms "
+            f"sampled recall@{K}={s.get(f'recall@{K}')} p95={s.get('latency_ms_p95')}ms"
+        )
+    print(f"Saved: {OUT_PATH}")
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+from __future__ import annotations
+
+import argparse
+import json
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from src.indexing.benchmark_index_types import K, K_FETCH, recall_at_k
+from src.indexing.embedding_pipeline import process_memory_mb
+from src.indexing.index_factory import INDEX_TYPES, IndexConfig, create_index, index_size_bytes
+
+
+# Passage à l'échelle de la recherche: corpus synthétiques de 1k à 1M chunks, chaque type
+# d'index, temps de build, mémoire, latence par taille de batch et recall@k (référence flat).
+#   python -m src.indexing.benchmark_scaling --sizes 1000 10000 100000 1000000
+#   python -m src.indexing.benchmark_scaling --source real --sizes 10000 100000
+
+OUT_PATH = Path("data/bench/scaling_report.json")
+
+DEFAULT_SIZES = (1_000, 10_000, 100_000, 1_000_000)
+BATCH_SIZES = (1, 16, 256)
+DIM = 384  # dimension de paraphrase-multilingual-MiniLM-L12-v2
+
+# réglage par défaut de chaque type (voir benchmark_index_types pour les variantes)
+CONFIGS = {kind: IndexConfig(kind) for kind in INDEX_TYPES}
+
+
+def _normalize(x: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(x, axis=1, keepdims=True)
+    return x / np.where(norms == 0, 1, norms)
+
+
+def random_corpus(n: int, dim: int = DIM, n_clusters: int = 256, noise: float = 0.6, seed: int = 0) -> np.ndarray:
+    """Vecteurs normalisés regroupés autour de n_clusters thèmes (plus proche d'embeddings réels qu'un bruit uniforme)."""
+    rng = np.random.default_rng(seed)
+    centers = _normalize(rng.standard_normal((n_clusters, dim)).astype(np.float32))
+    out = np.empty((n, dim), dtype=np.float32)
+    for start in range(0, n, 100_000):  # par blocs: pas de matrice de bruit float64 de n lignes
+        end = min(start + 100_000, n)
+        labels = rng.integers(0, n_clusters, size=end - start)
+        block = centers[labels] + noise / np.sqrt(dim) * rng.standard_normal((end - start, dim))
+        out[start:end] = _normalize(block.astype(np.float32))
+    return out
+
+
+def perturbed_corpus(base: np.ndarray, n: int, noise: float = 0.3, seed: int = 0) -> np.ndarray:
+    """n vecteurs tirés de base (embeddings réels de l'index servi) avec un bruit gaussien, renormalisés."""
+    rng = np.random.default_rng(seed)
+    dim = base.shape[1]
+    out = np.empty((n, dim), dtype=np.float32)
+    for start in range(0, n, 100_000):
+        end = min(start + 100_000, n)
+        rows = base[rng.integers(0, len(base), size=end - start)]
+        out[start:end] = _normalize((rows + noise / np.sqrt(dim) * rng.standard_normal(rows.shape)).astype(np.float32))
+    return out
+
+
+def _batch_latencies_ms(index, queries: np.ndarray, batch_size: int, k: int) -> Dict[str, float]:
+    per_batch = []
+    for start in range(0, len(queries) - batch_size + 1, batch_size):
+        t0 = time.perf_counter()
+        index.search(queries[start:start + batch_size], k)
+        per_batch.append((time.perf_counter() - t0) * 1000)
+    total_ms = sum(per_batch)
+    return {
+        "batches": len(per_batch),
+        "batch_ms_p50": round(float(np.percentile(per_batch, 50)), 3),
+        "batch_ms_p95": round(float(np.percentile(per_batch, 95)), 3),
+        "qps": round(len(per_batch) * batch_size / (total_ms / 1000), 1) if total_ms else None,
+    }
+
+
+def evaluate_size(
+    vectors: np.ndarray,
+    queries: np.ndarray,
+    kinds: Sequence[str] = INDEX_TYPES,
+    batch_sizes: Sequence[int] = BATCH_SIZES,
+) -> List[dict]:
+    """Une ligne par type d'index pour un corpus donné; la recherche exacte (flat) sert de référence."""
+    reference = None
+    rows = []
+    for kind in ["flat"] + [k for k in kinds if k != "flat"]:
+        rss_before = process_memory_mb()["rss"]
+        t0 = time.perf_counter()
+        index = create_index(CONFIGS[kind], vectors)
+        build_s = time.perf_counter() - t0
+        rss_after = process_memory_mb()["rss"]
+
+        _, found = index.search(queries, K_FETCH)
+        if reference is None:
+            reference = found
+        if kind in kinds:
+            rows.append({
+                "vectors": int(len(vectors)),
+                "index": CONFIGS[kind].to_dict(),
+                "label": CONFIGS[kind].label,
+                "build_s": round(build_s, 3),
+                "size_mb": round(index_size_bytes(index) / 1e6, 2),
+                "rss_delta_mb": round(rss_after - rss_before, 1) if rss_before is not None and rss_after is not None else None,
+                f"recall@{K}": recall_at_k(reference, found, K),
+                f"recall@{K_FETCH}": recall_at_k(reference, found, K_FETCH),
+                "latency": {str(b): _batch_latencies_ms(index, queries, b, K_FETCH) for b in batch_sizes if b <= len(queries)},
+            })
+        del index
+    return rows
+
+
+def run_scaling(
+    sizes: Sequence[int] = DEFAULT_SIZES,
+    kinds: Sequence[str] = INDEX_TYPES,
+    n_queries: int = 1024,
+    batch_sizes: Sequence[int] = BATCH_SIZES,
+    base: Optional[np.ndarray] = None,
+    dim: int = DIM,
+) -> dict:
+    """base: embeddings réels à perturber; sinon corpus aléatoire regroupé en thèmes."""
+    results = []
+    for n in sizes:
+        # requêtes tirées de la même distribution que le corpus (mêmes thèmes), hors corpus
+        if base is not None:
+            data = perturbed_corpus(base, n + n_queries, seed=n)
+        else:
+            data = random_corpus(n + n_queries, dim, seed=n)
+        vectors, queries = data[:n], data[n:]
+        results.extend(evaluate_size(vectors, queries, kinds, batch_sizes))
+        del data, vectors, queries
+    return {
+        "source": "real" if base is not None else "random",
+        "dim": int(base.shape[1]) if base is not None else dim,
+        "k": K,
+        "k_fetch": K_FETCH,
+        "queries": n_queries,
+        "batch_sizes": list(batch_sizes),
+        "results": results,
+    }
+
+
+def format_table(report: dict) -> str:
+    """Tableau markdown: une ligne par (taille, type d'index)."""
+    batches = report["batch_sizes"]
+    head = ["vectors", "index", "build s", "size MB", f"recall@{K}"] + [f"qps b={b}" for b in batches] + ["p95 ms b=1"]
+    lines = ["| " + " | ".join(head) + " |", "|" + "---|" * len(head)]
+    for r in report["results"]:
+        lat = r["latency"]
+        cells = [f"{r['vectors']:,}", r["label"], r["build_s"], r["size_mb"], r[f"recall@{K}"]]
+        cells += [lat.get(str(b), {}).get("qps", "-") for b in batches]
+        cells.append(lat.get("1", {}).get("batch_ms_p95", "-"))
+        lines.append("| " + " | ".join(str(c) for c in cells) + " |")
+    return "\n".join(lines) + "\n"
+
+
+def main(argv: Optional[Sequence[str]] = None) -> dict:
+    parser = argparse.ArgumentParser(description="Recall et latence FAISS selon la taille du corpus et le type d'index.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES))
+    parser.add_argument("--kinds", nargs="+", choices=INDEX_TYPES, default=list(INDEX_TYPES))
+    parser.add_argument("--queries", type=int, default=1024)
+    parser.add_argument("--source", choices=["random", "real"], default="random",
+                        help="real: embeddings de l'index servi, tirés avec un bruit gaussien")
+    parser.add_argument("--out", type=Path, default=OUT_PATH)
+    args = parser.parse_args(argv)
+
+    base = None
+    if args.source == "real":
+        from src.indexing.benchmark_index_types import _index_vectors
+        from src.indexing.faiss_store import load_vectorstore
+
+        base = _index_vectors(load_vectorstore())
+
+    report = run_scaling(args.sizes, args.kinds, args.queries, base=base)
+    table = format_table(report)
+
+    args.out.parent.mkdir(parents=True, exist_ok=True)
+    args.out.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    args.out.with_suffix(".md").write_text(table, encoding="utf-8")
+    print(table)
+    print(f"Saved: {args.out}")
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -1,42 +1,149 @@
 from __future__ import annotations
 
+import json
+import time
 from pathlib import Path
+from typing import Iterable, Iterator, Optional, Union
 
+import pandas as pd
 from langchain_community.vectorstores import FAISS
-from langchain_huggingface import HuggingFaceEmbeddings
+from langchain_core.embeddings import Embeddings
 
-from src.indexing.prepare_documents import load_index_ready, build_documents
+from src.indexing.embedding_pipeline import (
+    PooledEmbeddings,
+    embed_into_vectorstore,
+    embedding_batch_size_from_env,
+    embedding_workers_from_env,
+)
+from src.indexing.index_factory import IndexConfig, compress_index, index_config_from_env
+from src.indexing.faiss_store import DEFAULT_EMBED_MODEL, new_version_dir, publish_version, save_vectorstore
+from src.indexing.manifest import ManifestBuilder, chunk_id, save_manifest
+from src.indexing.metadata_index import build_metadata_index, save_metadata_index
+from src.indexing.prepare_documents import iter_documents, iter_index_ready
 
 import shutil
 
+# racine de l'index: les versions sont écrites dans INDEX_DIR/versions/<v>, CURRENT pointe la version servie
 INDEX_DIR = Path("data/index/faiss_events")
 INDEX_DIR.parent.mkdir(parents=True, exist_ok=True)
 
+CHUNK_SIZE = 800
+CHUNK_OVERLAP = 120
 
-def main() -> dict:
-    # 1) Load + chunk -> Documents
-    df = load_index_ready()
-    docs = build_documents(df, chunk_size=800, chunk_overlap=120)
-    print(f"Documents to index: {len(docs)}")
-
-    # 2) Embeddings model (local, reproducible)
-    embeddings = HuggingFaceEmbeddings(
-        model_name="sentence-transformers/all-MiniLM-L6-v2"
+# dernière ligne de stdout des scripts d'indexation, relue par /rebuild
+STATS_PREFIX = "INDEX_STATS "
+
+
+def index_params(index_config: Optional[IndexConfig] = None) -> dict:
+    # tout changement de ces paramètres impose une reconstruction complète
+    index_config = index_config or index_config_from_env()
+    return {
+        "embed_model": DEFAULT_EMBED_MODEL,
+        "chunk_size": CHUNK_SIZE,
+        "chunk_overlap": CHUNK_OVERLAP,
+        "index": index_config.to_dict(),
+    }
+
+
+def save_index(vectorstore: FAISS, index_dir: Path, manifest: dict) -> None:
+    save_vectorstore(vectorstore, index_dir)
+    # colonnes ville/date alignées sur les row ids FAISS (pré-filtrage à la recherche)
+    save_metadata_index(build_metadata_index(vectorstore), index_dir)
+    # empreinte par uid: permet les mises à jour incrémentales
+    save_manifest(manifest, index_dir)
+
+
+def publish_index(vectorstore: FAISS, manifest: dict, root: Path = INDEX_DIR) -> Path:
+    """
+    Écrit l'index dans un nouveau dossier de version puis bascule CURRENT dessus:
+    la version servie n'est jamais modifiée en place.
+    """
+    version_dir = new_version_dir(root)
+    try:
+        save_index(vectorstore, version_dir, manifest)
+    except Exception:
+        shutil.rmtree(version_dir, ignore_errors=True)
+        raise
+    publish_version(version_dir, root)
+    return version_dir
+
+
+def print_stats(stats: dict) -> None:
+    print(STATS_PREFIX + json.dumps(stats, default=str))
+
+
+def count_rows(frames: Union[pd.DataFrame, Iterable[pd.DataFrame]], counter: dict) -> Iterator[pd.DataFrame]:
+    """Relaie les lots d'événements en comptant les lignes dans counter["rows"]."""
+    for df in [frames] if isinstance(frames, pd.DataFrame) else frames:
+        counter["rows"] = counter.get("rows", 0) + len(df)
+        yield df
+
+
+def build_index(
+    df: Union[pd.DataFrame, Iterable[pd.DataFrame]],
+    embeddings: Embeddings,
+    index_dir: Path = INDEX_DIR,
+    batch_size: Optional[int] = None,
+    index_config: Optional[IndexConfig] = None,
+) -> dict:
+    """
+    df: jeu "index ready" complet ou lots successifs (iter_index_ready).
+    index_config: type d'index FAISS (défaut: RAG_INDEX_TYPE, flat); les vecteurs sont
+    accumulés dans un index flat puis, si besoin, compressés en fin de build.
+    Lecture, découpage et embedding sont enchaînés en flux: seuls le lot d'événements
+    et le lot de chunks courants sont en mémoire, en plus de l'index lui-même.
+    """
+    # 1) Load + chunk -> Documents (générateur), manifeste construit au passage
+    index_config = index_config or index_config_from_env()
+    counter = {"rows": 0}
+    manifest = ManifestBuilder(index_params(index_config))
+    docs = manifest.track(iter_documents(count_rows(df, counter), chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP))
+
+    # 2) Build FAISS index par lots (ids stables <uid>#<chunk>)
+    vectorstore, embedding_stats = embed_into_vectorstore(
+        docs,
+        embeddings,
+        id_of=chunk_id,
+        batch_size=batch_size or embedding_batch_size_from_env(),
     )
+    print(f"Documents indexed: {len(manifest)}")
 
-    # 3) Build FAISS index
-    vectorstore = FAISS.from_documents(docs, embeddings)
+    if index_config.kind != "flat":
+        start = time.time()
+        vectorstore.index = compress_index(vectorstore.index, index_config)
+        print(f"Index {index_config.label} built in {time.time() - start:.1f}s")
 
-    if INDEX_DIR.exists():
-        shutil.rmtree(INDEX_DIR)
-    INDEX_DIR.mkdir(parents=True, exist_ok=True)
+    # 3) Save locally (nouvelle version + bascule atomique)
+    version_dir = publish_index(vectorstore, manifest.build(), index_dir)
+    print(f"FAISS index saved to: {version_dir.resolve()}")
 
+    return {
+        "rows": counter["rows"],
+        "chunks": len(manifest),
+        "index_dir": str(version_dir),
+        "version": version_dir.name,
+        "index": index_config.to_dict(),
+        "embedding": embedding_stats,
+    }
 
-    # 4) Save locally
-    vectorstore.save_local(str(INDEX_DIR))
-    print(f"FAISS index saved to: {INDEX_DIR.resolve()}")
 
-    return {"rows": len(df), "chunks": len(docs), "index_dir": str(INDEX_DIR)}
+def get_build_embeddings() -> PooledEmbeddings:
+    """
+    Embeddings du build (local, reproductible): RAG_EMBED_BATCH_SIZE chunks par lot,
+    répartis sur RAG_EMBED_WORKERS process.
+    """
+    return PooledEmbeddings(
+        DEFAULT_EMBED_MODEL,
+        workers=embedding_workers_from_env(),
+        batch_size=embedding_batch_size_from_env(),
+    )
+
+
+def main() -> dict:
+    with get_build_embeddings() as embeddings:
+        stats = build_index(iter_index_ready(), embeddings, INDEX_DIR)
+    print_stats(stats)
+    return stats
 
 if __name__ == "__main__":
     main()
@@ -1,19 +1,14 @@
 from __future__ import annotations
 
 import time
-from pathlib import Path
 
-import pandas as pd
-
-from src.indexing.faiss_store import load_vectorstore
-
-
-INDEX_READY = Path("data/processed/events_index_ready.jsonl")
+from src.indexing.faiss_store import load_stats, load_vectorstore
+from src.indexing.prepare_documents import load_index_ready
 
 
 def main():
     # 1) compter les événements "index-ready"
-    df = pd.read_json(INDEX_READY, lines=True)
+    df = load_index_ready(columns=["uid"])
     n_events = len(df)
 
     # 2) charger FAISS
@@ -23,6 +18,7 @@ def main():
     # langchain_community FAISS expose généralement l’index via vs.index
     n_vectors = vs.index.ntotal
 
+    print(f"Index loaded: {load_stats()}")
     print(f"Events (index-ready): {n_events}")
     print(f"Vectors in FAISS index: {n_vectors}")
 
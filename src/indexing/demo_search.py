@@ -1,14 +1,15 @@
 from __future__ import annotations
 from pathlib import Path
 
-from langchain_community.vectorstores import FAISS
 from langchain_huggingface import HuggingFaceEmbeddings
 
+from src.indexing.faiss_store import open_vectorstore, resolve_index_dir
+
 INDEX_DIR = Path("data/index/faiss_events")
 
 def main():
     embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
-    vs = FAISS.load_local(str(INDEX_DIR), embeddings, allow_dangerous_deserialization=True)
+    vs = open_vectorstore(resolve_index_dir(INDEX_DIR), embeddings)
 
     query = "conférence sur la pollinisation des abeilles"
     results = vs.similarity_search(query, k=5)
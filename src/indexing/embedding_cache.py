@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import atexit
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Cache LRU (clé = texte exact) devant un modèle d'embeddings.
+    Les embeddings de requête et de documents sont mis en cache séparément
+    (certains modèles encodent différemment les deux).
+    Optionnellement persisté sur disque (.npz) pour survivre aux redémarrages.
+    """
+
+    def __init__(
+        self,
+        base: Embeddings,
+        max_entries: int = 4096,
+        persist_path: Optional[Path] = None,
+        persist_every: int = 64,
+    ):
+        self.base = base
+        self.max_entries = max_entries
+        self.persist_path = Path(persist_path) if persist_path else None
+        self.persist_every = persist_every
+        self._entries: "OrderedDict[Tuple[str, str], List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        # sérialise les sauvegardes: instantané et renommage dans le même ordre
+        self._save_lock = threading.Lock()
+        self._unsaved = 0
+        self.hits = 0
+        self.misses = 0
+
+        if self.persist_path is not None:
+            self._load()
+            atexit.register(self.save)
+
+    # --- API Embeddings ---
+    def embed_query(self, text: str) -> List[float]:
+        key = ("q", text)
+        cached = self._get(key)
+        if cached is not None:
+            return cached
+        vector = list(self.base.embed_query(text))
+        self._put({key: vector})
+        return vector
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        out: List[Optional[List[float]]] = [self._get(("d", t)) for t in texts]
+        missing = [i for i, v in enumerate(out) if v is None]
+        if missing:
+            # un seul appel au modèle pour tous les textes absents du cache
+            vectors = self.base.embed_documents([texts[i] for i in missing])
+            new: Dict[Tuple[str, str], List[float]] = {}
+            for i, v in zip(missing, vectors):
+                out[i] = list(v)
+                new[("d", texts[i])] = out[i]
+            self._put(new)
+        return out  # type: ignore[return-value]
+
+    # --- cache ---
+    def _get(self, key: Tuple[str, str]) -> Optional[List[float]]:
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return vector
+
+    def _put(self, items: Dict[Tuple[str, str], List[float]]) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            for key, vector in items.items():
+                self._entries[key] = vector
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._unsaved += len(items)
+            should_save = self.persist_path is not None and self._unsaved >= self.persist_every
+        if should_save:
+            self.save()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._entries), "max_entries": self.max_entries, "hits": self.hits, "misses": self.misses}
+
+    # --- persistance ---
+    def save(self) -> None:
+        if self.persist_path is None:
+            return
+        with self._save_lock:
+            with self._lock:
+                if not self._entries:
+                    return
+                kinds = np.asarray([k for k, _ in self._entries.keys()], dtype=str)
+                texts = np.asarray([t for _, t in self._entries.keys()], dtype=str)
+                vectors = np.asarray(list(self._entries.values()), dtype=np.float32)
+                self._unsaved = 0
+
+            # lectures et écritures du cache restent possibles pendant l'écriture sur disque;
+            # fichier temporaire propre au process (plusieurs workers peuvent partager le chemin)
+            self.persist_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.persist_path.with_name(f"{self.persist_path.name}.{os.getpid()}.tmp.npz")
+            np.savez(tmp, kinds=kinds, texts=texts, vectors=vectors)
+            os.replace(tmp, self.persist_path)  # écriture atomique
+
+    def _load(self) -> None:
+        if self.persist_path is None or not self.persist_path.exists():
+            return
+        try:
+            with np.load(self.persist_path) as data:
+                rows = zip(data["kinds"], data["texts"], data["vectors"])
+                for kind, text, vector in rows:
+                    self._entries[(str(kind), str(text))] = vector.tolist()
+        except Exception:
+            # cache corrompu / format inattendu: on repart à vide
+            self._entries.clear()
+            return
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
@@ -0,0 +1,169 @@
+from __future__ import annotations
+
+import os
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence
+
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+try:  # absent sous Windows
+    import resource
+except ImportError:  # pragma: no cover
+    resource = None
+
+
+DEFAULT_BATCH_SIZE = 256
+
+
+@dataclass
+class EmbeddingStats:
+    chunks: int
+    batches: int
+    batch_size: int
+    workers: int
+    duration_s: float
+    chunks_per_s: float
+    peak_rss_mb: Optional[float]
+
+
+def embedding_batch_size_from_env() -> int:
+    return max(1, int(os.getenv("RAG_EMBED_BATCH_SIZE", str(DEFAULT_BATCH_SIZE))))
+
+
+def embedding_workers_from_env() -> int:
+    """RAG_EMBED_WORKERS: nombre de process d'encodage (défaut 1, 0 = un par cœur CPU)."""
+    workers = int(os.getenv("RAG_EMBED_WORKERS", "1"))
+    return workers if workers > 0 else (os.cpu_count() or 1)
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Pic de mémoire résidente (process + workers terminés), en Mo."""
+    if resource is None:
+        return None
+    kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    kb_children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    # ru_maxrss est en Ko sous Linux
+    return round(max(kb, kb_children) / 1024, 1)
+
+
+def process_memory_mb() -> Dict[str, Optional[float]]:
+    """
+    Mémoire actuelle du process en Mo (Linux): rss, et anonymous = part privée non partageable
+    (les pages d'un fichier mappé, partagées entre workers via le cache système, n'y figurent pas).
+    """
+    out: Dict[str, Optional[float]] = {"rss": None, "anonymous": None}
+    try:
+        with open("/proc/self/smaps_rollup", encoding="ascii") as f:
+            for line in f:
+                key, _, rest = line.partition(":")
+                if key.lower() in out:
+                    out[key.lower()] = round(int(rest.split()[0]) / 1024, 1)  # valeurs en kB
+    except OSError:
+        pass
+    return out
+
+
+class PooledEmbeddings(Embeddings):
+    """
+    Embeddings sentence-transformers encodés par lots, sur un pool de process
+    (un par worker) ouvert une seule fois pour toute la construction de l'index.
+    A utiliser comme context manager: le pool est arrêté à la sortie.
+    """
+
+    def __init__(self, model_name: str, workers: int = 1, batch_size: int = DEFAULT_BATCH_SIZE):
+        from sentence_transformers import SentenceTransformer  # import lourd, seulement au build
+
+        self.model = SentenceTransformer(model_name)
+        self.workers = workers
+        self.batch_size = batch_size
+        self._pool = None
+
+    def __enter__(self) -> "PooledEmbeddings":
+        if self.workers > 1 and self._pool is None:
+            self._pool = self.model.start_multi_process_pool(["cpu"] * self.workers)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self.model.stop_multi_process_pool(self._pool)
+            self._pool = None
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        vectors = self.model.encode(list(texts), batch_size=self.batch_size, pool=self._pool)
+        return vectors.tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.model.encode([text], batch_size=1)[0].tolist()
+
+
+def iter_batches(docs: Iterable[Document], batch_size: int) -> Iterator[List[Document]]:
+    batch: List[Document] = []
+    for doc in docs:
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def embed_into_vectorstore(
+    docs: Iterable[Document],
+    embeddings: Embeddings,
+    ids: Optional[Sequence[str]] = None,
+    vectorstore: Optional[FAISS] = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    total: Optional[int] = None,
+    id_of: Optional[Callable[[Document], str]] = None,
+) -> tuple[FAISS, Dict[str, Any]]:
+    """
+    Embedde les chunks par lots de batch_size et les ajoute au fur et à mesure
+    à l'index (créé au premier lot si vectorstore est None).
+    docs peut être un générateur: seul le lot courant est matérialisé.
+    Ids docstore: liste `ids` alignée sur docs, ou calculés par `id_of(doc)`.
+    Retourne (vectorstore, statistiques de débit et de mémoire).
+    """
+    start = time.time()
+    done = 0
+    batches = 0
+    for batch in iter_batches(docs, batch_size):
+        texts = [d.page_content for d in batch]
+        metadatas = [d.metadata for d in batch]
+        if ids is not None:
+            batch_ids = list(ids[done: done + len(batch)])
+        else:
+            batch_ids = [id_of(d) for d in batch] if id_of is not None else None
+        pairs = list(zip(texts, embeddings.embed_documents(texts)))
+
+        if vectorstore is None:
+            vectorstore = FAISS.from_embeddings(pairs, embeddings, metadatas=metadatas, ids=batch_ids)
+        else:
+            vectorstore.add_embeddings(pairs, metadatas=metadatas, ids=batch_ids)
+
+        done += len(batch)
+        batches += 1
+        elapsed = time.time() - start
+        print(f"Embedded {done}/{total if total is not None else '?'} chunks ({done / max(elapsed, 1e-9):.1f} chunks/s)")
+
+    if vectorstore is None:
+        raise ValueError("No documents to index")
+
+    duration = time.time() - start
+    stats = EmbeddingStats(
+        chunks=done,
+        batches=batches,
+        batch_size=batch_size,
+        workers=getattr(embeddings, "workers", 1),
+        duration_s=round(duration, 3),
+        chunks_per_s=round(done / duration, 1) if duration > 0 else 0.0,
+        peak_rss_mb=peak_rss_mb(),
+    )
+    return vectorstore, asdict(stats)
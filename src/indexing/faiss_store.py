@@ -1,38 +1,231 @@
 from __future__ import annotations
 
+import os
+import shutil
+import threading
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
 from pathlib import Path
-from typing import Optional
+from typing import Any, Dict, Optional
 
 from langchain_community.vectorstores import FAISS
-from langchain_huggingface import HuggingFaceEmbeddings
+from langchain_core.embeddings import Embeddings
 from langchain_core.vectorstores import VectorStoreRetriever
 
+from src.indexing.embedding_cache import CachedEmbeddings
+from src.indexing.embedding_pipeline import process_memory_mb
+from src.indexing.mmap_docstore import MmapDocstore, has_mmap_docstore, write_docstore
+
 
 DEFAULT_INDEX_DIR = Path("data/index/faiss_events")
 DEFAULT_EMBED_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
 
+# Disposition versionnée: <root>/versions/<version>/ + <root>/CURRENT (nom de la version active).
+# Sans fichier CURRENT, <root> contient directement l'index (ancien format).
+CURRENT_FILE = "CURRENT"
+VERSIONS_DIR = "versions"
+LEGACY_INDEX_FILES = ("index.faiss", "index.pkl", "metadata_index.npz", "manifest.json")
+
+# un seul modèle + cache de requêtes par process, conservé entre rechargements d'index
+_QUERY_EMBEDDINGS: Dict[str, CachedEmbeddings] = {}
+_QUERY_EMBEDDINGS_LOCK = threading.Lock()
+
+
+def get_embeddings(model_name: str = DEFAULT_EMBED_MODEL) -> Embeddings:
+    from langchain_huggingface import HuggingFaceEmbeddings  # import lourd (torch), différé au chargement du modèle
 
-def get_embeddings(model_name: str = DEFAULT_EMBED_MODEL) -> HuggingFaceEmbeddings:
     return HuggingFaceEmbeddings(model_name=model_name)
 
 
+def get_query_embeddings(model_name: str = DEFAULT_EMBED_MODEL) -> CachedEmbeddings:
+    """
+    Embeddings des requêtes avec cache LRU: une question déjà vue ne repasse pas
+    dans le modèle. RAG_EMBED_CACHE_SIZE (défaut 4096, 0 = désactivé) et
+    RAG_EMBED_CACHE_PATH (optionnel, .npz persisté entre redémarrages).
+    """
+    embeddings = _QUERY_EMBEDDINGS.get(model_name)
+    if embeddings is None:
+        # deux threads au premier appel: un seul construit le modèle, l'autre attend
+        with _QUERY_EMBEDDINGS_LOCK:
+            embeddings = _QUERY_EMBEDDINGS.get(model_name)
+            if embeddings is None:
+                persist = os.getenv("RAG_EMBED_CACHE_PATH")
+                embeddings = CachedEmbeddings(
+                    get_embeddings(model_name=model_name),
+                    max_entries=int(os.getenv("RAG_EMBED_CACHE_SIZE", "4096")),
+                    persist_path=Path(persist) if persist else None,
+                )
+                _QUERY_EMBEDDINGS[model_name] = embeddings
+    return embeddings
+
+
+def current_version(root: Path = DEFAULT_INDEX_DIR) -> Optional[str]:
+    path = Path(root) / CURRENT_FILE
+    if not path.exists():
+        return None
+    return path.read_text(encoding="utf-8").strip() or None
+
+
+def resolve_index_dir(root: Path = DEFAULT_INDEX_DIR) -> Path:
+    """Dossier de l'index actif: la version pointée par CURRENT, sinon root lui-même."""
+    version = current_version(root)
+    return Path(root) / VERSIONS_DIR / version if version else Path(root)
+
+
+def index_version(root: Path = DEFAULT_INDEX_DIR) -> Optional[str]:
+    """Identifiant de la version d'index sur disque (change à chaque reconstruction)."""
+    version = current_version(root)
+    if version:
+        return version
+    path = Path(root) / "index.faiss"
+    if not path.exists():
+        return None
+    return str(path.stat().st_mtime_ns)
+
+
+def new_version_dir(root: Path = DEFAULT_INDEX_DIR) -> Path:
+    """Dossier vide pour construire une nouvelle version, sans toucher à la version servie."""
+    name = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
+    path = Path(root) / VERSIONS_DIR / name
+    path.mkdir(parents=True, exist_ok=False)
+    return path
+
+
+def publish_version(version_dir: Path, root: Path = DEFAULT_INDEX_DIR, keep: int = 3) -> str:
+    """
+    Bascule atomiquement CURRENT vers version_dir (os.replace), puis supprime
+    les versions les plus anciennes (on en garde `keep`, dont la courante).
+    """
+    root = Path(root)
+    version = Path(version_dir).name
+    tmp = root / (CURRENT_FILE + ".tmp")
+    tmp.write_text(version, encoding="utf-8")
+    os.replace(tmp, root / CURRENT_FILE)
+
+    # l'ancien format (fichiers à la racine) n'est plus lu une fois CURRENT écrit
+    for name in LEGACY_INDEX_FILES:
+        legacy = root / name
+        if legacy.exists():
+            legacy.unlink()
+
+    versions = sorted(p for p in (root / VERSIONS_DIR).iterdir() if p.is_dir())
+    for old in versions[: max(0, len(versions) - keep)]:
+        if old.name != version:
+            shutil.rmtree(old, ignore_errors=True)
+    return version
+
+
+FAISS_INDEX_FILE = "index.faiss"
+
+
+def save_vectorstore(vectorstore: FAISS, index_dir: Path) -> None:
+    """index.faiss + docstore mmap (pas de pickle: rien à désérialiser au chargement)."""
+    import faiss
+
+    Path(index_dir).mkdir(parents=True, exist_ok=True)
+    faiss.write_index(vectorstore.index, str(Path(index_dir) / FAISS_INDEX_FILE))
+    write_docstore(vectorstore, index_dir)
+
+
+@dataclass
+class IndexLoadStats:
+    index_dir: str
+    index_type: str
+    vectors: int
+    mmap: bool
+    load_s: float
+    rss_delta_mb: Optional[float]
+    anonymous_delta_mb: Optional[float]  # mémoire privée du worker (hors pages mappées partagées)
+
+
+# dernier chargement de l'index servi dans ce process (exposé par l'API)
+LAST_LOAD_STATS: Optional[IndexLoadStats] = None
+
+
+def mmap_enabled_from_env() -> bool:
+    """RAG_INDEX_MMAP (défaut 1): index et docstore mappés en mémoire plutôt que copiés."""
+    return os.getenv("RAG_INDEX_MMAP", "1").strip().lower() not in {"0", "false", "no"}
+
+
+def mmap_io_flags() -> int:
+    import faiss
+
+    # IO_FLAG_MMAP_IFC (FAISS >= 1.10): codes des index flat / sq8 / hnsw / listes IVF lus sans copie;
+    # sinon IO_FLAG_MMAP, limité aux listes inversées IVF (ignoré pour les autres types)
+    return getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP)
+
+
+def open_vectorstore(index_dir: Path, embeddings: Embeddings, writable: bool = False, mmap: bool = False) -> FAISS:
+    """
+    Ouvre le dossier d'un index. Docstore mmap par défaut (lecture seule);
+    writable=True le recopie en mémoire pour le modifier (add / delete).
+    mmap=True mappe aussi index.faiss: les pages sont partagées entre process,
+    mais l'index est alors en lecture seule (ignoré si writable).
+    Les index antérieurs (index.pkl) sont lus via FAISS.load_local.
+    """
+    index_dir = Path(index_dir)
+    if not has_mmap_docstore(index_dir):
+        # requis par LangChain/FAISS pour recharger le docstore local (pickle)
+        return FAISS.load_local(str(index_dir), embeddings, allow_dangerous_deserialization=True)
+
+    import faiss
+
+    flags = mmap_io_flags() if mmap and not writable else 0
+    index = faiss.read_index(str(index_dir / FAISS_INDEX_FILE), flags)
+    docstore = MmapDocstore(index_dir)
+    index_to_docstore_id = dict(enumerate(docstore.ids))
+    if writable:
+        docstore = docstore.to_in_memory()
+    return FAISS(embeddings, index, docstore, index_to_docstore_id)
+
+
 def load_vectorstore(
     index_dir: Path = DEFAULT_INDEX_DIR,
     model_name: str = DEFAULT_EMBED_MODEL,
+    writable: bool = False,
+    mmap: Optional[bool] = None,
 ) -> FAISS:
+    """
+    Charge l'index actif pour la recherche (mmap selon RAG_INDEX_MMAP par défaut)
+    et enregistre le temps de chargement et l'écart de mémoire dans LAST_LOAD_STATS.
+    """
+    global LAST_LOAD_STATS
+    index_dir = resolve_index_dir(index_dir)
     if not index_dir.exists():
         raise FileNotFoundError(
             f"FAISS index directory not found: {index_dir}. "
             "Build it first with: python -m src.indexing.build_faiss_index"
         )
 
-    embeddings = get_embeddings(model_name=model_name)
-    # requis par LangChain/FAISS pour recharger le docstore local
-    return FAISS.load_local(
-        str(index_dir),
-        embeddings,
-        allow_dangerous_deserialization=True,
+    embeddings = get_query_embeddings(model_name=model_name)
+    mmap = mmap_enabled_from_env() if mmap is None else mmap
+
+    before = process_memory_mb()
+    start = time.perf_counter()
+    vs = open_vectorstore(index_dir, embeddings, writable=writable, mmap=mmap)
+    load_s = time.perf_counter() - start
+    after = process_memory_mb()
+
+    def delta(key: str) -> Optional[float]:
+        if before[key] is None or after[key] is None:
+            return None
+        return round(after[key] - before[key], 1)
+
+    LAST_LOAD_STATS = IndexLoadStats(
+        index_dir=str(index_dir),
+        index_type=type(vs.index).__name__,
+        vectors=int(vs.index.ntotal),
+        mmap=bool(mmap and not writable and has_mmap_docstore(index_dir)),
+        load_s=round(load_s, 4),
+        rss_delta_mb=delta("rss"),
+        anonymous_delta_mb=delta("anonymous"),
     )
+    return vs
+
+
+def load_stats() -> Optional[Dict[str, Any]]:
+    return asdict(LAST_LOAD_STATS) if LAST_LOAD_STATS is not None else None
 
 
 def get_retriever(
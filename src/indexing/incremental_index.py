@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+import time
+from pathlib import Path
+from typing import Iterable, List, Optional, Union
+
+import pandas as pd
+from langchain_community.vectorstores import FAISS
+from langchain_core.embeddings import Embeddings
+
+from src.indexing.build_faiss_index import (
+    CHUNK_OVERLAP,
+    CHUNK_SIZE,
+    INDEX_DIR,
+    build_index,
+    count_rows,
+    get_build_embeddings,
+    index_params,
+    print_stats,
+    publish_index,
+)
+from src.indexing.embedding_pipeline import embed_into_vectorstore, embedding_batch_size_from_env
+from src.indexing.faiss_store import open_vectorstore, resolve_index_dir
+from src.indexing.index_factory import IndexConfig, index_config_from_env, rebuild_without, supports_removal
+from src.indexing.manifest import ManifestBuilder, chunk_id, iter_event_groups, load_manifest
+from src.indexing.prepare_documents import iter_documents, iter_index_ready
+
+
+def _same_params(old: Optional[dict], new: dict) -> bool:
+    if old is None:
+        return False
+    # manifestes antérieurs au choix du type d'index: index flat
+    return {"index": {"kind": "flat"}, **old} == new
+
+
+def _delete_vectors(vs: FAISS, ids: List[str], index_config: IndexConfig) -> None:
+    if supports_removal(vs.index):
+        vs.delete(ids)
+        return
+    # HNSW / IVF: on reconstruit l'index sans ces rows (vecteurs relus, pas ré-embeddés)
+    doomed = set(ids)
+    keep = [row for row in range(vs.index.ntotal) if vs.index_to_docstore_id[row] not in doomed]
+    vs.index = rebuild_without(vs.index, keep, index_config)
+    vs.docstore.delete(ids)
+    vs.index_to_docstore_id = {new: vs.index_to_docstore_id[old] for new, old in enumerate(keep)}
+
+
+def update_index(
+    df: Union[pd.DataFrame, Iterable[pd.DataFrame]],
+    embeddings: Embeddings,
+    index_dir: Path = INDEX_DIR,
+    index_config: Optional[IndexConfig] = None,
+) -> dict:
+    """
+    Met à jour l'index existant à partir du manifeste (empreinte par uid):
+    - ré-embedde uniquement les événements nouveaux ou modifiés
+    - supprime les vecteurs des événements retirés / expirés
+    Bascule sur une reconstruction complète si l'index ou le manifeste manquent,
+    ou si les paramètres d'indexation (dont le type d'index) ont changé.
+    """
+    start = time.time()
+    index_config = index_config or index_config_from_env()
+    params = index_params(index_config)
+    current_dir = resolve_index_dir(index_dir)
+    manifest = load_manifest(current_dir)
+    if manifest is None or not _same_params(manifest.get("params"), params) or not (current_dir / "index.faiss").exists():
+        print("No usable manifest: full rebuild")
+        stats = build_index(df, embeddings, index_dir, index_config=index_config)
+        stats.update({"mode": "full", "duration_s": round(time.time() - start, 3)})
+        return stats
+
+    # le découpage est peu coûteux: on le refait pour tout (en flux), seul l'embedding est évité;
+    # seuls les chunks des événements nouveaux ou modifiés sont conservés
+    old_events = manifest["events"]
+    counter = {"rows": 0}
+    builder = ManifestBuilder(params)
+    docs = builder.track(iter_documents(count_rows(df, counter), chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP))
+    added, changed, to_embed = [], [], []
+    for uid, chunks in iter_event_groups(docs):
+        old = old_events.get(uid)
+        if old is None:
+            added.append(uid)
+        elif old["hash"] != builder.fingerprint(uid):
+            changed.append(uid)
+        else:
+            continue
+        to_embed.extend(chunks)
+
+    new_manifest = builder.build()
+    removed = sorted(set(old_events) - set(new_manifest["events"]))
+    added, changed = sorted(added), sorted(changed)
+
+    if not (removed or added or changed):
+        print("Index already up to date")
+        return {
+            "mode": "incremental", "rows": counter["rows"], "chunks": len(builder), "index_dir": str(current_dir),
+            "added": 0, "changed": 0, "removed": 0, "embedded_chunks": 0,
+            "duration_s": round(time.time() - start, 3),
+        }
+
+    # chargé en mémoire depuis la version servie, modifié, puis publié comme nouvelle version
+    vs = open_vectorstore(current_dir, embeddings, writable=True)
+
+    ids_to_delete = [_id for uid in removed + changed for _id in old_events[uid]["ids"]]
+    if ids_to_delete:
+        _delete_vectors(vs, ids_to_delete, index_config)
+
+    embedding_stats = None
+    if to_embed:
+        vs, embedding_stats = embed_into_vectorstore(
+            to_embed,
+            embeddings,
+            ids=[chunk_id(d) for d in to_embed],
+            vectorstore=vs,
+            batch_size=embedding_batch_size_from_env(),
+            total=len(to_embed),
+        )
+
+    version_dir = publish_index(vs, new_manifest, index_dir)
+
+    stats = {
+        "mode": "incremental",
+        "rows": counter["rows"],
+        "chunks": vs.index.ntotal,
+        "index_dir": str(version_dir),
+        "version": version_dir.name,
+        "added": len(added),
+        "changed": len(changed),
+        "removed": len(removed),
+        "embedded_chunks": len(to_embed),
+        "embedding": embedding_stats,
+        "duration_s": round(time.time() - start, 3),
+    }
+    print(f"Incremental update: {stats}")
+    return stats
+
+
+def main() -> dict:
+    with get_build_embeddings() as embeddings:
+        stats = update_index(iter_index_ready(), embeddings, INDEX_DIR)
+    print_stats(stats)
+    return stats
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+import math
+import os
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, List
+
+import numpy as np
+
+
+# Types d'index FAISS disponibles au build (RAG_INDEX_TYPE):
+# - flat: recherche exacte, mémoire et temps linéaires en nombre de chunks (défaut)
+# - hnsw: graphe HNSW, recherche approchée rapide, vecteurs conservés en float32
+# - ivfpq: partition IVF + product quantization, vecteurs compressés (pq_m octets par vecteur)
+# - sq8: quantification scalaire int8 (4x moins de mémoire que flat), recherche exhaustive
+INDEX_TYPES = ("flat", "hnsw", "ivfpq", "sq8")
+
+# paramètres pertinents par type (les autres ne sont pas enregistrés dans le manifeste)
+_PARAMS_BY_TYPE = {
+    "flat": (),
+    "hnsw": ("hnsw_m", "ef_construction", "ef_search"),
+    "ivfpq": ("nlist", "nprobe", "pq_m", "pq_bits"),
+    "sq8": (),
+}
+
+
+@dataclass
+class IndexConfig:
+    kind: str = "flat"
+    hnsw_m: int = 32
+    ef_construction: int = 80
+    ef_search: int = 64
+    nlist: int = 0  # 0 = automatique (~4 * sqrt(n))
+    nprobe: int = 16
+    pq_m: int = 48  # sous-quantifieurs; ramené à un diviseur de la dimension
+    pq_bits: int = 8
+
+    def __post_init__(self):
+        if self.kind not in INDEX_TYPES:
+            raise ValueError(f"Unknown index type: {self.kind!r} (expected one of {', '.join(INDEX_TYPES)})")
+
+    def to_dict(self) -> Dict[str, Any]:
+        values = asdict(self)
+        return {"kind": self.kind, **{name: values[name] for name in _PARAMS_BY_TYPE[self.kind]}}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "IndexConfig":
+        return cls(**data)
+
+    @property
+    def label(self) -> str:
+        params = ",".join(f"{k}={v}" for k, v in self.to_dict().items() if k != "kind")
+        return f"{self.kind}({params})" if params else self.kind
+
+
+def index_config_from_env() -> IndexConfig:
+    """
+    RAG_INDEX_TYPE (flat | hnsw | ivfpq | sq8, défaut flat), RAG_HNSW_M, RAG_HNSW_EF_SEARCH,
+    RAG_IVF_NLIST (0 = auto), RAG_IVF_NPROBE, RAG_PQ_M.
+    """
+    defaults = IndexConfig()
+    return IndexConfig(
+        kind=os.getenv("RAG_INDEX_TYPE", defaults.kind).strip().lower(),
+        hnsw_m=int(os.getenv("RAG_HNSW_M", str(defaults.hnsw_m))),
+        ef_search=int(os.getenv("RAG_HNSW_EF_SEARCH", str(defaults.ef_search))),
+        nlist=int(os.getenv("RAG_IVF_NLIST", str(defaults.nlist))),
+        nprobe=int(os.getenv("RAG_IVF_NPROBE", str(defaults.nprobe))),
+        pq_m=int(os.getenv("RAG_PQ_M", str(defaults.pq_m))),
+    )
+
+
+def _auto_nlist(n: int) -> int:
+    # FAISS recommande au moins ~39 points d'apprentissage par liste
+    return max(1, min(int(4 * math.sqrt(n)), n // 39))
+
+
+def _pq_m_for(dim: int, pq_m: int) -> int:
+    return max(m for m in range(1, min(pq_m, dim) + 1) if dim % m == 0)
+
+
+def create_index(config: IndexConfig, vectors: np.ndarray):
+    """Crée l'index FAISS décrit par config, l'entraîne si nécessaire sur vectors puis les y ajoute."""
+    import faiss
+
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    n, dim = vectors.shape
+
+    if config.kind == "flat":
+        index = faiss.IndexFlatL2(dim)
+    elif config.kind == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, config.hnsw_m)
+        index.hnsw.efConstruction = config.ef_construction
+        index.hnsw.efSearch = config.ef_search
+    elif config.kind == "ivfpq":
+        nlist = min(config.nlist, n) if config.nlist > 0 else _auto_nlist(n)
+        # l'apprentissage PQ demande au moins 2^bits points
+        bits = max(1, min(config.pq_bits, int(math.log2(max(n, 2)))))
+        index = faiss.IndexIVFPQ(faiss.IndexFlatL2(dim), dim, nlist, _pq_m_for(dim, config.pq_m), bits)
+        index.nprobe = min(config.nprobe, nlist)
+    else:  # sq8
+        index = faiss.IndexScalarQuantizer(dim, faiss.ScalarQuantizer.QT_8bit)
+
+    if not index.is_trained:
+        index.train(vectors)
+    index.add(vectors)
+    return index
+
+
+def compress_index(flat_index, config: IndexConfig):
+    """Index de type config construit à partir des vecteurs d'un index flat (même ordre des rows)."""
+    if config.kind == "flat":
+        return flat_index
+    return create_index(config, flat_index.reconstruct_n(0, flat_index.ntotal))
+
+
+def supports_removal(index) -> bool:
+    """
+    remove_ids ne convient qu'aux index à codes contigus (flat, sq8): les ids suivants sont décalés,
+    comme le suppose LangChain (FAISS.delete). IVF conserve les ids d'origine et HNSW ne permet pas
+    de retirer des vecteurs: toute suppression impose une reconstruction (rebuild_without).
+    """
+    import faiss
+
+    return isinstance(index, (faiss.IndexFlat, faiss.IndexScalarQuantizer))
+
+
+def rebuild_without(index, keep: List[int], config: IndexConfig):
+    """
+    Index ne contenant que les rows keep (renumérotées 0..n-1), à partir des vecteurs stockés
+    (pas de ré-embedding). IVF: quantifieurs déjà entraînés réutilisés, vecteurs ré-encodés.
+    """
+    import faiss
+
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.make_direct_map()  # reconstruct_n sur un IVF
+    vectors = index.reconstruct_n(0, index.ntotal)[keep]
+    if ivf is None:
+        return create_index(config, vectors)
+    rebuilt = faiss.clone_index(index)
+    rebuilt.reset()
+    rebuilt.add(vectors)
+    return rebuilt
+
+
+def index_size_bytes(index) -> int:
+    import faiss
+
+    return int(faiss.serialize_index(index).nbytes)
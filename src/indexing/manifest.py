@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from itertools import groupby
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+
+MANIFEST_FILE = "manifest.json"
+MANIFEST_FORMAT = 1
+
+
+def chunk_id(doc: Document) -> str:
+    """Identifiant docstore stable d'un chunk: <uid>#<chunk_id>."""
+    md = doc.metadata or {}
+    return f"{md.get('uid')}#{md.get('chunk_id', 0)}"
+
+
+def iter_event_groups(docs: Iterable[Document]) -> Iterator[Tuple[str, List[Document]]]:
+    """(uid, chunks) au fil d'un flux où les chunks d'un même événement sont consécutifs."""
+    for uid, chunks in groupby(docs, key=lambda d: str((d.metadata or {}).get("uid"))):
+        yield uid, list(chunks)
+
+
+def _update_fingerprint(h, doc: Document) -> None:
+    h.update(doc.page_content.encode("utf-8"))
+    h.update(b"\0")
+    h.update(json.dumps(doc.metadata, sort_keys=True, default=str, ensure_ascii=False).encode("utf-8"))
+    h.update(b"\0")
+
+
+def event_fingerprint(chunks: List[Document]) -> str:
+    """Empreinte d'un événement: texte de ses chunks + métadonnées (tout ce qui finit dans l'index)."""
+    h = hashlib.sha256()
+    for d in chunks:
+        _update_fingerprint(h, d)
+    return h.hexdigest()
+
+
+class ManifestBuilder:
+    """
+    Manifeste construit au passage des chunks (flux de build_documents):
+    seuls l'empreinte courante et les ids de chaque uid sont gardés, pas les chunks.
+    """
+
+    def __init__(self, params: Dict[str, Any]):
+        self.params = params
+        self._hashes: Dict[str, Any] = {}
+        self._ids: Dict[str, List[str]] = {}
+
+    def add(self, doc: Document) -> None:
+        uid = str((doc.metadata or {}).get("uid"))
+        if uid not in self._hashes:
+            self._hashes[uid] = hashlib.sha256()
+            self._ids[uid] = []
+        _update_fingerprint(self._hashes[uid], doc)
+        self._ids[uid].append(chunk_id(doc))
+
+    def track(self, docs: Iterable[Document]) -> Iterator[Document]:
+        """Relaie le flux de chunks en les enregistrant dans le manifeste."""
+        for doc in docs:
+            self.add(doc)
+            yield doc
+
+    def fingerprint(self, uid: str) -> str:
+        return self._hashes[uid].hexdigest()
+
+    def __len__(self) -> int:
+        return sum(len(ids) for ids in self._ids.values())
+
+    def build(self) -> Dict[str, Any]:
+        events = {uid: {"hash": h.hexdigest(), "ids": self._ids[uid]} for uid, h in self._hashes.items()}
+        return {"format": MANIFEST_FORMAT, "params": self.params, "events": events}
+
+
+def build_manifest(docs: Iterable[Document], params: Dict[str, Any]) -> Dict[str, Any]:
+    builder = ManifestBuilder(params)
+    for d in docs:
+        builder.add(d)
+    return builder.build()
+
+
+def load_manifest(index_dir: Path) -> Optional[Dict[str, Any]]:
+    path = Path(index_dir) / MANIFEST_FILE
+    if not path.exists():
+        return None
+    data = json.loads(path.read_text(encoding="utf-8"))
+    if data.get("format") != MANIFEST_FORMAT:
+        return None
+    return data
+
+
+def save_manifest(manifest: Dict[str, Any], index_dir: Path) -> Path:
+    path = Path(index_dir) / MANIFEST_FILE
+    tmp = path.with_suffix(".json.tmp")
+    tmp.write_text(json.dumps(manifest, ensure_ascii=False), encoding="utf-8")
+    os.replace(tmp, path)
+    return path
@@ -0,0 +1,165 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+import pandas as pd
+from langchain_community.vectorstores import FAISS
+
+from src.indexing.mmap_docstore import MmapDocstore
+
+
+METADATA_INDEX_FILE = "metadata_index.npz"
+
+# Valeur sentinelle pour une date absente / illisible (= NaT en int64)
+MISSING_TS = np.iinfo(np.int64).min
+
+
+def to_epoch_seconds(values: Iterable) -> np.ndarray:
+    """
+    Convertit une liste de dates (ISO, Timestamp, None...) en epoch secondes int64,
+    en un seul appel vectorisé. Les valeurs absentes valent MISSING_TS.
+    """
+    dti = pd.to_datetime(pd.Index(list(values), dtype=object), utc=True, errors="coerce", format="ISO8601")
+    return np.asarray(dti.as_unit("s").asi8, dtype=np.int64)
+
+
+def begin_ts_of(metadatas: Sequence[Dict]) -> np.ndarray:
+    """
+    Epoch secondes de début pour un lot de métadonnées.
+    Utilise first_begin_ts (précalculé à l'indexation); pour les documents d'anciens
+    index qui n'ont pas ce champ, parse first_begin_dt en un seul appel vectorisé.
+    """
+    out = np.full(len(metadatas), MISSING_TS, dtype=np.int64)
+    legacy_pos: List[int] = []
+    legacy_values: List = []
+
+    for i, md in enumerate(metadatas):
+        md = md or {}
+        if "first_begin_ts" in md:
+            ts = md["first_begin_ts"]
+            if ts is not None:
+                out[i] = int(ts)
+        else:
+            legacy_pos.append(i)
+            legacy_values.append(md.get("first_begin_dt"))
+
+    if legacy_pos:
+        out[legacy_pos] = to_epoch_seconds(legacy_values)
+    return out
+
+
+def ensure_epoch_metadata(vectorstore: FAISS) -> int:
+    """
+    Migration des index construits sans first_begin_ts: ajoute le champ aux
+    métadonnées du docstore (en place). Retourne le nombre de documents modifiés.
+    """
+    if isinstance(vectorstore.docstore, MmapDocstore):
+        return 0  # format postérieur à first_begin_ts: rien à migrer, et rien à matérialiser
+    docs = [vectorstore.docstore.search(_id) for _id in vectorstore.index_to_docstore_id.values()]
+    legacy = [d for d in docs if "first_begin_ts" not in (getattr(d, "metadata", None) or {})]
+    if not legacy:
+        return 0
+
+    ts = to_epoch_seconds([d.metadata.get("first_begin_dt") for d in legacy])
+    for d, value in zip(legacy, ts):
+        d.metadata["first_begin_ts"] = None if value == MISSING_TS else int(value)
+    return len(legacy)
+
+
+@dataclass
+class MetadataIndex:
+    """
+    Colonnes de métadonnées alignées sur les row ids FAISS (row i = vecteur i).
+    Permet de calculer le masque ville / date en NumPy, avant la recherche.
+    """
+    cities: List[str]  # vocabulaire: code -> nom de ville ("" = non renseignée)
+    city_codes: np.ndarray  # int32, shape (ntotal,)
+    begin_ts: np.ndarray  # int64 epoch secondes, shape (ntotal,)
+
+    @property
+    def size(self) -> int:
+        return int(self.city_codes.shape[0])
+
+    def mask(self, allowed_cities: Optional[Set[str]] = None, min_begin_ts: Optional[int] = None) -> np.ndarray:
+        keep = np.ones(self.size, dtype=bool)
+
+        # même règle que le post-filtrage: une ville vide n'est pas exclue
+        if allowed_cities:
+            codes = [i for i, c in enumerate(self.cities) if not c or c in allowed_cities]
+            keep &= np.isin(self.city_codes, np.asarray(codes, dtype=np.int32))
+
+        # MISSING_TS est le plus petit int64: une date absente est toujours exclue
+        if min_begin_ts is not None:
+            keep &= self.begin_ts >= min_begin_ts
+
+        return keep
+
+
+def build_metadata_index(vectorstore: FAISS) -> MetadataIndex:
+    n = vectorstore.index.ntotal
+    metadatas: List[Dict] = []
+
+    for i in range(n):
+        doc = vectorstore.docstore.search(vectorstore.index_to_docstore_id[i])
+        metadatas.append(getattr(doc, "metadata", None) or {})
+
+    raw_cities = [(md.get("location_city") or "").strip() for md in metadatas]
+
+    cities = [""] + sorted({c for c in raw_cities if c})
+    code_of = {c: i for i, c in enumerate(cities)}
+    city_codes = np.fromiter((code_of[c] for c in raw_cities), dtype=np.int32, count=n)
+
+    return MetadataIndex(cities=cities, city_codes=city_codes, begin_ts=begin_ts_of(metadatas))
+
+
+def save_metadata_index(meta: MetadataIndex, index_dir: Path) -> Path:
+    path = Path(index_dir) / METADATA_INDEX_FILE
+    np.savez(
+        path,
+        cities=np.asarray(meta.cities, dtype=str),
+        city_codes=meta.city_codes,
+        begin_ts=meta.begin_ts,
+    )
+    return path
+
+
+def load_metadata_index(index_dir: Path) -> Optional[MetadataIndex]:
+    path = Path(index_dir) / METADATA_INDEX_FILE
+    if not path.exists():
+        return None
+    with np.load(path) as data:
+        return MetadataIndex(
+            cities=[str(c) for c in data["cities"]],
+            city_codes=data["city_codes"].astype(np.int32),
+            begin_ts=data["begin_ts"].astype(np.int64),
+        )
+
+
+def load_or_build_metadata_index(vectorstore: FAISS, index_dir: Path) -> MetadataIndex:
+    """
+    Charge metadata_index.npz s'il est cohérent avec l'index FAISS,
+    sinon le reconstruit en mémoire depuis le docstore (index construits avant son ajout).
+    """
+    meta = load_metadata_index(index_dir)
+    if meta is None or meta.size != vectorstore.index.ntotal:
+        meta = build_metadata_index(vectorstore)
+    return meta
+
+
+def make_search_params(mask: np.ndarray, index=None) -> Tuple[object, tuple]:
+    """
+    Construit les SearchParameters FAISS restreignant la recherche aux rows du masque.
+    Pour un index IVF, le type attendu est SearchParametersIVF (nprobe de l'index repris).
+    Retourne aussi (selector, bitmap): ils doivent rester référencés pendant la recherche.
+    """
+    import faiss
+
+    bits = np.packbits(mask.astype(bool), bitorder="little")
+    selector = faiss.IDSelectorBitmap(int(mask.shape[0]), faiss.swig_ptr(bits))
+    ivf = faiss.try_extract_index_ivf(index) if index is not None else None
+    if ivf is not None:
+        return faiss.SearchParametersIVF(sel=selector, nprobe=ivf.nprobe), (selector, bits)
+    return faiss.SearchParameters(sel=selector), (selector, bits)
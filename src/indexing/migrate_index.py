@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+from typing import Any, Dict, Optional
+
+from langchain_community.vectorstores import FAISS
+
+from src.indexing.faiss_store import (
+    DEFAULT_INDEX_DIR,
+    load_vectorstore,
+    new_version_dir,
+    publish_version,
+    resolve_index_dir,
+    save_vectorstore,
+)
+from src.indexing.manifest import ManifestBuilder, load_manifest, save_manifest
+from src.indexing.metadata_index import build_metadata_index, ensure_epoch_metadata, save_metadata_index
+
+
+def rebuild_manifest(vs: FAISS, params: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Manifeste recalculé depuis les chunks de l'index (métadonnées migrées comprises),
+    chunks d'un uid dans l'ordre de chunk_id comme à la construction.
+    """
+    docs = [vs.docstore.search(vs.index_to_docstore_id[i]) for i in range(vs.index.ntotal)]
+    docs.sort(key=lambda d: (str(d.metadata.get("uid")), int(d.metadata.get("chunk_id", 0))))
+    builder = ManifestBuilder(params)
+    for d in docs:
+        builder.add(d)
+    return builder.build()
+
+
+def main() -> dict:
+    """
+    Met à niveau un index existant sans le ré-embedder:
+    - ajoute first_begin_ts (epoch) aux métadonnées qui ne l'ont pas
+    - (re)génère metadata_index.npz
+    - réécrit le docstore au format mmap (remplace index.pkl)
+    - recalcule le manifeste (mêmes paramètres) pour que les mises à jour incrémentales continuent
+    Le résultat est publié comme nouvelle version (disposition versionnée).
+    """
+    old_manifest: Optional[Dict[str, Any]] = load_manifest(resolve_index_dir(DEFAULT_INDEX_DIR))
+    vs = load_vectorstore(DEFAULT_INDEX_DIR, writable=True)
+    migrated = ensure_epoch_metadata(vs)
+
+    version_dir = new_version_dir(DEFAULT_INDEX_DIR)
+    save_vectorstore(vs, version_dir)
+    save_metadata_index(build_metadata_index(vs), version_dir)
+    if old_manifest is not None:
+        save_manifest(rebuild_manifest(vs, old_manifest["params"]), version_dir)
+    else:
+        # paramètres de build inconnus: la prochaine mise à jour fera une reconstruction complète
+        print("No manifest to migrate: next update_index will rebuild from scratch")
+    publish_version(version_dir, DEFAULT_INDEX_DIR)
+
+    print(f"Documents migrated (first_begin_ts added): {migrated}")
+    print(f"Index version written to: {version_dir.resolve()}")
+    return {"migrated": migrated, "vectors": vs.index.ntotal, "version": version_dir.name}
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import json
+import mmap
+from pathlib import Path
+from typing import Dict, Iterator, List, Union
+
+import numpy as np
+from langchain_community.docstore.base import Docstore
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+
+
+# Docstore sur disque, à la place du pickle de LangChain (index.pkl):
+# - docstore.bin: un blob JSON {"t": texte, "m": métadonnées} par chunk, concaténés dans l'ordre des rows FAISS
+# - docstore_offsets.npy: int64 (n + 1,), le blob du row i est bin[offsets[i]:offsets[i + 1]]
+# - docstore_ids.json: id docstore de chaque row (<uid>#<chunk>)
+DOCSTORE_BLOB_FILE = "docstore.bin"
+DOCSTORE_OFFSETS_FILE = "docstore_offsets.npy"
+DOCSTORE_IDS_FILE = "docstore_ids.json"
+DOCSTORE_FILES = (DOCSTORE_BLOB_FILE, DOCSTORE_OFFSETS_FILE, DOCSTORE_IDS_FILE)
+
+
+def has_mmap_docstore(index_dir: Path) -> bool:
+    return all((Path(index_dir) / name).exists() for name in DOCSTORE_FILES)
+
+
+def _json_default(value):
+    # scalaires NumPy (anciennes métadonnées issues de pandas)
+    return value.item() if hasattr(value, "item") else str(value)
+
+
+def write_docstore(vectorstore: FAISS, index_dir: Path) -> None:
+    """Écrit le docstore de vectorstore au format mmap, dans l'ordre des rows FAISS."""
+    index_dir = Path(index_dir)
+    n = vectorstore.index.ntotal
+    ids = [vectorstore.index_to_docstore_id[i] for i in range(n)]
+    offsets = np.zeros(n + 1, dtype=np.int64)
+
+    with open(index_dir / DOCSTORE_BLOB_FILE, "wb") as f:
+        for i, _id in enumerate(ids):
+            doc = vectorstore.docstore.search(_id)
+            blob = json.dumps(
+                {"t": doc.page_content, "m": doc.metadata},
+                ensure_ascii=False,
+                default=_json_default,
+            ).encode("utf-8")
+            f.write(blob)
+            offsets[i + 1] = offsets[i] + len(blob)
+
+    np.save(index_dir / DOCSTORE_OFFSETS_FILE, offsets)
+    (index_dir / DOCSTORE_IDS_FILE).write_text(json.dumps(ids, ensure_ascii=False), encoding="utf-8")
+
+
+class MmapDocstore(Docstore):
+    """
+    Docstore en lecture seule adossé à un fichier mappé en mémoire: les pages sont
+    partagées entre workers via le cache du système, et un Document n'est construit
+    que pour les résultats effectivement renvoyés.
+    """
+
+    def __init__(self, index_dir: Path):
+        index_dir = Path(index_dir)
+        self.offsets = np.load(index_dir / DOCSTORE_OFFSETS_FILE, mmap_mode="r")
+        self.ids: List[str] = json.loads((index_dir / DOCSTORE_IDS_FILE).read_text(encoding="utf-8"))
+        self._row_of: Dict[str, int] = {_id: i for i, _id in enumerate(self.ids)}
+
+        self._mmap = None
+        with open(index_dir / DOCSTORE_BLOB_FILE, "rb") as f:
+            if int(self.offsets[-1]) > 0:  # un fichier vide ne peut pas être mappé
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def document_at(self, row: int) -> Document:
+        start, end = int(self.offsets[row]), int(self.offsets[row + 1])
+        data = json.loads(self._mmap[start:end])
+        return Document(page_content=data["t"], metadata=data["m"])
+
+    def iter_documents(self) -> Iterator[Document]:
+        for row in range(len(self.ids)):
+            yield self.document_at(row)
+
+    def search(self, search: str) -> Union[str, Document]:
+        row = self._row_of.get(search)
+        if row is None:
+            return f"ID {search} not found."  # même contrat que InMemoryDocstore
+        return self.document_at(row)
+
+    def to_in_memory(self) -> InMemoryDocstore:
+        """Copie modifiable (mise à jour incrémentale, migration)."""
+        return InMemoryDocstore(dict(zip(self.ids, self.iter_documents())))
+
+    def close(self) -> None:
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
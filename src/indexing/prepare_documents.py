@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 from pathlib import Path
-from typing import List, Dict, Tuple
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Union
 
 from dotenv import load_dotenv
 load_dotenv()
@@ -11,23 +11,87 @@ import os
 from langchain_core.documents import Document
 
 from src.indexing.chunking import build_text_splitter, chunk_event_document
+from src.indexing.metadata_index import MISSING_TS, to_epoch_seconds
+from src.preprocessing.storage import (
+    INDEX_READY_PATH,
+    LEGACY_INDEX_READY_PATH,
+    iter_index_ready_batches,
+    read_index_ready,
+)
+
+
+# colonnes lues pour construire les documents (projection Parquet)
+DOCUMENT_COLUMNS = [
+    "uid", "origin_url", "agenda_uid",
+    "first_begin_dt", "first_end_dt",
+    "location_name", "location_address", "location_city", "location_postal",
+    "location_lat", "location_lon",
+    "type_devenement", "document",
+]
+METADATA_DATE_COLUMNS = ["first_begin_dt", "first_end_dt"]
+# lignes par lot lu / découpé: borne la mémoire de la préparation, indépendamment du nombre d'événements
+FRAME_ROWS = int(os.getenv("RAG_PREPARE_BATCH_ROWS", "2000"))
+
+
+def _resolve_path(path: Path) -> Path:
+    if path == INDEX_READY_PATH and not path.exists() and LEGACY_INDEX_READY_PATH.exists():
+        path = LEGACY_INDEX_READY_PATH  # export JSONL antérieur au format Parquet
+    if not path.exists():
+        raise FileNotFoundError(f"Missing file: {path}")
+    return path
 
 
-INDEX_READY_PATH = Path("data/processed/events_index_ready.jsonl")
+def load_index_ready(path: Path = INDEX_READY_PATH, columns: Optional[Sequence[str]] = DOCUMENT_COLUMNS) -> pd.DataFrame:
+    path = _resolve_path(path)
+    if path.suffix == ".jsonl":
+        df = pd.read_json(path, lines=True)
+        return df[[c for c in columns if c in df.columns]] if columns else df
+    return read_index_ready(path, columns=columns)
 
 
-def load_index_ready(path: Path = INDEX_READY_PATH) -> pd.DataFrame:
-    if not path.exists():
-        raise FileNotFoundError(f"Missing file: {path}")
-    return pd.read_json(path, lines=True)
+def iter_index_ready(
+    path: Path = INDEX_READY_PATH,
+    columns: Optional[Sequence[str]] = DOCUMENT_COLUMNS,
+    batch_rows: int = FRAME_ROWS,
+) -> Iterator[pd.DataFrame]:
+    """Jeu "index ready" lu par lots de lignes (l'ancien export JSONL est lu d'un bloc)."""
+    path = _resolve_path(path)
+    if path.suffix == ".jsonl":
+        yield load_index_ready(path, columns)
+        return
+    yield from iter_index_ready_batches(path, columns=columns, batch_rows=batch_rows)
+
+
+def _iso_strings(values: pd.Series) -> pd.Series:
+    """Timestamps -> chaînes ISO (format de l'ancien export JSONL), stockées telles quelles en métadonnées."""
+    if not pd.api.types.is_datetime64_any_dtype(values):
+        return values
+    out = values.dt.tz_convert("UTC").dt.strftime("%Y-%m-%dT%H:%M:%S.%f").str[:-3] + "Z"
+    return out.where(values.notna(), None)
 
 
 def _clean_nan(x):
     return None if pd.isna(x) else x
 
 
-def row_to_metadata(row: pd.Series) -> Dict:
-    agenda_slug = os.getenv("OPENAGENDA_AGENDA_UID")  # ex: universite-paris-saclay
+def _begin_ts(row):
+    # précalculé en colonne par iter_documents; sinon calcul ponctuel
+    ts = row.get("first_begin_ts")
+    if ts is None:
+        ts = to_epoch_seconds([row.get("first_begin_dt")])[0]
+    return None if ts == MISSING_TS else int(ts)
+
+
+def default_agenda_slug() -> Optional[str]:
+    # exports antérieurs: premier agenda configuré, ex: universite-paris-saclay
+    return (os.getenv("OPENAGENDA_AGENDA_UID") or "").split(",")[0].strip() or None
+
+
+def row_to_metadata(row, default_agenda: Optional[str] = None) -> Dict:
+    """Métadonnées d'un événement; row est une ligne (Series) ou un dict colonne -> valeur."""
+    agenda_slug = _clean_nan(row.get("agenda_uid"))  # agenda d'origine (collecte multi-agendas)
+    if not agenda_slug:
+        agenda_slug = default_agenda if default_agenda is not None else default_agenda_slug()
     agenda_url = f"https://openagenda.com/fr/{agenda_slug}"
 
     return {
@@ -36,6 +100,7 @@ def row_to_metadata(row: pd.Series) -> Dict:
         "agenda_slug": agenda_slug,
         "agenda_url": agenda_url,
         "first_begin_dt": _clean_nan(row.get("first_begin_dt")),
+        "first_begin_ts": _begin_ts(row),  # epoch secondes UTC, filtré sans parsing à la requête
         "first_end_dt": _clean_nan(row.get("first_end_dt")),
         "location_name": _clean_nan(row.get("location_name")),
         "location_address": _clean_nan(row.get("location_address")),
@@ -47,28 +112,56 @@ def row_to_metadata(row: pd.Series) -> Dict:
     }
 
 
-def build_documents(df: pd.DataFrame, chunk_size: int = 800, chunk_overlap: int = 120) -> List[Document]:
+def _frame_records(df: pd.DataFrame) -> Iterator[Dict]:
+    # une seule conversion vectorisée de la colonne date -> epoch, par lot
+    df = df.assign(first_begin_ts=to_epoch_seconds(df["first_begin_dt"]))
+    df = df.assign(**{c: _iso_strings(df[c]) for c in METADATA_DATE_COLUMNS if c in df.columns})
+    columns = list(df.columns)
+    for values in df.itertuples(index=False, name=None):
+        yield dict(zip(columns, values))
+
+
+def iter_documents(
+    frames: Union[pd.DataFrame, Iterable[pd.DataFrame]],
+    chunk_size: int = 800,
+    chunk_overlap: int = 120,
+) -> Iterator[Document]:
+    """
+    Documents (chunks) produits à la demande, événement par événement.
+    frames: un DataFrame ou des lots successifs (cf. iter_index_ready); les chunks
+    d'un même événement sont consécutifs.
+    """
+    if isinstance(frames, pd.DataFrame):
+        frames = [frames]
     splitter = build_text_splitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    default_agenda = default_agenda_slug()
 
-    docs: List[Document] = []
-    for _, row in df.iterrows():
-        doc_text = row.get("document", "") or ""
-        md = row_to_metadata(row)
+    for df in frames:
+        for record in _frame_records(df):
+            doc_text = record.get("document", "") or ""
+            md = row_to_metadata(record, default_agenda)
+            for chunk_text, chunk_md in chunk_event_document(doc_text, md, splitter):
+                yield Document(page_content=chunk_text, metadata=chunk_md)
 
-        for chunk_text, chunk_md in chunk_event_document(doc_text, md, splitter):
-            docs.append(Document(page_content=chunk_text, metadata=chunk_md))
 
-    return docs
+def build_documents(df: pd.DataFrame, chunk_size: int = 800, chunk_overlap: int = 120) -> List[Document]:
+    return list(iter_documents(df, chunk_size=chunk_size, chunk_overlap=chunk_overlap))
 
 
 def main():
-    df = load_index_ready()
-    docs = build_documents(df)
-    print(f"Events: {len(df)}")
-    print(f"Chunks/Documents: {len(docs)}")
-    if docs:
-        print("Sample doc metadata:", docs[0].metadata)
-        print("Sample doc text:", docs[0].page_content[:200])
+    rows = 0
+    chunks = 0
+    sample = None
+    for df in iter_index_ready():
+        rows += len(df)
+        for doc in iter_documents(df):
+            chunks += 1
+            sample = sample or doc
+    print(f"Events: {rows}")
+    print(f"Chunks/Documents: {chunks}")
+    if sample:
+        print("Sample doc metadata:", sample.metadata)
+        print("Sample doc text:", sample.page_content[:200])
 
 
 if __name__ == "__main__":
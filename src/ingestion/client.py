@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+import os
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+DEFAULT_BASE_URL = "https://api.openagenda.com/v2"
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class RateLimiter:
+    """Espace les requêtes pour ne pas dépasser rate_per_s (partagé entre threads)."""
+
+    def __init__(self, rate_per_s: float):
+        self.interval = 1.0 / rate_per_s if rate_per_s > 0 else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self) -> None:
+        if self.interval <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def _retry_after_s(response: requests.Response) -> Optional[float]:
+    """En-tête Retry-After (secondes ou date HTTP), None si absent ou illisible."""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class OpenAgendaClient:
+    """
+    Client OpenAgenda: une session HTTP (connexions keep-alive réutilisées),
+    retries avec backoff exponentiel sur 429/5xx et erreurs réseau (Retry-After respecté)
+    et plafond de débit commun à tous les threads, appliqué à chaque tentative.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        base_url: str = DEFAULT_BASE_URL,
+        rate_per_s: float = 5.0,
+        max_retries: int = 5,
+        backoff_factor: float = 0.5,
+        pool_size: int = 10,
+        timeout: float = 30,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.limiter = RateLimiter(rate_per_s)
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+
+        # retries gérés par _get (pas par urllib3): chaque tentative passe par le limiteur
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({"key": api_key, "lang": "fr"})
+
+    def fetch_page(self, agenda_uid: str, size: int = 100, after=None, filters: Optional[dict] = None) -> dict:
+        params = {"size": size, **(filters or {})}
+        if after is not None:
+            params["after"] = after
+
+        r = self._get(f"{self.base_url}/agendas/{agenda_uid}/events", params=params)
+        if r.status_code != 200:
+            raise RuntimeError(f"OpenAgenda API error {r.status_code}: {r.text[:500]}")
+        return r.json()
+
+    def _get(self, url: str, params: dict) -> requests.Response:
+        """GET avec retries; la dernière réponse en erreur remonte telle quelle."""
+        attempt = 0
+        while True:
+            self.limiter.wait()
+            delay = self.backoff_factor * 2 ** attempt
+            try:
+                r = self.session.get(url, params=params, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt >= self.max_retries:
+                    raise
+            else:
+                if r.status_code not in RETRY_STATUSES or attempt >= self.max_retries:
+                    return r
+                retry_after = _retry_after_s(r)
+                delay = retry_after if retry_after is not None else delay
+            time.sleep(delay)
+            attempt += 1
+
+    def close(self) -> None:
+        self.session.close()
+
+
+def client_from_env(api_key: Optional[str] = None) -> OpenAgendaClient:
+    """
+    OPENAGENDA_BASE_URL, OPENAGENDA_RATE_PER_S (défaut 5 requêtes/s, 0 = illimité),
+    OPENAGENDA_MAX_RETRIES (défaut 5), OPENAGENDA_BACKOFF_S (défaut 0.5).
+    """
+    return OpenAgendaClient(
+        api_key=api_key or os.getenv("OPENAGENDA_API_KEY", ""),
+        base_url=os.getenv("OPENAGENDA_BASE_URL", DEFAULT_BASE_URL),
+        rate_per_s=float(os.getenv("OPENAGENDA_RATE_PER_S", "5")),
+        max_retries=int(os.getenv("OPENAGENDA_MAX_RETRIES", "5")),
+        backoff_factor=float(os.getenv("OPENAGENDA_BACKOFF_S", "0.5")),
+    )
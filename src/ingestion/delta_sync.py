@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+from dotenv import load_dotenv
+
+import src.preprocessing.clean_events as clean_events
+from src.ingestion import fetch_openagenda_all
+from src.ingestion.client import OpenAgendaClient, client_from_env
+from src.ingestion.fetch_openagenda_all import RAW_DIR, fetch_page, iter_pages, parse_agenda_uids
+from src.preprocessing.storage import INDEX_READY_FILE, read_index_ready
+
+
+SYNC_STATE_PATH = RAW_DIR / "sync_state.json"
+# rapport de la dernière synchronisation (dans clean_events.OUT_DIR), pour le suivi; l'indexation
+# incrémentale ne le lit pas: elle retrouve les mêmes événements via les empreintes du manifeste
+CHANGES_FILE = "changed_uids.json"
+
+# codes OpenAgenda: status 6 = annulé, state 2 = publié
+CANCELLED_STATUS = 6
+PUBLISHED_STATE = 2
+
+
+def is_removed(ev: dict) -> bool:
+    """Événement supprimé, annulé ou dépublié: il doit sortir du jeu indexé."""
+    if ev.get("deletedAt") or ev.get("deleted"):
+        return True
+    if ev.get("status") == CANCELLED_STATUS:
+        return True
+    state = ev.get("state")
+    return state is not None and state != PUBLISHED_STATE
+
+
+def _parse_iso(value: Optional[str]) -> Optional[datetime]:
+    try:
+        return datetime.fromisoformat(value) if value else None
+    except ValueError:
+        return None
+
+
+def max_updated_at(events: Iterable[dict], current: Optional[str] = None) -> Optional[str]:
+    """Plus grand updatedAt vu (chaîne ISO telle que renvoyée par l'API)."""
+    best, best_dt = current, _parse_iso(current)
+    for ev in events:
+        dt = _parse_iso(ev.get("updatedAt"))
+        if dt is not None and (best_dt is None or dt > best_dt):
+            best, best_dt = ev["updatedAt"], dt
+    return best
+
+
+def load_sync_state(path: Path = SYNC_STATE_PATH) -> Optional[dict]:
+    if not path.exists():
+        return None
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def _write_json(data: dict, path: Path) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def fetch_updated_events(
+    client: OpenAgendaClient,
+    agenda_uids: List[str],
+    since: Optional[str],
+    size: int = 100,
+    max_workers: int = 4,
+) -> List[dict]:
+    """Événements modifiés depuis `since` (updatedAt >= since) sur tous les agendas."""
+    filters = {"updatedAt[gte]": since, "sort": "updatedAt.asc"} if since else None
+
+    def run(uid: str) -> List[dict]:
+        pages = iter_pages(lambda after: fetch_page(client, uid, size=size, after=after, filters=filters))
+        return [ev for events, _ in pages for ev in events]
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(agenda_uids)))) as pool:
+        results = list(pool.map(run, agenda_uids))
+    return [ev for events in results for ev in events]
+
+
+def merge_delta(current: pd.DataFrame, events: List[dict], now_utc: datetime) -> Tuple[pd.DataFrame, Dict[str, List[str]]]:
+    """
+    Fusionne les événements modifiés dans le jeu "index ready" par uid.
+    Retourne (nouveau jeu, {"upserted": [...], "removed": [...]}).
+    """
+    # dernière version de chaque uid (réponses triées par updatedAt croissant)
+    latest = {str(ev.get("uid")): ev for ev in events}
+    live = [ev for ev in latest.values() if not is_removed(ev)]
+
+    if live:
+        fresh = clean_events.finalize_index_frame(clean_events.filter_events(clean_events.to_dataframe(live), now_utc))
+    else:
+        fresh = current.iloc[0:0]
+
+    kept = current[~current["uid"].isin(latest)]
+    # fenêtre glissante: les événements de plus d'un an sortent aussi de l'index
+    in_window = kept["first_begin_dt"] >= now_utc - timedelta(days=365)
+    expired = set(kept.loc[~in_window, "uid"])
+    kept = kept[in_window]
+
+    # modifiés mais annulés / supprimés / devenus trop pauvres pour être indexés
+    dropped = (set(latest) - set(fresh["uid"])) & set(current["uid"])
+
+    merged = pd.concat([kept, fresh], ignore_index=True)
+    changes = {"upserted": sorted(fresh["uid"]), "removed": sorted(dropped | expired)}
+    return merged, changes
+
+
+def full_sync() -> dict:
+    """Premier passage: collecte + nettoyage complets, puis enregistrement du watermark."""
+    fetch_openagenda_all.main()
+    clean_events.main()
+    return {"mode": "full", "watermark": max_updated_at(clean_events.iter_raw_events(fetch_openagenda_all.RAW_JSONL_PATH))}
+
+
+def main() -> dict:
+    load_dotenv()
+    state = load_sync_state()
+    index_ready = clean_events.OUT_DIR / INDEX_READY_FILE
+    now_utc = datetime.now(timezone.utc)
+
+    if state is None or not index_ready.exists():
+        print("No sync watermark: full sync")
+        result = full_sync()
+        _write_json({"watermark": result["watermark"], "synced_at": now_utc.isoformat()}, SYNC_STATE_PATH)
+        print(f"Watermark: {result['watermark']}")
+        return result
+
+    api_key = os.getenv("OPENAGENDA_API_KEY")
+    agenda_uids = parse_agenda_uids(os.getenv("OPENAGENDA_AGENDA_UID"))
+    if not api_key or not agenda_uids:
+        raise RuntimeError("OPENAGENDA_API_KEY ou OPENAGENDA_AGENDA_UID manquant dans .env")
+
+    client = client_from_env(api_key)
+    try:
+        events = fetch_updated_events(
+            client,
+            agenda_uids,
+            since=state["watermark"],
+            size=int(os.getenv("OPENAGENDA_PAGE_SIZE", "100")),
+            max_workers=int(os.getenv("OPENAGENDA_MAX_CONCURRENCY", "4")),
+        )
+    finally:
+        client.close()
+
+    df_index, changes = merge_delta(read_index_ready(index_ready), events, now_utc)
+    clean_events.export_index(df_index)
+
+    watermark = max_updated_at(events, state["watermark"])
+    result = {"mode": "delta", "since": state["watermark"], "watermark": watermark, "fetched": len(events), **changes}
+    _write_json(result, clean_events.OUT_DIR / CHANGES_FILE)
+    # le watermark n'avance qu'une fois l'export écrit
+    _write_json({"watermark": watermark, "synced_at": now_utc.isoformat()}, SYNC_STATE_PATH)
+
+    print(f"Delta sync: {len(events)} updated events, {len(changes['upserted'])} upserted, {len(changes['removed'])} removed")
+    return result
+
+
+if __name__ == "__main__":
+    main()
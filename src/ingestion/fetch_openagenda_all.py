@@ -1,59 +1,181 @@
 import json
 import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
 
-import requests
 from dotenv import load_dotenv
 
+from src.ingestion.client import OpenAgendaClient, client_from_env
 
-def fetch_page(agenda_uid: str, api_key: str, base_url: str, size: int = 100, after=None) -> dict:
-    url = f"{base_url}/agendas/{agenda_uid}/events"
-    headers = {"key": api_key, "lang": "fr"}
-    params = {"size": size}
-    if after is not None:
-        params["after"] = after
 
-    r = requests.get(url, headers=headers, params=params, timeout=30)
-    if r.status_code != 200:
-        raise RuntimeError(f"OpenAgenda API error {r.status_code}: {r.text[:500]}")
-    return r.json()
+RAW_DIR = Path("data/raw")
+RAW_JSONL_PATH = RAW_DIR / "openagenda_events_all.jsonl"
+AGENDAS_DIR = RAW_DIR / "agendas"  # un JSONL (et un curseur) par agenda
+# présent seulement tant qu'une collecte n'est pas terminée: permet de reprendre après un crash
+CURSOR_SUFFIX = ".cursor.json"
 
 
-def main():
-    load_dotenv()
-    base_url = os.getenv("OPENAGENDA_BASE_URL", "https://api.openagenda.com/v2")
-    api_key = os.getenv("OPENAGENDA_API_KEY")
-    agenda_uid = os.getenv("OPENAGENDA_AGENDA_UID")
+def parse_agenda_uids(value: Optional[str]) -> List[str]:
+    """OPENAGENDA_AGENDA_UID accepte une liste séparée par des virgules."""
+    uids = [u.strip() for u in (value or "").split(",")]
+    return list(dict.fromkeys(u for u in uids if u))
 
-    if not api_key or not agenda_uid:
-        raise RuntimeError("OPENAGENDA_API_KEY ou OPENAGENDA_AGENDA_UID manquant dans .env")
 
-    size = int(os.getenv("OPENAGENDA_PAGE_SIZE", "100"))
+def fetch_page(client: OpenAgendaClient, agenda_uid: str, size: int = 100, after=None, filters: Optional[dict] = None) -> dict:
+    data = client.fetch_page(agenda_uid, size=size, after=after, filters=filters)
+    # l'agenda d'origine suit l'événement jusqu'aux métadonnées de l'index
+    for ev in data.get("events") or data.get("data") or []:
+        ev.setdefault("agendaUid", agenda_uid)
+    return data
 
-    all_events = []
-    after = None
-    page = 0
 
+def iter_pages(fetch: Callable[[object], dict], after=None) -> Iterator[Tuple[List[dict], object]]:
+    """Parcourt la pagination par curseur: (événements de la page, curseur suivant)."""
     while True:
-        page += 1
-        data = fetch_page(agenda_uid, api_key, base_url, size=size, after=after)
-
+        data = fetch(after)
         events = data.get("events") or data.get("data") or []
         if not events:
-            break
-
-        all_events.extend(events)
+            return
         after = data.get("after")  # pagination par curseur
-        print(f"Page {page}: +{len(events)} (total={len(all_events)})")
-
+        yield events, after
         if after is None:
-            break
+            return
+
+
+def cursor_path_for(out_path: Path) -> Path:
+    return out_path.with_name(out_path.name + CURSOR_SUFFIX)
+
+
+def _load_cursor(cursor_path: Path) -> Optional[dict]:
+    if not cursor_path.exists():
+        return None
+    return json.loads(cursor_path.read_text(encoding="utf-8"))
+
+
+def _save_cursor(cursor: dict, cursor_path: Path) -> None:
+    tmp = cursor_path.with_name(cursor_path.name + ".tmp")
+    tmp.write_text(json.dumps(cursor, ensure_ascii=False), encoding="utf-8")
+    os.replace(tmp, cursor_path)
+
+
+def stream_events_to_jsonl(fetch: Callable[[object], dict], out_path: Path = RAW_JSONL_PATH) -> dict:
+    """
+    Écrit un événement par ligne au fil des pages (mémoire constante).
+    Après chaque page, le curseur `after` et la taille du fichier sont sauvegardés:
+    si la collecte précédente a été interrompue, on tronque à la dernière page
+    complète et on reprend à partir de son curseur (rien à refaire si c'était la dernière).
+    """
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    cursor_path = cursor_path_for(out_path)
+    cursor = _load_cursor(cursor_path) if out_path.exists() else None
+
+    if cursor is not None and cursor["pages"] > 0 and cursor["after"] is None:
+        # dernière page déjà écrite (crash avant la suppression du curseur): rien à refaire
+        with open(out_path, "r+b") as f:
+            f.truncate(cursor["offset"])
+        cursor_path.unlink(missing_ok=True)
+        print(f"Already complete: {cursor['pages']} pages ({cursor['events']} events)")
+        return {"path": str(out_path), "pages": cursor["pages"], "events": cursor["events"]}
+
+    if cursor is not None:
+        print(f"Resuming after page {cursor['pages']} ({cursor['events']} events)")
+        f = open(out_path, "r+b")
+        f.truncate(cursor["offset"])  # page à moitié écrite avant le crash
+        f.seek(cursor["offset"])
+    else:
+        cursor = {"after": None, "offset": 0, "pages": 0, "events": 0}
+        f = open(out_path, "wb")
+
+    with f:
+        for events, after in iter_pages(fetch, cursor["after"]):
+            for ev in events:
+                f.write(json.dumps(ev, ensure_ascii=False).encode("utf-8") + b"\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+            cursor = {
+                "after": after,
+                "offset": f.tell(),
+                "pages": cursor["pages"] + 1,
+                "events": cursor["events"] + len(events),
+            }
+            _save_cursor(cursor, cursor_path)
+            print(f"Page {cursor['pages']}: +{len(events)} (total={cursor['events']})")
+
+    # collecte complète: plus rien à reprendre
+    cursor_path.unlink(missing_ok=True)
+    return {"path": str(out_path), "pages": cursor["pages"], "events": cursor["events"]}
+
+
+def _merge_jsonl(paths: List[Path], out_path: Path) -> None:
+    tmp = out_path.with_name(out_path.name + ".tmp")
+    with tmp.open("wb") as out:
+        for path in paths:
+            with path.open("rb") as f:
+                shutil.copyfileobj(f, out)
+    os.replace(tmp, out_path)
+
+
+def fetch_agendas(
+    client: OpenAgendaClient,
+    agenda_uids: List[str],
+    out_path: Path = RAW_JSONL_PATH,
+    size: int = 100,
+    max_workers: int = 4,
+    agendas_dir: Optional[Path] = None,
+) -> dict:
+    """
+    Collecte plusieurs agendas en parallèle (un thread par agenda, même session HTTP
+    et même plafond de débit), chacun dans son JSONL reprenable, puis les concatène dans out_path.
+    """
+    agendas_dir = agendas_dir or out_path.parent / AGENDAS_DIR.name
+    paths = {uid: agendas_dir / f"{uid}.jsonl" for uid in agenda_uids}
+
+    def run(uid: str) -> dict:
+        return stream_events_to_jsonl(lambda after: fetch_page(client, uid, size=size, after=after), paths[uid])
+
+    results: Dict[str, dict] = {}
+    errors: Dict[str, str] = {}
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(agenda_uids)))) as pool:
+        futures = {uid: pool.submit(run, uid) for uid in agenda_uids}
+        for uid, fut in futures.items():
+            try:
+                results[uid] = fut.result()
+            except Exception as e:
+                errors[uid] = str(e)
+
+    if errors:
+        # les agendas terminés sont conservés, les autres reprendront à leur curseur
+        raise RuntimeError(f"Échec de la collecte pour {sorted(errors)}: {errors}")
+
+    _merge_jsonl([paths[uid] for uid in agenda_uids], out_path)
+    return {
+        "path": str(out_path),
+        "events": sum(r["events"] for r in results.values()),
+        "agendas": {uid: r["events"] for uid, r in results.items()},
+    }
 
-    out_dir = Path("data/raw")
-    out_dir.mkdir(parents=True, exist_ok=True)
-    out_path = out_dir / "openagenda_events_all.json"
-    out_path.write_text(json.dumps({"events": all_events}, ensure_ascii=False, indent=2), encoding="utf-8")
-    print(f"Saved: {out_path} ({len(all_events)} events)")
+
+def main():
+    load_dotenv()
+    api_key = os.getenv("OPENAGENDA_API_KEY")
+    agenda_uids = parse_agenda_uids(os.getenv("OPENAGENDA_AGENDA_UID"))
+
+    if not api_key or not agenda_uids:
+        raise RuntimeError("OPENAGENDA_API_KEY ou OPENAGENDA_AGENDA_UID manquant dans .env")
+
+    size = int(os.getenv("OPENAGENDA_PAGE_SIZE", "100"))
+    max_workers = int(os.getenv("OPENAGENDA_MAX_CONCURRENCY", "4"))
+
+    client = client_from_env(api_key)
+    try:
+        stats = fetch_agendas(client, agenda_uids, RAW_JSONL_PATH, size=size, max_workers=max_workers)
+    finally:
+        client.close()
+    print(f"Saved: {stats['path']} ({stats['events']} events from {len(agenda_uids)} agenda(s))")
+    return stats
 
 
 if __name__ == "__main__":
@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+import json
+import os
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import pandas as pd
+
+from src.preprocessing.clean_events import build_document_texts, to_dataframe
+
+
+OUT_PATH = Path("data/bench/clean_events.json")
+
+CITIES = ["Orsay", "Gif-sur-Yvette", "Palaiseau", "Paris", "Sceaux", "Évry"]
+WORDS = ["conférence", "atelier", "climat", "biologie", "musique", "campus", "robotique", "santé", "exposition"]
+
+
+def make_synthetic_events(n: int, seed: int = 0) -> list[dict]:
+    """Dump OpenAgenda synthétique: champs imbriqués, offsets variés, champs manquants."""
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    events = []
+    for i in range(n):
+        begin = start + timedelta(minutes=rng.randrange(0, 3 * 365 * 24 * 60))
+        tz = timezone(timedelta(hours=rng.choice([0, 1, 2])))
+        ev = {
+            "uid": 10_000_000 + i,
+            "title": {"fr": f"{rng.choice(WORDS).capitalize()} {i} " + " ".join(rng.choices(WORDS, k=3))},
+            "description": {"fr": " ".join(rng.choices(WORDS, k=rng.randrange(0, 40)))},
+            "keywords": {"fr": rng.sample(WORDS, k=rng.randrange(0, 4))},
+            "thematique": [rng.randrange(1, 20)],
+            "type-devenement": rng.randrange(1, 8),
+            "firstTiming": {"begin": begin.astimezone(tz).isoformat(), "end": (begin + timedelta(hours=2)).astimezone(tz).isoformat()},
+            "lastTiming": {"begin": begin.isoformat(), "end": (begin + timedelta(hours=2)).isoformat()},
+            "originalUrl": f"https://example.org/events/{i}" if i % 3 else None,
+            "url": f"https://openagenda.com/events/{i}",
+        }
+        if i % 10:
+            ev["location"] = {
+                "name": f"Salle {rng.randrange(100)}",
+                "address": f"{rng.randrange(1, 200)} rue de la Science",
+                "city": rng.choice(CITIES),
+                "postalCode": "91400",
+                "latitude": 48.7 + rng.random() / 10,
+                "longitude": 2.1 + rng.random() / 10,
+            }
+        if i % 50 == 0:
+            del ev["firstTiming"]  # événement sans date
+        events.append(ev)
+    return events
+
+
+# --- implémentation précédente (ligne à ligne), référence du benchmark ---
+
+def _get(d: dict, path: str, default=None):
+    cur = d
+    for key in path.split("."):
+        if not isinstance(cur, dict) or key not in cur:
+            return default
+        cur = cur[key]
+    return cur
+
+
+def _parse_dt(s: str | None):
+    if not s:
+        return pd.NaT
+    return pd.to_datetime(s, errors="coerce", utc=True)
+
+
+def legacy_to_dataframe(events: list[dict]) -> pd.DataFrame:
+    rows = []
+    for ev in events:
+        rows.append({
+            "uid": ev.get("uid"),
+            "title_fr": _get(ev, "title.fr"),
+            "description_fr": _get(ev, "description.fr"),
+            "keywords_fr": _get(ev, "keywords.fr", []),
+            "thematique": _get(ev, "thematique", []),
+            "type_devenement": _get(ev, "type-devenement"),
+            "first_begin": _get(ev, "firstTiming.begin"),
+            "first_end": _get(ev, "firstTiming.end"),
+            "last_begin": _get(ev, "lastTiming.begin"),
+            "last_end": _get(ev, "lastTiming.end"),
+            "location_name": _get(ev, "location.name"),
+            "location_address": _get(ev, "location.address"),
+            "location_city": _get(ev, "location.city"),
+            "location_postal": _get(ev, "location.postalCode"),
+            "location_lat": _get(ev, "location.latitude"),
+            "location_lon": _get(ev, "location.longitude"),
+            "origin_url": ev.get("originalUrl") or ev.get("url"),
+            "agenda_uid": ev.get("agendaUid"),
+        })
+    df = pd.DataFrame(rows)
+    for col in ["first_begin", "first_end", "last_begin", "last_end"]:
+        df[f"{col}_dt"] = df[col].apply(_parse_dt)
+    df["title_fr"] = df["title_fr"].fillna("").astype(str).str.strip()
+    df["description_fr"] = df["description_fr"].fillna("").astype(str).str.strip()
+    return df.dropna(subset=["first_begin_dt"]).reset_index(drop=True)
+
+
+def legacy_build_document_text(row) -> str:
+    date_str = ""
+    if pd.notna(row["first_begin_dt"]):
+        date_str = row["first_begin_dt"].strftime("%Y-%m-%d %H:%M UTC")
+
+    keywords = row.get("keywords_fr") or []
+    keywords = [str(k).strip() for k in keywords if k is not None and str(k).strip()]
+
+    parts = [
+        f"Titre: {row.get('title_fr','')}",
+        f"Description: {row.get('description_fr','')}",
+        f"Date: {date_str}",
+        f"Lieu: {row.get('location_name','')}",
+        f"Adresse: {row.get('location_address','')}",
+        f"Ville: {row.get('location_city','')}",
+        f"Mots-clés: {', '.join(keywords)}",
+    ]
+    return "\n".join([p for p in parts if p and not p.endswith(": ")])
+
+
+def _timed(fn, *args):
+    t0 = time.perf_counter()
+    out = fn(*args)
+    return out, time.perf_counter() - t0
+
+
+def run_benchmark(n: int, seed: int = 0) -> dict:
+    events = make_synthetic_events(n, seed)
+
+    df_old, t_df_old = _timed(legacy_to_dataframe, events)
+    df_new, t_df_new = _timed(to_dataframe, events)
+    docs_old, t_doc_old = _timed(lambda df: df.apply(legacy_build_document_text, axis=1).tolist(), df_new)
+    docs_new, t_doc_new = _timed(build_document_texts, df_new)
+
+    # même résultat que l'implémentation ligne à ligne
+    pd.testing.assert_frame_equal(df_old, df_new[df_old.columns], check_dtype=False)
+    assert docs_old == docs_new
+
+    return {
+        "events": n,
+        "rows": len(df_new),
+        "to_dataframe_s": {"legacy": round(t_df_old, 3), "vectorized": round(t_df_new, 3), "speedup": round(t_df_old / t_df_new, 1)},
+        "documents_s": {"legacy": round(t_doc_old, 3), "vectorized": round(t_doc_new, 3), "speedup": round(t_doc_old / t_doc_new, 1)},
+    }
+
+
+def main() -> dict:
+    n = int(os.getenv("BENCH_EVENTS", "100000"))
+    result = run_benchmark(n)
+
+    OUT_PATH.parent.mkdir(parents=True, exist_ok=True)
+    OUT_PATH.write_text(json.dumps(result, indent=2), encoding="utf-8")
+    print(json.dumps(result, indent=2))
+    print(f"Saved: {OUT_PATH}")
+    return result
+
+
+if __name__ == "__main__":
+    main()
@@ -1,30 +1,25 @@
 import json
 from datetime import datetime, timedelta, timezone
+from itertools import islice
 from pathlib import Path
+from typing import Iterable, Iterator
 
+import numpy as np
 import pandas as pd
 
-
-# RAW_PATH = Path("data/raw/openagenda_events_page1.json")
-RAW_PATH = Path("data/raw/openagenda_events_all.json")
-OUT_DIR = Path("data/processed")
+from src.preprocessing.storage import INDEX_COLUMNS, INDEX_READY_FILE, PROCESSED_DIR, write_index_ready
 
 
-def _get(d: dict, path: str, default=None):
-    """Safe nested getter: path like 'firstTiming.begin'."""
-    cur = d
-    for key in path.split("."):
-        if not isinstance(cur, dict) or key not in cur:
-            return default
-        cur = cur[key]
-    return cur
+# RAW_PATH = Path("data/raw/openagenda_events_page1.json")
+RAW_PATH = Path("data/raw/openagenda_events_all.jsonl")  # un événement par ligne (fetch_openagenda_all)
+LEGACY_RAW_PATH = Path("data/raw/openagenda_events_all.json")
+OUT_DIR = PROCESSED_DIR
 
+# nombre d'événements bruts convertis en DataFrame à la fois
+CLEAN_CHUNK_SIZE = 2000
 
-def _parse_dt(s: str | None):
-    if not s:
-        return pd.NaT
-    # OpenAgenda dates are ISO-8601 with timezone offset, e.g. "2025-03-07T00:00:00+01:00"
-    return pd.to_datetime(s, errors="coerce", utc=True)
+# Schéma stable pour une sortie clean (types: storage.INDEX_SCHEMA)
+FINAL_COLS = INDEX_COLUMNS
 
 
 def load_raw_events(raw_path: Path) -> list[dict]:
@@ -36,40 +31,89 @@ def load_raw_events(raw_path: Path) -> list[dict]:
     return events
 
 
-def to_dataframe(events: list[dict]) -> pd.DataFrame:
-    rows = []
+def iter_raw_events(raw_path: Path) -> Iterator[dict]:
+    """Événements bruts un par un: JSONL lu ligne à ligne, ancien export JSON chargé d'un bloc."""
+    if raw_path.suffix != ".jsonl":
+        yield from load_raw_events(raw_path)
+        return
+    with raw_path.open(encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def iter_chunks(events: Iterable[dict], chunk_size: int = CLEAN_CHUNK_SIZE) -> Iterator[list[dict]]:
+    it = iter(events)
+    while chunk := list(islice(it, chunk_size)):
+        yield chunk
+
+
+# schéma aplati: colonne -> chemin dans l'événement OpenAgenda (découpé une fois pour toutes)
+RAW_FIELDS = {
+    "uid": ("uid",),
+    "title_fr": ("title", "fr"),
+    "description_fr": ("description", "fr"),
+    "keywords_fr": ("keywords", "fr"),
+    "thematique": ("thematique",),
+    "type_devenement": ("type-devenement",),
+
+    "first_begin": ("firstTiming", "begin"),
+    "first_end": ("firstTiming", "end"),
+    "last_begin": ("lastTiming", "begin"),
+    "last_end": ("lastTiming", "end"),
+
+    "location_name": ("location", "name"),
+    "location_address": ("location", "address"),
+    "location_city": ("location", "city"),
+    "location_postal": ("location", "postalCode"),
+    "location_lat": ("location", "latitude"),
+    "location_lon": ("location", "longitude"),
+}
+LIST_FIELDS = {"keywords_fr", "thematique"}  # [] si absent
+DATE_FIELDS = {"first_begin": "first_begin_dt", "first_end": "first_end_dt", "last_begin": "last_begin_dt", "last_end": "last_end_dt"}
+
+_MISSING = object()
+
+
+def _column(events: list[dict], keys: tuple) -> list:
+    """Une colonne extraite d'un coup (équivalent de _get pour chaque événement)."""
+    if len(keys) == 1:
+        key = keys[0]
+        return [ev.get(key, _MISSING) for ev in events]
+    out = []
     for ev in events:
-        row = {
-            "uid": ev.get("uid"),
-            "title_fr": _get(ev, "title.fr"),
-            "description_fr": _get(ev, "description.fr"),
-            "keywords_fr": _get(ev, "keywords.fr", []),
-            "thematique": _get(ev, "thematique", []),
-            "type_devenement": _get(ev, "type-devenement"),
-
-            "first_begin": _get(ev, "firstTiming.begin"),
-            "first_end": _get(ev, "firstTiming.end"),
-            "last_begin": _get(ev, "lastTiming.begin"),
-            "last_end": _get(ev, "lastTiming.end"),
-
-            "location_name": _get(ev, "location.name"),
-            "location_address": _get(ev, "location.address"),
-            "location_city": _get(ev, "location.city"),
-            "location_postal": _get(ev, "location.postalCode"),
-            "location_lat": _get(ev, "location.latitude"),
-            "location_lon": _get(ev, "location.longitude"),
-
-            "origin_url": ev.get("originalUrl") or ev.get("url"),
-        }
-        rows.append(row)
-
-    df = pd.DataFrame(rows)
-
-    # Parse datetimes
-    df["first_begin_dt"] = df["first_begin"].apply(_parse_dt)
-    df["first_end_dt"] = df["first_end"].apply(_parse_dt)
-    df["last_begin_dt"] = df["last_begin"].apply(_parse_dt)
-    df["last_end_dt"] = df["last_end"].apply(_parse_dt)
+        cur = ev
+        for key in keys:
+            cur = cur.get(key, _MISSING) if isinstance(cur, dict) else _MISSING
+            if cur is _MISSING:
+                break
+        out.append(cur)
+    return out
+
+
+def parse_dt_column(values) -> pd.Series:
+    """Parsing ISO-8601 vectorisé (une passe par colonne), vide / invalide -> NaT."""
+    # OpenAgenda dates are ISO-8601 with timezone offset, e.g. "2025-03-07T00:00:00+01:00"
+    values = pd.Series(values, dtype=object).where(lambda s: s.astype(bool), None)
+    return pd.to_datetime(values, errors="coerce", utc=True, format="ISO8601")
+
+
+def to_dataframe(events: list[dict]) -> pd.DataFrame:
+    columns = {}
+    for name, keys in RAW_FIELDS.items():
+        values = _column(events, keys)
+        if name in LIST_FIELDS:
+            columns[name] = [[] if v is _MISSING else v for v in values]
+        else:
+            columns[name] = [None if v is _MISSING else v for v in values]
+    columns["origin_url"] = [ev.get("originalUrl") or ev.get("url") for ev in events]
+    columns["agenda_uid"] = [ev.get("agendaUid") for ev in events]
+
+    df = pd.DataFrame(columns)
+
+    # Parse datetimes (colonne entière)
+    for raw_col, dt_col in DATE_FIELDS.items():
+        df[dt_col] = parse_dt_column(df[raw_col])
 
     # Basic cleaning
     df["title_fr"] = df["title_fr"].fillna("").astype(str).str.strip()
@@ -97,58 +141,65 @@ def split_by_time(df: pd.DataFrame, now_utc: datetime | None = None):
     return past_year, upcoming
 
 
-def build_document_text(row) -> str:
-    date_str = ""
-    if pd.notna(row["first_begin_dt"]):
-        date_str = row["first_begin_dt"].strftime("%Y-%m-%d %H:%M UTC")
-
-    keywords = row.get("keywords_fr") or []
-    keywords = [str(k).strip() for k in keywords if k is not None and str(k).strip()]
-
-    parts = [
-        f"Titre: {row.get('title_fr','')}",
-        f"Description: {row.get('description_fr','')}",
-        f"Date: {date_str}",
-        f"Lieu: {row.get('location_name','')}",
-        f"Adresse: {row.get('location_address','')}",
-        f"Ville: {row.get('location_city','')}",
-        f"Mots-clés: {', '.join(keywords)}",
+def _keywords_text(keywords) -> str:
+    if not isinstance(keywords, (list, tuple, np.ndarray)):
+        return ""
+    return ", ".join(str(k).strip() for k in keywords if k is not None and str(k).strip())
+
+
+def build_document_texts(df: pd.DataFrame) -> list[str]:
+    """
+    Champ `document`: titre, description, date, lieu et mots-clés, une ligne par champ.
+    Assemblé colonne par colonne (pas de Series construite pour chaque ligne).
+    """
+    dates = df["first_begin_dt"].dt.strftime("%Y-%m-%d %H:%M UTC").fillna("").tolist()
+    labelled = [
+        [f"Titre: {v}" for v in df["title_fr"].tolist()],
+        [f"Description: {v}" for v in df["description_fr"].tolist()],
+        [f"Date: {v}" for v in dates],
+        [f"Lieu: {v}" for v in df["location_name"].tolist()],
+        [f"Adresse: {v}" for v in df["location_address"].tolist()],
+        [f"Ville: {v}" for v in df["location_city"].tolist()],
+        [f"Mots-clés: {_keywords_text(v)}" for v in df["keywords_fr"].tolist()],
     ]
-    return "\n".join([p for p in parts if p and not p.endswith(": ")])
-
-
-def export(df: pd.DataFrame, name: str):
-    OUT_DIR.mkdir(parents=True, exist_ok=True)
-
-    # JSONL (pratique pour réimporter + garder les listes)
-    df.to_json(OUT_DIR / f"{name}.jsonl", orient="records", lines=True, force_ascii=False, date_format="iso")
+    # une partie "Champ: " (valeur vide) est omise
+    return ["\n".join(p for p in parts if not p.endswith(": ")) for parts in zip(*labelled)]
 
-    # CSV (lisible rapidement, mais les listes seront sérialisées)
-    df.to_csv(OUT_DIR / f"{name}.csv", index=False, encoding="utf-8")
-
-
-def main():
-    if not RAW_PATH.exists():
-        raise FileNotFoundError(f"Fichier introuvable: {RAW_PATH}")
-
-    events = load_raw_events(RAW_PATH)
-    df = to_dataframe(events)
 
+def filter_events(df: pd.DataFrame, now_utc: datetime) -> pd.DataFrame:
+    """Règles de qualité + fenêtre temporelle (dernière année ou à venir), en masques vectorisés sur le paquet."""
     # 1) Drop titres vides
-    df = df[df["title_fr"].str.len() >= 5].copy()
+    df = df[df["title_fr"].str.len() >= 5]
 
     # 2) Drop descriptions vraiment vides (optionnel mais conseillé)
     # On garde si description >= 30 chars OU si on a un lieu (sinon trop pauvre)
-    df = df[(df["description_fr"].str.len() >= 30) | (df["location_name"].fillna("").str.len() > 0)].copy()
+    df = df[(df["description_fr"].str.len() >= 30) | (df["location_name"].fillna("").str.len() > 0)]
+
+    return df[df["first_begin_dt"] >= now_utc - timedelta(days=365)].copy()
+
+
+def load_clean_events(raw_path: Path, now_utc: datetime, chunk_size: int = CLEAN_CHUNK_SIZE) -> tuple[pd.DataFrame, int]:
+    """
+    Consomme les événements bruts par paquets de chunk_size: seuls les événements
+    retenus sont conservés en mémoire. Retourne (événements filtrés, nb d'événements bruts).
+    """
+    kept = []
+    n_raw = 0
+    for chunk in iter_chunks(iter_raw_events(raw_path), chunk_size):
+        n_raw += len(chunk)
+        kept.append(filter_events(to_dataframe(chunk), now_utc))
+    if not kept:
+        raise ValueError(f"Aucun événement dans {raw_path}")
+    return pd.concat(kept, ignore_index=True), n_raw
 
-    past_year, upcoming = split_by_time(df)
-    df_index = pd.concat([past_year, upcoming], ignore_index=True)
 
+def finalize_index_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Événements filtrés -> schéma final "index ready" (dédoublonné, avec document)."""
     # 3) Dédoublonnage par uid
-    df_index = df_index.drop_duplicates(subset=["uid"]).reset_index(drop=True)
+    df_index = df.drop_duplicates(subset=["uid"]).reset_index(drop=True)
 
     # 4) Construction du document (AVANT schema final)
-    df_index["document"] = df_index.apply(build_document_text, axis=1)
+    df_index["document"] = build_document_texts(df_index)
 
     # 5) Vérifications / coercions de types (AVANT FINAL_COLS)
     df_index["uid"] = df_index["uid"].astype(str)
@@ -156,33 +207,36 @@ def main():
     df_index["location_lon"] = pd.to_numeric(df_index["location_lon"], errors="coerce")
 
     # 6) Schéma stable pour une sortie clean
-    FINAL_COLS = [
-        "uid", "origin_url",
-        "title_fr", "description_fr",
-        "keywords_fr", "thematique", "type_devenement",
-        "first_begin_dt", "first_end_dt", "last_begin_dt", "last_end_dt",
-        "location_name", "location_address", "location_city", "location_postal",
-        "location_lat", "location_lon",
-        "document",
-    ]
-    df_index = df_index[[c for c in FINAL_COLS if c in df_index.columns]].copy()
+    return df_index[[c for c in FINAL_COLS if c in df_index.columns]].copy()
+
 
-    export(df_index, "events_index_ready")
+def export_index(df_index: pd.DataFrame) -> Path:
+    """
+    Un seul fichier Parquet typé; past_year / upcoming sont des vues filtrées
+    à la lecture (storage.read_past_year / read_upcoming), pas des copies.
+    """
+    return write_index_ready(df_index, OUT_DIR / INDEX_READY_FILE)
+
+
+def main():
+    raw_path = RAW_PATH if RAW_PATH.exists() else LEGACY_RAW_PATH
+    if not raw_path.exists():
+        raise FileNotFoundError(f"Fichier introuvable: {RAW_PATH}")
 
-    # versions cohérentes dérivées de df_index (post-nettoyage)
     now_utc = datetime.now(timezone.utc)
-    past_year_clean = df_index[df_index["first_begin_dt"] < now_utc].copy()
-    upcoming_clean = df_index[df_index["first_begin_dt"] >= now_utc].copy()
+    df, n_raw = load_clean_events(raw_path, now_utc)
+
+    past_year, upcoming = split_by_time(df, now_utc)
+    df_index = finalize_index_frame(pd.concat([past_year, upcoming], ignore_index=True))
 
-    export(past_year_clean, "events_past_year")
-    export(upcoming_clean, "events_upcoming")
+    out_path = export_index(df_index)
 
 
-    print(f"Raw events loaded: {len(events)}")
+    print(f"Raw events loaded: {n_raw}")
     print(f"Clean events with dates: {len(df_index)}")
     print(f"Past year events: {len(past_year)}")
     print(f"Upcoming events: {len(upcoming)}")
-    print(f"Exports written to: {OUT_DIR.resolve()}")
+    print(f"Export written to: {out_path.resolve()}")
 
 
 if __name__ == "__main__":
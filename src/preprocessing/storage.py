@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import json
+import math
+import os
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Iterator, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+
+PROCESSED_DIR = Path("data/processed")
+INDEX_READY_FILE = "events_index_ready.parquet"
+INDEX_READY_PATH = PROCESSED_DIR / INDEX_READY_FILE
+LEGACY_INDEX_READY_PATH = PROCESSED_DIR / "events_index_ready.jsonl"
+
+# Schéma explicite du jeu "index ready": les dates restent des timestamps UTC à la relecture.
+# thematique / type-devenement sont des champs à choix OpenAgenda: identifiants d'options en
+# général, mais une option peut aussi arriver en objet ou en liste; stockés en texte (JSON pour les objets).
+INDEX_SCHEMA = pa.schema([
+    ("uid", pa.string()),
+    ("origin_url", pa.string()),
+    ("agenda_uid", pa.string()),
+    ("title_fr", pa.string()),
+    ("description_fr", pa.string()),
+    ("keywords_fr", pa.list_(pa.string())),
+    ("thematique", pa.list_(pa.string())),
+    ("type_devenement", pa.string()),
+    ("first_begin_dt", pa.timestamp("us", tz="UTC")),
+    ("first_end_dt", pa.timestamp("us", tz="UTC")),
+    ("last_begin_dt", pa.timestamp("us", tz="UTC")),
+    ("last_end_dt", pa.timestamp("us", tz="UTC")),
+    ("location_name", pa.string()),
+    ("location_address", pa.string()),
+    ("location_city", pa.string()),
+    ("location_postal", pa.string()),
+    ("location_lat", pa.float64()),
+    ("location_lon", pa.float64()),
+    ("document", pa.string()),
+])
+INDEX_COLUMNS = INDEX_SCHEMA.names
+
+
+def _as_text(value):
+    if value is None or isinstance(value, str) or (isinstance(value, float) and math.isnan(value)):
+        return value
+    if isinstance(value, (dict, list, tuple, np.ndarray)):
+        # option de champ à choix sous forme d'objet: JSON stable plutôt que repr Python
+        items = value.tolist() if isinstance(value, np.ndarray) else value
+        return json.dumps(items, ensure_ascii=False, sort_keys=True, default=str)
+    return str(value)  # ex: code postal numérique dans le JSON source
+
+
+def _as_text_list(value):
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return value
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return [_as_text(v) for v in value]
+    return [_as_text(value)]  # valeur unique (str, dict, nombre) au lieu d'une liste
+
+
+def write_index_ready(df: pd.DataFrame, path: Path = INDEX_READY_PATH) -> Path:
+    """Écriture Parquet (atomique) selon INDEX_SCHEMA; les colonnes absentes sont nulles."""
+    df = df.reindex(columns=INDEX_COLUMNS)
+    for field in INDEX_SCHEMA:
+        if pa.types.is_string(field.type):
+            df[field.name] = df[field.name].astype(object).map(_as_text)
+        elif pa.types.is_list(field.type) and pa.types.is_string(field.type.value_type):
+            df[field.name] = df[field.name].astype(object).map(_as_text_list)
+    table = pa.Table.from_pandas(df, schema=INDEX_SCHEMA, preserve_index=False)
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    pq.write_table(table, tmp)
+    os.replace(tmp, path)
+    return path
+
+
+def read_index_ready(
+    path: Path = INDEX_READY_PATH,
+    columns: Optional[Sequence[str]] = None,
+    filters: Optional[List[tuple]] = None,
+) -> pd.DataFrame:
+    """Lecture avec projection (seules les colonnes demandées sont décodées) et filtres pyarrow."""
+    return pd.read_parquet(path, columns=list(columns) if columns else None, filters=filters)
+
+
+def iter_index_ready_batches(
+    path: Path = INDEX_READY_PATH,
+    columns: Optional[Sequence[str]] = None,
+    batch_rows: int = 2000,
+) -> Iterator[pd.DataFrame]:
+    """Lecture par lots de batch_rows lignes (record batches Arrow): mémoire bornée par le lot."""
+    parquet = pq.ParquetFile(path)
+    for batch in parquet.iter_batches(batch_size=batch_rows, columns=list(columns) if columns else None):
+        yield batch.to_pandas()
+
+
+def read_upcoming(path: Path = INDEX_READY_PATH, now_utc: Optional[datetime] = None, columns=None) -> pd.DataFrame:
+    """Vue "à venir" (first_begin_dt >= now), filtrée à la lecture."""
+    now_utc = now_utc or datetime.now(timezone.utc)
+    return read_index_ready(path, columns, filters=[("first_begin_dt", ">=", now_utc)])
+
+
+def read_past_year(path: Path = INDEX_READY_PATH, now_utc: Optional[datetime] = None, columns=None) -> pd.DataFrame:
+    """Vue "dernière année" (first_begin_dt < now; le jeu ne contient rien de plus ancien)."""
+    now_utc = now_utc or datetime.now(timezone.utc)
+    return read_index_ready(path, columns, filters=[("first_begin_dt", "<", now_utc)])
@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Hashable, Iterable, Optional, Tuple
+
+import numpy as np
+
+
+def _normalize(vector) -> np.ndarray:
+    v = np.asarray(vector, dtype=np.float32).ravel()
+    norm = float(np.linalg.norm(v))
+    return v / norm if norm else v
+
+
+@dataclass
+class _Entry:
+    key: Tuple
+    vector: np.ndarray  # embedding normalisé de la question
+    value: Any
+    created_at: float
+
+
+class SemanticAnswerCache:
+    """
+    Cache de réponses RAG.
+    Une entrée est réutilisée si la clé (villes normalisées, future_only, version d'index)
+    est identique ET si la similarité cosinus des embeddings de question >= threshold.
+    Éviction LRU (max_entries) + expiration (ttl_s). Thread-safe.
+    """
+
+    def __init__(self, max_entries: int = 512, ttl_s: float = 900.0, threshold: float = 0.95):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self.threshold = threshold
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    @staticmethod
+    def make_key(
+        allowed_cities: Optional[Iterable[str]],
+        future_only: bool,
+        index_version: Hashable,
+        retriever_params: Tuple = (),
+    ) -> Tuple:
+        """retriever_params: réglages du retriever (k_fetch, k_final, max_distance) qui changent les sources."""
+        cities = tuple(sorted({c.strip() for c in allowed_cities or [] if c and c.strip()}))
+        return (cities, bool(future_only), index_version, tuple(retriever_params))
+
+    def _purge_expired(self, now: float) -> None:
+        if self.ttl_s <= 0:
+            return
+        expired = [i for i, e in self._entries.items() if now - e.created_at > self.ttl_s]
+        for i in expired:
+            del self._entries[i]
+        self.evictions += len(expired)
+
+    def lookup(self, key: Tuple, vector) -> Optional[Any]:
+        if not self.enabled:
+            return None
+        q = _normalize(vector)
+        with self._lock:
+            self._purge_expired(time.monotonic())
+            candidates = [(i, e) for i, e in self._entries.items() if e.key == key]
+            if candidates:
+                sims = np.stack([e.vector for _, e in candidates]) @ q
+                best = int(np.argmax(sims))
+                if float(sims[best]) >= self.threshold:
+                    entry_id, entry = candidates[best]
+                    self._entries.move_to_end(entry_id)
+                    self.hits += 1
+                    return entry.value
+            self.misses += 1
+            return None
+
+    def store(self, key: Tuple, vector, value: Any) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self._entries[self._next_id] = _Entry(key, _normalize(vector), value, time.monotonic())
+            self._next_id += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_s": self.ttl_s,
+                "threshold": self.threshold,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+def answer_cache_from_env() -> SemanticAnswerCache:
+    return SemanticAnswerCache(
+        max_entries=int(os.getenv("RAG_ANSWER_CACHE_SIZE", "512")),
+        ttl_s=float(os.getenv("RAG_ANSWER_CACHE_TTL_S", "900")),
+        threshold=float(os.getenv("RAG_ANSWER_CACHE_THRESHOLD", "0.95")),
+    )
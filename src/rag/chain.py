@@ -1,30 +1,32 @@
 from __future__ import annotations
 
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
-from typing import List, Dict, Any, Optional, Set, Tuple
+from functools import partial
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, Tuple
 
 from langchain_core.documents import Document
 from langchain_core.prompts import ChatPromptTemplate
 
-from src.indexing.faiss_store import load_vectorstore
+from src.indexing.faiss_store import DEFAULT_INDEX_DIR, index_version, load_vectorstore, resolve_index_dir
+from src.indexing.metadata_index import ensure_epoch_metadata, load_or_build_metadata_index
+from src.rag.answer_cache import answer_cache_from_env
+from src.rag.cities import DEFAULT_ALLOWED_CITIES
 from src.rag.context import format_docs_as_context
 from src.rag.llm import get_llm
+from src.rag.metrics import CACHE_TOTAL, NO_RESULT_TOTAL, observe_stage, run_with_context, span
 from src.rag.prompt import SYSTEM_PROMPT, HUMAN_PROMPT
 from src.rag.retrieval_scored import ScoredFilteredRetriever
 
 _COMPONENTS_CACHE = None
-_SHARED_CACHE = None  # (vs, prompt, llm)
-
-DEFAULT_ALLOWED_CITIES = {
-    "Gif-sur-Yvette",
-    "Orsay",
-    "Évry",
-    "Sceaux",
-    "Paris",
-    "Le Plessis-Robinson",
-    "Bures-sur-Yvette",
-}
+_SHARED_CACHE = None  # (vs, metadata_index, prompt, llm, index_version), remplacé d'un bloc
+_LOAD_LOCK = threading.Lock()
 
+# réponses déjà générées, réutilisées pour des questions quasi identiques
+ANSWER_CACHE = answer_cache_from_env()
 
 @dataclass
 class RAGResult:
@@ -41,21 +43,76 @@ def docs_to_sources(docs: List[Document], max_excerpt_chars: int = 220) -> List[
     return out
 
 
-def get_shared_components():
+def _load_index():
+    """Charge la version d'index active (vectorstore + index de métadonnées) sans toucher au cache."""
+    index_dir = resolve_index_dir(DEFAULT_INDEX_DIR)
+    # on lit le dossier de version résolu une seule fois: une publication concurrente n'a pas d'effet ici
+    version = index_dir.name if index_dir != DEFAULT_INDEX_DIR else index_version(DEFAULT_INDEX_DIR)
+    vs = load_vectorstore(index_dir)
+    ensure_epoch_metadata(vs)  # index construits avant first_begin_ts
+    metadata_index = load_or_build_metadata_index(vs, index_dir)
+    return vs, metadata_index, version
+
+
+def _make_prompt() -> ChatPromptTemplate:
+    return ChatPromptTemplate.from_messages(
+        [
+            ("system", SYSTEM_PROMPT.strip()),
+            ("human", HUMAN_PROMPT.strip()),
+        ]
+    )
+
+
+def index_components():
+    """(vectorstore, metadata_index) servis s'ils sont chargés, sinon ceux de la version active (sans client LLM)."""
+    shared = _SHARED_CACHE
+    return shared[:2] if shared is not None else _load_index()[:2]
+
+
+def get_shared_components(timings: Optional[Dict[str, float]] = None):
+    """
+    Composants partagés, chargés au premier appel (index, prompt, client LLM).
+    timings: si fourni, reçoit la durée de chaque étape ("index", "llm") quand elles sont exécutées ici.
+    """
     global _SHARED_CACHE
-    if _SHARED_CACHE is None:
-        vs = load_vectorstore()
-
-        prompt = ChatPromptTemplate.from_messages(
-            [
-                ("system", SYSTEM_PROMPT.strip()),
-                ("human", HUMAN_PROMPT.strip()),
-            ]
-        )
+    components = _SHARED_CACHE
+    if components is None:
+        with _LOAD_LOCK:
+            if _SHARED_CACHE is None:
+                start = time.perf_counter()
+                vs, metadata_index, version = _load_index()
+                if timings is not None:
+                    timings["index"] = time.perf_counter() - start
+
+                prompt = _make_prompt()
 
-        llm = get_llm()
-        _SHARED_CACHE = (vs, prompt, llm)
-    return _SHARED_CACHE
+                start = time.perf_counter()
+                llm = get_llm()
+                if timings is not None:
+                    timings["llm"] = time.perf_counter() - start
+                _SHARED_CACHE = (vs, metadata_index, prompt, llm, version)
+            components = _SHARED_CACHE
+    return components
+
+
+def reload_shared_components() -> Optional[str]:
+    """
+    Charge la version d'index publiée à côté de celle servie, puis remplace
+    _SHARED_CACHE d'une seule affectation: les requêtes en cours finissent sur
+    l'ancien index, les suivantes voient le nouveau. Prompt et LLM sont conservés.
+    Retourne la version servie (None si rien n'était encore chargé).
+    """
+    global _SHARED_CACHE
+    with _LOAD_LOCK:
+        current = _SHARED_CACHE
+        if current is None:
+            # rien en mémoire: le premier appel chargera directement la dernière version
+            return None
+        vs, metadata_index, version = _load_index()
+        _SHARED_CACHE = (vs, metadata_index, current[2], current[3], version)
+    # les réponses en cache citent des documents de l'ancien index
+    ANSWER_CACHE.clear()
+    return version
 
 
 def build_components(
@@ -65,17 +122,29 @@ def build_components(
     max_distance: float = 1.3,
     future_only: bool = True,
 ):
-    vs, prompt, llm = get_shared_components()
+    vs, metadata_index, prompt, llm, _ = get_shared_components()
+    retriever = make_retriever(vs, metadata_index, allowed_cities, k_fetch, k_final, max_distance, future_only)
+    return retriever, prompt, llm
+
 
-    retriever = ScoredFilteredRetriever(
+def make_retriever(
+    vs,
+    metadata_index=None,
+    allowed_cities: Optional[Set[str]] = None,
+    k_fetch: int = 30,
+    k_final: int = 5,
+    max_distance: float = 1.3,
+    future_only: bool = True,
+) -> ScoredFilteredRetriever:
+    return ScoredFilteredRetriever(
         vectorstore=vs,
         allowed_cities=allowed_cities or DEFAULT_ALLOWED_CITIES,
         k_fetch=k_fetch,
         k_final=k_final,
         max_distance=max_distance,
         future_only=future_only,
+        metadata_index=metadata_index,
     )
-    return retriever, prompt, llm
 
 
 
@@ -91,36 +160,39 @@ def format_sources_block(sources: List[Dict[str, Any]]) -> str:
     return "\n\nSources :\n- " + "\n- ".join(uids) if uids else "\n\nSources :\n- Aucune source pertinente."
 
 
-def answer_question(question: str, allowed_cities: Optional[Set[str]] = None, llm_override=None, future_only: bool = True) -> RAGResult:
-    retriever, prompt, llm = build_components(allowed_cities=allowed_cities, future_only=future_only)
-
-    if llm_override is not None:
-        llm = llm_override
-
-    scored = retriever.retrieve(question)
+def _prepare_generation(question: str, scored: List[Tuple[Document, float]], prompt):
+    """
+    Retourne (résultat_immédiat, messages, sources).
+    résultat_immédiat n'est pas None quand on peut répondre sans appeler le LLM.
+    """
     docs = [d for d, _ in scored]
     dists = [dist for _, dist in scored]
 
     # Pas de doc -> pas trouvé
     if not docs:
+        NO_RESULT_TOTAL.inc(reason="no_docs")
         return RAGResult(
             answer="Je n'ai pas trouvé d'événement correspondant à cette demande. Tu peux essayer d'élargir le thème, la période ou la zone géographique.",
             sources=[],
-        )
+        ), None, []
 
     # Heuristique de confiance : si même le meilleur résultat est “limite”, on ne montre pas de sources
     best = min(dists) if dists else 999.0
     if best > 1.3: # au lieu de 0.95
+        NO_RESULT_TOTAL.inc(reason="low_confidence")
         return RAGResult(
             answer="Je n'ai pas trouvé d'événement suffisamment pertinent...",
             sources=[],
-        )
+        ), None, []
 
-    sources = docs_to_sources(docs)
-    context = format_docs_as_context(docs)
-    messages = prompt.format_messages(context=context, question=question)
-    res = llm.invoke(messages)
-    
+    with span("prompt"):
+        sources = docs_to_sources(docs)
+        context = format_docs_as_context(docs)
+        messages = prompt.format_messages(context=context, question=question)
+    return None, messages, sources
+
+
+def _finalize_answer(res, sources: List[Dict[str, Any]]) -> RAGResult:
     answer_text = res.content.strip()
 
     # Heuristique: si le LLM indique "pas trouvé", on ne montre pas de sources
@@ -135,3 +207,263 @@ def answer_question(question: str, allowed_cities: Optional[Set[str]] = None, ll
 
     answer = res.content.strip() + format_sources_block(sources)
     return RAGResult(answer=answer, sources=sources)
+
+
+def _answer_from_scored(question: str, scored: List[Tuple[Document, float]], prompt, llm) -> RAGResult:
+    early, messages, sources = _prepare_generation(question, scored, prompt)
+    if early is not None:
+        return early
+
+    with span("llm"):
+        res = llm.invoke(messages)
+    return _finalize_answer(res, sources)
+
+
+def _answer_cache_key(retriever: ScoredFilteredRetriever) -> Tuple:
+    vs, _, _, _, version = get_shared_components()
+    # une bascule d'index a pu avoir lieu depuis build_components: on ne réutilise pas la nouvelle version
+    if vs is not retriever.vectorstore:
+        version = None
+    # réglages du retriever (balayage de l'éval): une réponse n'est réutilisée qu'avec les mêmes
+    params = (retriever.k_fetch, retriever.k_final, retriever.max_distance)
+    return ANSWER_CACHE.make_key(retriever.allowed_cities, retriever.future_only, version, params)
+
+
+def _cache_lookup(key: Tuple, vector) -> Optional[RAGResult]:
+    with span("cache"):
+        cached = ANSWER_CACHE.lookup(key, vector)
+    CACHE_TOTAL.inc(result="hit" if cached is not None else "miss")
+    return cached
+
+
+def answer_question(question: str, allowed_cities: Optional[Set[str]] = None, llm_override=None, future_only: bool = True) -> RAGResult:
+    retriever, prompt, llm = build_components(allowed_cities=allowed_cities, future_only=future_only)
+
+    # un LLM injecté (tests, éval) ne doit ni lire ni alimenter le cache
+    use_cache = llm_override is None and ANSWER_CACHE.enabled
+    if llm_override is not None:
+        llm = llm_override
+
+    vectors = retriever.embed([question])
+    key = _answer_cache_key(retriever)
+    if use_cache:
+        cached = _cache_lookup(key, vectors[0])
+        if cached is not None:
+            return cached
+
+    scored = retriever.retrieve_by_vectors(vectors)[0]
+    result = _answer_from_scored(question, scored, prompt, llm)
+
+    if use_cache:
+        ANSWER_CACHE.store(key, vectors[0], result)
+    return result
+
+
+def answer_questions(
+    questions: List[str],
+    allowed_cities: Optional[Set[str]] = None,
+    llm_override=None,
+    future_only: bool = True,
+    max_workers: int = 8,
+    retriever_params: Optional[Dict[str, Any]] = None,
+) -> List[RAGResult]:
+    """
+    Version batch de answer_question: un seul embedding (N questions) et une seule
+    recherche FAISS, puis les appels LLM sont lancés en parallèle.
+    Les résultats sont renvoyés dans l'ordre des questions.
+    retriever_params: k_fetch, k_final, max_distance (voir build_components).
+    """
+    if not questions:
+        return []
+
+    retriever, prompt, llm = build_components(
+        allowed_cities=allowed_cities, future_only=future_only, **(retriever_params or {})
+    )
+
+    use_cache = llm_override is None and ANSWER_CACHE.enabled
+    if llm_override is not None:
+        llm = llm_override
+
+    vectors = retriever.embed(questions)
+    key = _answer_cache_key(retriever)
+
+    results: List[Optional[RAGResult]] = [None] * len(questions)
+    if use_cache:
+        results = [_cache_lookup(key, v) for v in vectors]
+
+    todo = [i for i, r in enumerate(results) if r is None]
+    if not todo:
+        return results
+
+    scored_batch = retriever.retrieve_by_vectors(vectors[todo])
+
+    workers = max(1, min(max_workers, len(todo)))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        generated = list(
+            pool.map(
+                lambda i, scored: _answer_from_scored(questions[i], scored, prompt, llm),
+                todo,
+                scored_batch,
+            )
+        )
+
+    for i, res in zip(todo, generated):
+        results[i] = res
+        if use_cache:
+            ANSWER_CACHE.store(key, vectors[i], res)
+    return results
+
+
+def retrieve_sources(
+    questions: List[str],
+    allowed_cities: Optional[Set[str]] = None,
+    future_only: bool = True,
+    retriever_params: Optional[Dict[str, Any]] = None,
+    index: Optional[Tuple[Any, Any]] = None,
+) -> List[RAGResult]:
+    """
+    Sources que answer_questions citerait, sans appel au LLM (balayage de paramètres de retrieval).
+    answer est vide, sauf pour les réponses données sans LLM (aucun résultat / confiance trop faible).
+    index: (vectorstore, metadata_index) à réutiliser entre plusieurs appels; par défaut l'index
+    partagé s'il est chargé, sinon la version active (sans créer de client LLM).
+    """
+    if not questions:
+        return []
+    if index is None:
+        index = index_components()
+    retriever = make_retriever(
+        index[0], index[1], allowed_cities, future_only=future_only, **(retriever_params or {})
+    )
+    prompt = _make_prompt()
+    out = []
+    for question, scored in zip(questions, retriever.retrieve_batch(questions)):
+        early, _, sources = _prepare_generation(question, scored, prompt)
+        out.append(early if early is not None else RAGResult(answer="", sources=sources))
+    return out
+
+
+async def answer_question_async(
+    question: str,
+    allowed_cities: Optional[Set[str]] = None,
+    llm_override=None,
+    future_only: bool = True,
+) -> RAGResult:
+    """
+    Variante non bloquante de answer_question: le chargement / la recherche FAISS
+    (CPU) passent dans l'executor, l'appel LLM est awaité via ainvoke.
+    """
+    loop = asyncio.get_running_loop()
+    retriever, prompt, llm = await loop.run_in_executor(
+        None,
+        partial(build_components, allowed_cities=allowed_cities, future_only=future_only),
+    )
+
+    use_cache = llm_override is None and ANSWER_CACHE.enabled
+    if llm_override is not None:
+        llm = llm_override
+
+    vectors = await loop.run_in_executor(None, run_with_context(retriever.embed, [question]))
+    key = _answer_cache_key(retriever)
+    if use_cache:
+        cached = _cache_lookup(key, vectors[0])
+        if cached is not None:
+            return cached
+
+    scored = (await loop.run_in_executor(None, run_with_context(retriever.retrieve_by_vectors, vectors)))[0]
+
+    early, messages, sources = _prepare_generation(question, scored, prompt)
+    if early is not None:
+        result = early
+    else:
+        with span("llm"):
+            if hasattr(llm, "ainvoke"):
+                res = await llm.ainvoke(messages)
+            else:
+                res = await loop.run_in_executor(None, llm.invoke, messages)
+        result = _finalize_answer(res, sources)
+
+    if use_cache:
+        ANSWER_CACHE.store(key, vectors[0], result)
+    return result
+
+
+def _split_trailer(result: RAGResult) -> Tuple[str, str]:
+    """(texte de la réponse, bloc Sources) d'une réponse complète (ex: issue du cache)."""
+    trailer = format_sources_block(result.sources) if result.sources else ""
+    if trailer and result.answer.endswith(trailer):
+        return result.answer[: -len(trailer)], trailer
+    return result.answer, ""
+
+
+async def answer_question_stream(
+    question: str,
+    allowed_cities: Optional[Set[str]] = None,
+    llm_override=None,
+    future_only: bool = True,
+) -> AsyncIterator[Tuple[str, Any]]:
+    """
+    Variante streamée de answer_question_async. Produit des événements (nom, données):
+    - ("sources", [...]) dès la fin de la recherche
+    - ("token", "...") au fil de la génération (llm.astream)
+    - ("trailer", "...") le bloc Sources de format_sources_block
+    - ("done", {"answer": ...}) la réponse complète, identique à celle de answer_question
+    """
+    loop = asyncio.get_running_loop()
+    retriever, prompt, llm = await loop.run_in_executor(
+        None,
+        partial(build_components, allowed_cities=allowed_cities, future_only=future_only),
+    )
+
+    use_cache = llm_override is None and ANSWER_CACHE.enabled
+    if llm_override is not None:
+        llm = llm_override
+
+    vectors = await loop.run_in_executor(None, run_with_context(retriever.embed, [question]))
+    key = _answer_cache_key(retriever)
+    cached = _cache_lookup(key, vectors[0]) if use_cache else None
+    if cached is not None:
+        text, trailer = _split_trailer(cached)
+        yield "sources", cached.sources
+        yield "token", text
+        if trailer:
+            yield "trailer", trailer
+        yield "done", {"answer": cached.answer}
+        return
+
+    scored = (await loop.run_in_executor(None, run_with_context(retriever.retrieve_by_vectors, vectors)))[0]
+
+    early, messages, sources = _prepare_generation(question, scored, prompt)
+    if early is not None:
+        yield "sources", early.sources
+        yield "token", early.answer
+        result = early
+    else:
+        yield "sources", sources
+        parts: List[str] = []
+        # durée LLM hors temps passé chez le client entre deux tokens (yield)
+        llm_s = 0.0
+        start = time.perf_counter()
+        if hasattr(llm, "astream"):
+            async for chunk in llm.astream(messages):
+                text = getattr(chunk, "content", chunk) or ""
+                if text:
+                    parts.append(text)
+                    if len(parts) == 1:
+                        observe_stage("llm_first_token", time.perf_counter() - start)
+                    llm_s += time.perf_counter() - start
+                    yield "token", text
+                    start = time.perf_counter()
+        else:
+            res = await loop.run_in_executor(None, llm.invoke, messages)
+            parts.append(res.content)
+            llm_s += time.perf_counter() - start
+            yield "token", res.content
+            start = time.perf_counter()
+        observe_stage("llm", llm_s + time.perf_counter() - start)
+        # même texte final que la version non streamée (espaces de bord retirés)
+        result = RAGResult(answer="".join(parts).strip() + format_sources_block(sources), sources=sources)
+        yield "trailer", format_sources_block(sources)
+
+    if use_cache:
+        ANSWER_CACHE.store(key, vectors[0], result)
+    yield "done", {"answer": result.answer}
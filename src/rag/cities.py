@@ -0,0 +1,14 @@
+from __future__ import annotations
+
+
+# villes couvertes par l'index (POC); module sans dépendance, importable depuis l'API
+# sans charger la chaîne RAG
+DEFAULT_ALLOWED_CITIES = {
+    "Gif-sur-Yvette",
+    "Orsay",
+    "Évry",
+    "Sceaux",
+    "Paris",
+    "Le Plessis-Robinson",
+    "Bures-sur-Yvette",
+}
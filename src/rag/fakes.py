@@ -0,0 +1,38 @@
+from __future__ import annotations
+
+import re
+import zlib
+from typing import List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+
+# Composants factices partagés par les tests et le benchmark de charge (src.api.benchmark_load).
+
+
+class HashingEmbeddings(Embeddings):
+    """
+    Embeddings déterministes (sac de mots haché, normalisé), sans modèle à charger:
+    textes proches -> vecteurs proches. Compte les appels (query_calls, documents_calls).
+    """
+
+    def __init__(self, size: int = 64):
+        self.size = size
+        self.query_calls = 0
+        self.documents_calls = 0
+
+    def _vec(self, text: str) -> List[float]:
+        v = np.zeros(self.size, dtype=np.float32)
+        for tok in re.findall(r"\w+", (text or "").lower()):
+            v[zlib.crc32(tok.encode("utf-8")) % self.size] += 1.0
+        norm = np.linalg.norm(v)
+        return (v / norm if norm else v).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.documents_calls += 1
+        return [self._vec(t) for t in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        self.query_calls += 1
+        return self._vec(text)
@@ -1,11 +1,14 @@
 # src/rag/index.py
 from __future__ import annotations
 
+import json
 import time
 import subprocess
 import sys
 from dataclasses import dataclass
-from typing import Any, Dict
+from typing import Any, Dict, Optional
+
+from src.indexing.build_faiss_index import STATS_PREFIX
 
 
 @dataclass
@@ -16,36 +19,48 @@ class RebuildResult:
     details: Dict[str, Any]
 
 
-def _reset_rag_cache() -> None:
+def _reload_rag_components() -> Optional[str]:
     """
-    on vide le cache après rebuild pour que /ask recharge le nouvel index.
+    Charge la nouvelle version publiée et la substitue à l'ancienne en mémoire.
+    Les /ask en cours continuent sur l'ancien index: aucun rechargement sur le chemin des requêtes.
     """
     try:
         import src.rag.chain as chain  # import local pour éviter les cycles
-        # au lieu de chain._COMPONENTS_CACHE = None
-        if hasattr(chain, "_SHARED_CACHE"):
-            chain._SHARED_CACHE = None
+        return chain.reload_shared_components()
     except Exception:
-        # On ne bloque pas le rebuild si le reset échoue
-        pass
+        # On ne bloque pas le rebuild si le rechargement échoue: l'ancien index reste servi
+        return None
+
+
+def _parse_index_stats(stdout: str) -> Dict[str, Any]:
+    """Statistiques (chunks/s, pic mémoire...) imprimées par le script d'indexation."""
+    for line in reversed((stdout or "").splitlines()):
+        if line.startswith(STATS_PREFIX):
+            try:
+                return json.loads(line[len(STATS_PREFIX):])
+            except ValueError:
+                break
+    return {}
 
 
-def rebuild_vectorstore() -> RebuildResult:
+def rebuild_vectorstore(full: bool = False) -> RebuildResult:
     """
-    Reconstruit la base vectorielle en appelant le module:
-    python -m src.indexing.build_faiss_index
+    Met à jour la base vectorielle en appelant le module:
+    python -m src.indexing.incremental_index (ré-embedde seulement les événements modifiés)
+    ou, si full=True, python -m src.indexing.build_faiss_index (reconstruction complète).
     """
     start = time.time()
+    module = "src.indexing.build_faiss_index" if full else "src.indexing.incremental_index"
     try:
         # Lance le script de build exactement comme recommandé par ton faiss_store.py
         proc = subprocess.run(
-            [sys.executable, "-m", "src.indexing.build_faiss_index"],
+            [sys.executable, "-m", module],
             capture_output=True,
             text=True,
             check=True,
         )
 
-        _reset_rag_cache()
+        index_version = _reload_rag_components()
 
         duration = time.time() - start
         return RebuildResult(
@@ -53,6 +68,9 @@ def rebuild_vectorstore() -> RebuildResult:
             message="Vectorstore rebuilt successfully",
             duration_s=duration,
             details={
+                "mode": "full" if full else "incremental",
+                "index_version": index_version,
+                "stats": _parse_index_stats(proc.stdout),
                 "stdout": (proc.stdout or "")[-4000:],  # on limite la taille
                 "stderr": (proc.stderr or "")[-4000:],
             },
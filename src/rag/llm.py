@@ -2,7 +2,6 @@ from __future__ import annotations
 
 import os
 from dotenv import load_dotenv
-from langchain_mistralai import ChatMistralAI
 
 
 DEFAULT_MODEL = "mistral-small-latest"
@@ -13,6 +12,8 @@ def get_llm(model: str = DEFAULT_MODEL, temperature: float = 0.2):
     if not os.getenv("MISTRAL_API_KEY"):
         raise RuntimeError("MISTRAL_API_KEY manquante. Ajoute-la dans ton .env (non versionné).")
 
+    from langchain_mistralai import ChatMistralAI  # import lourd, différé au premier client
+
     # ChatMistralAI utilise la clé via env var MISTRAL_API_KEY
     return ChatMistralAI(
         model=model,
@@ -0,0 +1,211 @@
+from __future__ import annotations
+
+import contextvars
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+
+# Métriques au format texte Prometheus (exposition 0.0.4), sans dépendance externe.
+# Les durées sont en secondes.
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_labels(names: Sequence[str], values: LabelValues, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = tuple(str(labels[n]) for n in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(tuple(str(labels[n]) for n in self.labels), 0.0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        # par valeur de labels: (compte par bucket, somme, nombre)
+        self._series: Dict[LabelValues, Tuple[List[int], float, int]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(str(labels[n]) for n in self.labels)
+        with self._lock:
+            counts, total, n = self._series.get(key) or ([0] * len(self.buckets), 0.0, 0)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self._series[key] = (counts, total + value, n + 1)
+
+    def count(self, **labels: str) -> int:
+        series = self._series.get(tuple(str(labels[n]) for n in self.labels))
+        return series[2] if series else 0
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total, n) in sorted(self._series.items()):
+                for bound, c in zip(self.buckets, counts):
+                    le = f'le="{_format_value(bound)}"'
+                    lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, le)} {c}")
+                inf = 'le="+Inf"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, inf)} {n}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {_format_value(total)}")
+                lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {n}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List = []
+        # jauges calculées à l'export: (nom, aide, fonction renvoyant la valeur)
+        self._gauges: List[Tuple[str, str, Callable[[], float]]] = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def gauge(self, name: str, help: str, fn: Callable[[], float]) -> None:
+        self._gauges.append((name, help, fn))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for name, help, fn in self._gauges:
+            try:
+                value = fn()
+            except Exception:
+                continue  # composant non chargé: jauge omise
+            lines.extend([f"# HELP {name} {help}", f"# TYPE {name} gauge", f"{name} {_format_value(value)}"])
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "rag_stage_duration_seconds",
+    "Durée de chaque étape du traitement d'une question.",
+    labels=("stage",),
+))
+REQUEST_SECONDS = REGISTRY.register(Histogram(
+    "rag_request_duration_seconds",
+    "Durée totale des requêtes HTTP.",
+    labels=("route",),
+))
+REQUESTS_TOTAL = REGISTRY.register(Counter(
+    "rag_requests_total",
+    "Requêtes HTTP traitées.",
+    labels=("route", "status"),
+))
+CANDIDATES_TOTAL = REGISTRY.register(Counter(
+    "rag_retrieval_candidates_total",
+    "Candidats renvoyés par FAISS (fetched) et conservés après filtres et seuil (kept).",
+    labels=("kind",),
+))
+RETRIES_TOTAL = REGISTRY.register(Counter(
+    "rag_retrieval_retries_total",
+    "Questions ayant nécessité le seuil relâché (relaxed) ou une recherche élargie (widened).",
+    labels=("kind",),
+))
+NO_ELIGIBLE_TOTAL = REGISTRY.register(Counter(
+    "rag_retrieval_no_eligible_total",
+    "Questions sans aucune row éligible (ville + date): pas de recherche FAISS.",
+))
+NO_RESULT_TOTAL = REGISTRY.register(Counter(
+    "rag_no_result_total",
+    "Réponses données sans appel au LLM, par raison.",
+    labels=("reason",),
+))
+CACHE_TOTAL = REGISTRY.register(Counter(
+    "rag_answer_cache_total",
+    "Consultations du cache de réponses.",
+    labels=("result",),
+))
+
+
+# --- durées par requête (en-tête Server-Timing) ---
+
+
+def timing_header_from_env() -> bool:
+    """RAG_TIMING_HEADER (défaut 0): en-tête Server-Timing sur les réponses de l'API."""
+    return os.getenv("RAG_TIMING_HEADER", "0").strip().lower() in {"1", "true", "yes"}
+
+
+_REQUEST_TIMINGS: contextvars.ContextVar[Optional[Dict[str, float]]] = contextvars.ContextVar(
+    "rag_request_timings", default=None
+)
+
+
+def start_request_timings() -> Dict[str, float]:
+    """Active la collecte des durées d'étapes pour la requête courante (contexte asyncio / thread)."""
+    timings: Dict[str, float] = {}
+    _REQUEST_TIMINGS.set(timings)
+    return timings
+
+
+def run_with_context(fn: Callable, *args):
+    """Appelable pour run_in_executor conservant le contexte (durées de la requête courante)."""
+    ctx = contextvars.copy_context()
+    return lambda: ctx.run(fn, *args)
+
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - start)
+
+
+def observe_stage(stage: str, seconds: float) -> None:
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    timings = _REQUEST_TIMINGS.get()
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + seconds
+
+
+def server_timing_header(timings: Dict[str, float]) -> str:
+    """Valeur d'en-tête Server-Timing (durées en millisecondes)."""
+    return ", ".join(f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in timings.items())
@@ -1,13 +1,15 @@
 from __future__ import annotations
 
+import math
 from dataclasses import dataclass
 from datetime import datetime, timezone
 from typing import List, Optional, Set
 
-import pandas as pd
 from langchain_core.documents import Document
 from langchain_core.vectorstores import VectorStoreRetriever
 
+from src.indexing.metadata_index import begin_ts_of
+
 
 RECO_HINTS = {
     "recommande", "recommander", "propose", "suggestion", "quoi faire", "sortie", "idée",
@@ -29,15 +31,6 @@ def detect_intent(question: str) -> str:
     return "upcoming_only"
 
 
-def parse_dt_utc(value) -> Optional[datetime]:
-    if value is None or (isinstance(value, float) and pd.isna(value)):
-        return None
-    try:
-        return pd.to_datetime(value, utc=True).to_pydatetime()
-    except Exception:
-        return None
-
-
 @dataclass
 class FilteredRetriever:
     base_retriever: VectorStoreRetriever
@@ -49,9 +42,11 @@ class FilteredRetriever:
         now = datetime.now(timezone.utc)
 
         candidates = self.base_retriever.invoke(question)  # ex: k_fetch=20
+        # filtre temps vectorisé: epoch précalculé, comparé sur tout le lot
+        future_ok = begin_ts_of([d.metadata for d in candidates]) >= math.ceil(now.timestamp())
         kept: List[Document] = []
 
-        for d in candidates:
+        for d, is_future in zip(candidates, future_ok):
             md = d.metadata or {}
 
             # --- filtre géo ---
@@ -61,10 +56,8 @@ class FilteredRetriever:
                     continue
 
             # --- filtre temps ---
-            dt = parse_dt_utc(md.get("first_begin_dt"))
-            if intent == "upcoming_only":
-                if dt is None or dt < now:
-                    continue
+            if intent == "upcoming_only" and not is_future:
+                continue
 
             kept.append(d)
             if len(kept) >= self.k_final:
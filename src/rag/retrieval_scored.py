@@ -1,21 +1,48 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
+import math
+import threading
+from dataclasses import dataclass, field
 from datetime import datetime, timezone
-from typing import List, Optional, Set, Tuple
+from typing import Dict, List, Optional, Set, Tuple
 
-import pandas as pd
+import numpy as np
 from langchain_core.documents import Document
 from langchain_community.vectorstores import FAISS
 
+from src.indexing.metadata_index import MetadataIndex, begin_ts_of, make_search_params
+from src.rag.metrics import CANDIDATES_TOTAL, NO_ELIGIBLE_TOTAL, RETRIES_TOTAL, span
 
-def parse_dt_utc(value) -> Optional[datetime]:
-    if value is None or (isinstance(value, float) and pd.isna(value)):
-        return None
-    try:
-        return pd.to_datetime(value, utc=True).to_pydatetime()
-    except Exception:
-        return None
+
+Scored = List[Tuple[Document, float]]
+
+
+@dataclass
+class RetrievalStats:
+    """Compteurs cumulés du retriever (exposés par l'API)."""
+    queries: int = 0
+    searches: int = 0  # appels index.search (un batch = un appel)
+    relaxed: int = 0  # questions ayant eu besoin du seuil relâché
+    widened: int = 0  # questions ayant nécessité une nouvelle recherche avec k_fetch élargi
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def add(self, **counts: int) -> None:
+        with self._lock:
+            for name, value in counts.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                "queries": self.queries,
+                "searches": self.searches,
+                "relaxed": self.relaxed,
+                "widened": self.widened,
+                "widen_rate": round(self.widened / self.queries, 4) if self.queries else 0.0,
+            }
+
+
+RETRIEVAL_STATS = RetrievalStats()
 
 
 @dataclass
@@ -26,36 +53,172 @@ class ScoredFilteredRetriever:
     k_final: int = 5
     max_distance: float = 1.0
     future_only: bool = True
+    # si fourni: filtre ville/date appliqué DANS la recherche FAISS (IDSelector)
+    metadata_index: Optional[MetadataIndex] = None
+    # post-filtrage: plafond de l'élargissement adaptatif de k_fetch
+    max_k_fetch: int = 640
+
+    def retrieve(self, question: str) -> Scored:
+        return self.retrieve_batch([question])[0]
 
-    def retrieve(self, question: str) -> List[Tuple[Document, float]]:
+    def retrieve_batch(self, questions: List[str]) -> List[Scored]:
+        """
+        Un seul passage d'embedding et une seule recherche FAISS (matrice (N, d))
+        pour N questions; les filtres et seuils sont ensuite appliqués ligne par ligne.
+        """
+        if not questions:
+            return []
+        return self.retrieve_by_vectors(self.embed(questions))
+
+    def retrieve_by_vectors(self, vectors: np.ndarray) -> List[Scored]:
+        """Comme retrieve_batch, pour des questions déjà vectorisées (voir embed)."""
         now = datetime.now(timezone.utc)
+        # dates stockées à la seconde: dt >= now  <=>  ts >= ceil(now)
+        min_ts = math.ceil(now.timestamp())
 
-        def run(max_dist: float) -> List[Tuple[Document, float]]:
-            results = self.vectorstore.similarity_search_with_score(question, k=self.k_fetch)
-            kept = []
-            for doc, dist in results:
-                if dist is None or dist > max_dist:
-                    continue
+        RETRIEVAL_STATS.add(queries=len(vectors))
 
-                md = doc.metadata or {}
+        if self.metadata_index is not None:
+            out = self._retrieve_prefiltered(vectors, min_ts)
+        else:
+            out = self._retrieve_post_filtered(vectors, min_ts)
+        CANDIDATES_TOTAL.inc(sum(len(kept) for kept in out), kind="kept")
+        return out
 
-                if self.allowed_cities:
-                    city = (md.get("location_city") or "").strip()
-                    if city and city not in self.allowed_cities:
-                        continue
+    def embed(self, questions: List[str]) -> np.ndarray:
+        emb = self.vectorstore.embedding_function
+        with span("embed"):
+            if len(questions) == 1:
+                rows = [emb.embed_query(questions[0])]
+            else:
+                rows = emb.embed_documents(list(questions))
+            vectors = np.asarray(rows, dtype=np.float32)
+            if getattr(self.vectorstore, "_normalize_L2", False):
+                import faiss
 
-                dt = parse_dt_utc(md.get("first_begin_dt"))
-                if self.future_only:
-                    if dt is None or dt < now:
+                faiss.normalize_L2(vectors)
+        return vectors
+
+    def _search(self, vectors: np.ndarray, k: int, params=None) -> List[Scored]:
+        vs = self.vectorstore
+        RETRIEVAL_STATS.add(searches=1)
+        with span("search"):
+            if params is None:
+                scores, indices = vs.index.search(vectors, k)
+            else:
+                scores, indices = vs.index.search(vectors, k, params=params)
+
+        out: List[Scored] = []
+        with span("docstore"):
+            for row_ids, row_scores in zip(indices, scores):
+                results: Scored = []
+                for i, dist in zip(row_ids, row_scores):
+                    if i == -1:
                         continue
+                    results.append((vs.docstore.search(vs.index_to_docstore_id[int(i)]), float(dist)))
+                out.append(results)
+        CANDIDATES_TOTAL.inc(sum(len(results) for results in out), kind="fetched")
+        return out
+
+    def _relax(self, results: Scored) -> Tuple[Scored, bool]:
+        # seuil normal, puis seuil relâché si trop peu de résultats (mêmes candidats)
+        kept = [(d, dist) for d, dist in results if dist <= self.max_distance][: self.k_final]
+        if len(kept) >= min(3, self.k_final):
+            return kept, False
+        return [(d, dist) for d, dist in results if dist <= self.max_distance + 0.2][: self.k_final], True
+
+    def _can_widen(self, results: Scored, k: int) -> bool:
+        """
+        Une recherche plus large n'est utile que si la page était pleine, que l'index
+        contient d'autres vecteurs, et que le plus lointain candidat passe encore le
+        seuil relâché (résultats triés: au-delà, tout serait rejeté par la distance).
+        """
+        ntotal = self.vectorstore.index.ntotal
+        return (
+            len(results) >= k
+            and k < min(ntotal, self.max_k_fetch)
+            and bool(results)
+            and results[-1][1] <= self.max_distance + 0.2
+        )
+
+    def _retrieve_post_filtered(self, vectors: np.ndarray, min_ts: int) -> List[Scored]:
+        """
+        Sans index de métadonnées: une recherche k_fetch, filtrage, relâchement du seuil
+        sur les mêmes candidats; une nouvelle recherche (k_fetch doublé) n'est lancée
+        que pour les questions où elle peut encore apporter des résultats.
+        """
+        k = self.k_fetch
+        candidates = self._search(vectors, k)
+        out: List[Scored] = [[] for _ in range(len(vectors))]
+        relaxed_rows: Set[int] = set()
+        widened_rows: Set[int] = set()
+        pending = list(range(len(vectors)))
+
+        while pending:
+            to_widen = []
+            with span("filter"):
+                for row in pending:
+                    kept, relaxed = self._relax(self._post_filter(candidates[row], min_ts))
+                    out[row] = kept
+                    if relaxed:
+                        relaxed_rows.add(row)
+                    else:
+                        relaxed_rows.discard(row)
+                    if len(kept) < min(3, self.k_final) and self._can_widen(candidates[row], k):
+                        to_widen.append(row)
+
+            if not to_widen:
+                break
+            k = min(k * 2, self.vectorstore.index.ntotal, self.max_k_fetch)
+            for row, results in zip(to_widen, self._search(vectors[to_widen], k)):
+                candidates[row] = results
+            widened_rows.update(to_widen)
+            pending = to_widen
+
+        RETRIEVAL_STATS.add(relaxed=len(relaxed_rows), widened=len(widened_rows))
+        RETRIES_TOTAL.inc(len(relaxed_rows), kind="relaxed")
+        RETRIES_TOTAL.inc(len(widened_rows), kind="widened")
+        return out
+
+    def _post_filter(self, results: Scored, min_ts: int) -> Scored:
+        # filtre temps: une comparaison NumPy sur tout le lot de candidats
+        future_ok = begin_ts_of([doc.metadata for doc, _ in results]) >= min_ts
+        eligible: Scored = []
+        for (doc, dist), is_future in zip(results, future_ok):
+            md = doc.metadata or {}
+
+            if self.allowed_cities:
+                city = (md.get("location_city") or "").strip()
+                if city and city not in self.allowed_cities:
+                    continue
+
+            if self.future_only and not is_future:
+                continue
 
-                kept.append((doc, dist))
-                if len(kept) >= self.k_final:
-                    break
-            return kept
+            eligible.append((doc, dist))
+        return eligible
 
-        kept = run(self.max_distance)
-        if len(kept) < min(3, self.k_final):
-            kept = run(self.max_distance + 0.2)
+    def _retrieve_prefiltered(self, vectors: np.ndarray, min_ts: int) -> List[Scored]:
+        """
+        Top-k exact parmi les seules rows éligibles (ville + date), en une recherche.
+        Les candidats étant déjà filtrés, le seuil relâché se rejoue sur les mêmes résultats.
+        """
+        with span("filter"):
+            mask = self.metadata_index.mask(
+                self.allowed_cities,
+                min_begin_ts=min_ts if self.future_only else None,
+            )
+            n_eligible = int(mask.sum())
+        if n_eligible == 0:
+            # aucune row éligible: pas de recherche FAISS (la réponse compte ensuite en no_docs)
+            NO_ELIGIBLE_TOTAL.inc(len(vectors))
+            return [[] for _ in range(len(vectors))]
 
-        return kept
+        params, _keepalive = make_search_params(mask, self.vectorstore.index)
+        candidates = self._search(vectors, min(self.k_final, n_eligible), params=params)
+        with span("filter"):
+            batch = [self._relax(results) for results in candidates]
+        n_relaxed = sum(1 for _, relaxed in batch if relaxed)
+        RETRIEVAL_STATS.add(relaxed=n_relaxed)
+        RETRIES_TOTAL.inc(n_relaxed, kind="relaxed")
+        return [kept for kept, _ in batch]
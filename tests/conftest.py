@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+import pytest
+
+from src.rag.fakes import HashingEmbeddings
+
+
+@dataclass
+class FakeResponse:
+    content: str
+
+
+class FakeLLM:
+    def invoke(self, messages):
+        return FakeResponse(content="Réponse de test.")
+
+
+def _iso(dt: datetime) -> str:
+    return dt.strftime("%Y-%m-%dT%H:%M:%S.000Z")
+
+
+def make_tiny_events(now: datetime | None = None):
+    """Petit corpus synthétique (texte, métadonnées) couvrant villes et dates variées."""
+    now = now or datetime.now(timezone.utc)
+    cities = ["Orsay", "Gif-sur-Yvette", "Lyon", None]
+    events = []
+    for i in range(24):
+        days = (i % 6 - 2) * 10  # passé et futur
+        md = {
+            "uid": f"evt-{i}",
+            "first_begin_dt": _iso(now + timedelta(days=days)) if i % 7 else None,
+            "location_city": cities[i % len(cities)],
+        }
+        events.append((f"Titre: événement {i}\nDescription: conférence numéro {i}", md))
+    return events
+
+
+def make_events_df(n: int) -> pd.DataFrame:
+    """Evénements "index ready" (colonne document) pour les tests de construction d'index."""
+    return pd.DataFrame(
+        [
+            {
+                "uid": f"evt-{i}",
+                "document": f"Titre: événement {i}\nDescription: conférence numéro {i}",
+                "first_begin_dt": "2030-01-01T10:00:00.000Z",
+                "location_city": "Orsay",
+            }
+            for i in range(n)
+        ]
+    )
+
+
+def make_raw_event(i: int, begin: datetime) -> dict:
+    """Événement brut au format de l'API OpenAgenda."""
+    return {
+        "uid": i,
+        "title": {"fr": f"Conférence {i}"},
+        "description": {"fr": "Une description suffisamment longue pour être conservée."},
+        "firstTiming": {"begin": begin.isoformat()},
+        "location": {"name": "Salle", "city": "Orsay"},
+    }
+
+
+@pytest.fixture
+def tiny_vectorstore():
+    from langchain_community.vectorstores import FAISS
+
+    events = make_tiny_events()
+    texts = [t for t, _ in events]
+    metadatas = [md for _, md in events]
+    return FAISS.from_texts(texts, HashingEmbeddings(), metadatas=metadatas)
+
+
+@pytest.fixture
+def shared_components(tiny_vectorstore, monkeypatch):
+    """Injecte le petit index + un faux LLM dans le cache partagé de src.rag.chain."""
+    from langchain_core.prompts import ChatPromptTemplate
+
+    import src.rag.chain as chain
+    from src.indexing.metadata_index import build_metadata_index
+    from src.rag.prompt import HUMAN_PROMPT, SYSTEM_PROMPT
+
+    prompt = ChatPromptTemplate.from_messages([("system", SYSTEM_PROMPT.strip()), ("human", HUMAN_PROMPT.strip())])
+    components = (tiny_vectorstore, build_metadata_index(tiny_vectorstore), prompt, FakeLLM(), "test")
+    monkeypatch.setattr(chain, "_SHARED_CACHE", components)
+    chain.ANSWER_CACHE.clear()
+    return components
@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import time
+
+import numpy as np
+
+import src.rag.chain as chain
+from src.rag.answer_cache import SemanticAnswerCache
+
+from tests.conftest import FakeResponse
+
+
+class CountingLLM:
+    def __init__(self):
+        self.calls = 0
+
+    def invoke(self, messages):
+        self.calls += 1
+        return FakeResponse(content=f"Réponse {self.calls}.")
+
+
+def test_lookup_requires_same_key_and_similar_embedding():
+    cache = SemanticAnswerCache(max_entries=10, ttl_s=60, threshold=0.95)
+    key = cache.make_key({" Orsay", "Gif-sur-Yvette"}, True, "v1")
+    cache.store(key, [1.0, 0.0, 0.0], "answer")
+
+    assert cache.lookup(cache.make_key(["Gif-sur-Yvette", "Orsay"], True, "v1"), [0.99, 0.05, 0.0]) == "answer"
+    assert cache.lookup(key, [0.0, 1.0, 0.0]) is None  # question différente
+    assert cache.lookup(cache.make_key({"Orsay"}, True, "v1"), [1.0, 0.0, 0.0]) is None  # autres villes
+    assert cache.lookup(cache.make_key({"Orsay", "Gif-sur-Yvette"}, False, "v1"), [1.0, 0.0, 0.0]) is None
+    assert cache.lookup(cache.make_key({"Orsay", "Gif-sur-Yvette"}, True, "v2"), [1.0, 0.0, 0.0]) is None
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"]) == (1, 4)
+
+
+def test_lru_and_ttl_eviction():
+    cache = SemanticAnswerCache(max_entries=2, ttl_s=0.05, threshold=0.99)
+    key = cache.make_key(None, True, "v1")
+    basis = np.eye(3)
+    cache.store(key, basis[0], "a")
+    cache.store(key, basis[1], "b")
+    assert cache.lookup(key, basis[0]) == "a"  # "a" devient le plus récent
+    cache.store(key, basis[2], "c")  # évince "b"
+
+    assert cache.lookup(key, basis[1]) is None
+    assert cache.lookup(key, basis[2]) == "c"
+
+    time.sleep(0.06)
+    assert cache.lookup(key, basis[0]) is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_answer_question_reuses_cached_answer_until_rebuild(shared_components, monkeypatch):
+    vs, meta, prompt, _, _ = shared_components
+    llm = CountingLLM()
+    monkeypatch.setattr(chain, "_SHARED_CACHE", (vs, meta, prompt, llm, "test"))
+
+    first = chain.answer_question("conférence numéro 1", allowed_cities={"Orsay", "Gif-sur-Yvette"})
+    again = chain.answer_question("Conférence numéro 1 ?", allowed_cities={"Gif-sur-Yvette", "Orsay"})
+    assert first.sources and again.answer == first.answer
+    assert llm.calls == 1
+
+    # autre filtre -> pas de réutilisation
+    chain.answer_question("conférence numéro 1", allowed_cities={"Orsay"})
+    assert llm.calls == 2
+
+    # rebuild: la nouvelle version est chargée puis substituée, le cache est vidé
+    monkeypatch.setattr(chain, "_load_index", lambda: (vs, meta, "v2"))
+    assert chain.reload_shared_components() == "v2"
+    assert chain.ANSWER_CACHE.stats()["entries"] == 0
+
+
+def test_retriever_params_are_part_of_the_cache_key(shared_components, monkeypatch):
+    vs, meta, prompt, _, _ = shared_components
+    llm = CountingLLM()
+    monkeypatch.setattr(chain, "_SHARED_CACHE", (vs, meta, prompt, llm, "test"))
+    monkeypatch.setattr(chain, "ANSWER_CACHE", SemanticAnswerCache(max_entries=16, ttl_s=60))
+
+    questions = ["conférence numéro 1"]
+    chain.answer_questions(questions, allowed_cities={"Orsay", "Gif-sur-Yvette"})
+    # autre seuil (balayage de l'éval): pas de réponse générée avec le seuil par défaut
+    chain.answer_questions(questions, allowed_cities={"Orsay", "Gif-sur-Yvette"}, retriever_params={"max_distance": 1.25})
+    assert llm.calls == 2
+
+    chain.answer_questions(questions, allowed_cities={"Orsay", "Gif-sur-Yvette"}, retriever_params={"max_distance": 1.25})
+    assert llm.calls == 2
@@ -0,0 +1,388 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+
+import httpx
+import pytest
+
+import src.api.main as api
+from src.api.limiter import ConcurrencyLimiter, LimiterFull
+from src.rag.chain import answer_question_async
+
+from tests.conftest import FakeResponse
+
+
+LLM_LATENCY_S = 0.2
+
+
+class FakeAsyncLLM:
+    def __init__(self, latency_s: float = LLM_LATENCY_S):
+        self.latency_s = latency_s
+
+    async def ainvoke(self, messages):
+        await asyncio.sleep(self.latency_s)
+        return FakeResponse(content="Réponse asynchrone.")
+
+
+def _client():
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=api.app), base_url="http://test")
+
+
+def test_concurrent_async_answers_take_about_one_llm_latency(shared_components):
+    llm = FakeAsyncLLM()
+
+    async def run(n: int):
+        return await asyncio.gather(
+            *[answer_question_async(f"conférence numéro {i}", llm_override=llm) for i in range(n)]
+        )
+
+    t0 = time.perf_counter()
+    results = asyncio.run(run(50))
+    elapsed = time.perf_counter() - t0
+
+    assert len(results) == 50
+    assert any(r.sources for r in results)
+    # séquentiel: 50 * 0.2 s = 10 s
+    assert elapsed < LLM_LATENCY_S * 5
+
+
+def test_ask_route_returns_429_when_queue_is_full(shared_components, monkeypatch):
+    vs, meta, prompt, _, _ = shared_components
+    import src.rag.chain as chain
+
+    monkeypatch.setattr(chain, "_SHARED_CACHE", (vs, meta, prompt, FakeAsyncLLM(latency_s=0.3), "test"))
+    monkeypatch.setattr(api, "LIMITER", ConcurrencyLimiter(max_concurrency=2, max_queue=1))
+
+    async def run():
+        async with _client() as client:
+            payload = {"question": "conférence numéro 2", "allowed_cities": ["Orsay", "Gif-sur-Yvette"]}
+            return await asyncio.gather(*[client.post("/ask", json=payload) for _ in range(5)])
+
+    statuses = sorted(r.status_code for r in asyncio.run(run()))
+    assert statuses == [200, 200, 200, 429, 429]
+    assert api.LIMITER.stats()["rejected"] == 2
+
+
+def test_slow_chain_import_does_not_block_event_loop(shared_components, monkeypatch):
+    import importlib
+
+    vs, meta, prompt, _, _ = shared_components
+    import src.rag.chain as chain
+
+    real_import = importlib.import_module
+
+    def slow_import(name, package=None):
+        # premier import de la chaîne (ou attente du warm-up qui le tient)
+        time.sleep(0.5)
+        return real_import(name, package)
+
+    monkeypatch.setattr(chain, "_SHARED_CACHE", (vs, meta, prompt, FakeAsyncLLM(latency_s=0.0), "test"))
+    monkeypatch.setattr(importlib, "import_module", slow_import)
+
+    async def run():
+        async with _client() as client:
+            t0 = time.perf_counter()
+            ask = asyncio.create_task(client.post("/ask", json={"question": "conférence numéro 2"}))
+            await asyncio.sleep(0.05)
+            health = await client.get("/")
+            health_s = time.perf_counter() - t0
+            return await ask, health, health_s
+
+    ask, health, health_s = asyncio.run(run())
+    assert ask.status_code == 200
+    assert health.status_code == 200
+    assert health_s < 0.3
+
+
+def test_limiter_rejects_beyond_queue_depth():
+    limiter = ConcurrencyLimiter(max_concurrency=1, max_queue=0)
+
+    async def run():
+        async with limiter.slot():
+            with pytest.raises(LimiterFull):
+                async with limiter.slot():
+                    pass
+            # refus avant ouverture d'un flux (/ask/stream): même compteur
+            assert limiter.try_reject()
+        # slot libéré: une nouvelle requête passe
+        assert not limiter.try_reject()
+        async with limiter.slot():
+            return limiter.stats()
+
+    stats = asyncio.run(run())
+    assert stats["in_flight"] == 1
+    assert stats["rejected"] == 2
+
+
+def test_batch_goes_through_the_limiter(shared_components, monkeypatch):
+    vs, meta, prompt, _, _ = shared_components
+    import src.rag.chain as chain
+
+    in_flight = []
+
+    class RecordingLLM:
+        def invoke(self, messages):
+            in_flight.append(api.LIMITER.in_flight)
+            return FakeResponse(content="Réponse.")
+
+    monkeypatch.setattr(chain, "_SHARED_CACHE", (vs, meta, prompt, RecordingLLM(), "test"))
+    monkeypatch.setattr(api, "LIMITER", ConcurrencyLimiter(max_concurrency=4, max_queue=0))
+    payload = {"questions": [f"conférence numéro {i}" for i in (1, 5, 13)], "allowed_cities": ["Orsay", "Gif-sur-Yvette"]}
+
+    async def run():
+        async with _client() as client:
+            ok = await client.post("/ask/batch", json=payload)
+            async with api.LIMITER.slot(weight=4):  # toutes les places prises
+                full = await client.post("/ask/batch", json=payload)
+            return ok, full
+
+    ok, full = asyncio.run(run())
+    assert ok.status_code == 200 and len(ok.json()["results"]) == 3
+    assert in_flight and set(in_flight) == {3}  # une place par question
+    assert full.status_code == 429
+    assert api.LIMITER.stats()["in_flight"] == 0
+
+
+def test_batches_larger_than_the_limit_do_not_deadlock():
+    limiter = ConcurrencyLimiter(max_concurrency=4, max_queue=8)
+
+    async def batch(weight: int):
+        async with limiter.slot(weight=weight):
+            await asyncio.sleep(0.01)
+
+    async def run():
+        await asyncio.wait_for(asyncio.gather(*[batch(w) for w in (3, 3, 32, 1, 2)]), timeout=5)
+
+    asyncio.run(run())
+    assert limiter.stats()["in_flight"] == 0
+
+
+def test_ready_reports_each_warmup_step(tiny_vectorstore, monkeypatch):
+    import src.rag.chain as chain
+    from src.api.warmup import STEPS, Warmup
+    from src.indexing.metadata_index import build_metadata_index
+
+    monkeypatch.setattr("src.indexing.faiss_store.get_query_embeddings", lambda: tiny_vectorstore.embedding_function)
+    monkeypatch.setattr(chain, "_SHARED_CACHE", None)
+    monkeypatch.setattr(chain, "_load_index", lambda: (tiny_vectorstore, build_metadata_index(tiny_vectorstore), "test"))
+    monkeypatch.setattr(chain, "get_llm", lambda: FakeAsyncLLM())
+    monkeypatch.setattr(api, "WARMUP", Warmup())
+
+    async def get_ready():
+        async with _client() as client:
+            return await client.get("/ready")
+
+    before = asyncio.run(get_ready())
+    assert before.status_code == 503
+    assert before.json()["steps"]["index"]["status"] == "pending"
+
+    from src.rag.metrics import CANDIDATES_TOTAL
+    from src.rag.retrieval_scored import RETRIEVAL_STATS
+
+    stats_before = RETRIEVAL_STATS.snapshot()
+    fetched_before = CANDIDATES_TOTAL.value(kind="fetched")
+    api.WARMUP.start().join(timeout=30)
+    # la requête de chauffe n'est pas comptée comme une question utilisateur
+    assert RETRIEVAL_STATS.snapshot() == stats_before
+    assert CANDIDATES_TOTAL.value(kind="fetched") == fetched_before
+    after = asyncio.run(get_ready())
+    assert after.status_code == 200
+    body = after.json()
+    assert list(body["steps"]) == list(STEPS)
+    assert all(step["status"] == "ready" and step["duration_s"] is not None for step in body["steps"].values())
+    assert chain._SHARED_CACHE is not None
+
+
+def test_ready_when_warmup_is_disabled(monkeypatch):
+    from src.api.warmup import Warmup
+
+    monkeypatch.setenv("RAG_WARMUP", "0")
+    monkeypatch.setattr(api, "WARMUP", Warmup())
+
+    async def run():
+        async with api.lifespan(api.app):
+            async with _client() as client:
+                return await client.get("/ready"), await client.get("/metrics")
+
+    ready, metrics = asyncio.run(run())
+    assert ready.status_code == 200
+    assert {step["status"] for step in ready.json()["steps"].values()} == {"skipped"}
+    assert "rag_ready 1" in metrics.text
+
+
+def test_warmup_reports_failed_llm_step(tiny_vectorstore, monkeypatch):
+    import src.rag.chain as chain
+    from src.api.warmup import Warmup
+    from src.indexing.metadata_index import build_metadata_index
+
+    def no_key():
+        raise RuntimeError("MISTRAL_API_KEY manquante")
+
+    monkeypatch.setattr("src.indexing.faiss_store.get_query_embeddings", lambda: tiny_vectorstore.embedding_function)
+    monkeypatch.setattr(chain, "_SHARED_CACHE", None)
+    monkeypatch.setattr(chain, "_load_index", lambda: (tiny_vectorstore, build_metadata_index(tiny_vectorstore), "test"))
+    monkeypatch.setattr(chain, "get_llm", no_key)
+
+    warmup = Warmup()
+    warmup.run()
+    snapshot = warmup.snapshot()
+    assert not snapshot["ready"]
+    assert snapshot["steps"]["index"]["status"] == "ready"
+    assert snapshot["steps"]["llm"]["status"] == "failed"
+    assert "MISTRAL_API_KEY" in snapshot["steps"]["llm"]["error"]
+    assert snapshot["steps"]["warmup_query"]["status"] == "pending"
+
+
+def test_request_during_warmup_reuses_the_embedder_being_loaded(tiny_vectorstore, monkeypatch):
+    import threading
+
+    import src.indexing.faiss_store as faiss_store
+    import src.rag.chain as chain
+    from src.api.warmup import Warmup
+    from src.indexing.metadata_index import build_metadata_index
+
+    from tests.conftest import HashingEmbeddings
+
+    built = []
+    loading = threading.Event()
+
+    def slow_embeddings(model_name=None):
+        built.append(model_name)
+        loading.set()
+        time.sleep(0.3)
+        return HashingEmbeddings()
+
+    def load_index():
+        faiss_store.get_query_embeddings()
+        return tiny_vectorstore, build_metadata_index(tiny_vectorstore), "test"
+
+    monkeypatch.setattr(faiss_store, "_QUERY_EMBEDDINGS", {})
+    monkeypatch.setattr(faiss_store, "get_embeddings", slow_embeddings)
+    monkeypatch.setattr(chain, "_SHARED_CACHE", None)
+    monkeypatch.setattr(chain, "_load_index", load_index)
+    monkeypatch.setattr(chain, "get_llm", lambda: FakeAsyncLLM())
+
+    warmup = Warmup()
+    thread = warmup.start()
+    assert loading.wait(timeout=10)
+    chain.get_shared_components()  # requête arrivée pendant l'étape embedder
+    thread.join(timeout=30)
+
+    assert warmup.ready
+    assert len(built) == 1
+
+
+class FakeStreamingLLM:
+    def __init__(self, tokens, delay_s: float = 0.0):
+        self.tokens = tokens
+        self.delay_s = delay_s
+
+    async def astream(self, messages):
+        for t in self.tokens:
+            await asyncio.sleep(self.delay_s)
+            yield FakeResponse(content=t)
+
+
+def _parse_sse(body: str):
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def test_ask_stream_sends_sources_then_tokens_then_trailer(shared_components, monkeypatch):
+    import src.rag.chain as chain
+
+    vs, meta, prompt, _, _ = shared_components
+    monkeypatch.setattr(chain, "_SHARED_CACHE", (vs, meta, prompt, FakeStreamingLLM([" Voici ", "deux ", "événements. "]), "test"))
+
+    async def run():
+        async with _client() as client:
+            payload = {"question": "conférence numéro 2", "allowed_cities": ["Orsay", "Gif-sur-Yvette"]}
+            return await client.post("/ask/stream", json=payload)
+
+    response = asyncio.run(run())
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+
+    events = _parse_sse(response.text)
+    names = [name for name, _ in events]
+    assert names[0] == "sources" and names[-2:] == ["trailer", "done"]
+    assert [data for name, data in events if name == "token"] == [" Voici ", "deux ", "événements. "]
+
+    sources, trailer, done = events[0][1], events[-2][1], events[-1][1]
+    assert sources and trailer == chain.format_sources_block(sources)
+    assert done["answer"] == "Voici deux événements." + trailer
+
+
+def test_stream_yields_sources_before_generation_finishes(shared_components):
+    from src.rag.chain import answer_question_stream
+
+    async def run():
+        start = time.perf_counter()
+        stream = answer_question_stream("conférence numéro 2", llm_override=FakeStreamingLLM(["a", "b"], delay_s=0.3))
+        first = await stream.__anext__()
+        first_at = time.perf_counter() - start
+        rest = [event async for event in stream]
+        return first, first_at, rest
+
+    first, first_at, rest = asyncio.run(run())
+    assert first[0] == "sources"
+    assert first_at < 0.3  # avant le premier token
+    assert [name for name, _ in rest] == ["token", "token", "trailer", "done"]
+
+
+def test_metrics_expose_stage_durations_and_retrieval_counters(shared_components, monkeypatch):
+    import src.rag.chain as chain
+    from src.rag.metrics import CANDIDATES_TOTAL, STAGE_SECONDS
+
+    vs, meta, prompt, _, _ = shared_components
+    monkeypatch.setattr(chain, "_SHARED_CACHE", (vs, meta, prompt, FakeAsyncLLM(latency_s=0.05), "test"))
+    monkeypatch.setattr(api, "TIMING_HEADER", True)
+    llm_before = STAGE_SECONDS.count(stage="llm")
+    fetched_before = CANDIDATES_TOTAL.value(kind="fetched")
+
+    async def run():
+        async with _client() as client:
+            payload = {"question": "conférence numéro 2", "allowed_cities": ["Orsay", "Gif-sur-Yvette"]}
+            answer = await client.post("/ask", json=payload)
+            return answer, await client.get("/metrics")
+
+    answer, metrics = asyncio.run(run())
+    assert answer.status_code == 200
+    # Server-Timing: une entrée par étape exécutée pour cette requête
+    stages = {part.split(";")[0] for part in answer.headers["server-timing"].split(", ")}
+    assert {"embed", "search", "filter", "prompt", "llm", "serialize", "total"} <= stages
+
+    assert STAGE_SECONDS.count(stage="llm") == llm_before + 1
+    assert CANDIDATES_TOTAL.value(kind="fetched") > fetched_before
+    assert metrics.headers["content-type"].startswith("text/plain")
+    assert 'rag_stage_duration_seconds_count{stage="search"}' in metrics.text
+    assert 'rag_requests_total{route="/ask",status="200"}' in metrics.text
+    assert "rag_limiter_in_flight 0" in metrics.text
+
+
+def test_no_eligible_answer_is_counted_once(shared_components, monkeypatch):
+    import numpy as np
+
+    from src.rag.chain import answer_question
+    from src.rag.metrics import NO_ELIGIBLE_TOTAL, NO_RESULT_TOTAL
+
+    meta = shared_components[1]
+    # aucune row ne passe les filtres ville / date: pas de recherche FAISS
+    monkeypatch.setattr(type(meta), "mask", lambda self, *args, **kwargs: np.zeros(self.size, dtype=bool))
+
+    reasons = ("no_docs", "low_confidence", "no_eligible")
+    before = {r: NO_RESULT_TOTAL.value(reason=r) for r in reasons}
+    no_eligible_before = NO_ELIGIBLE_TOTAL.value()
+
+    res = answer_question("conférence numéro 2", allowed_cities={"Orsay"})
+
+    assert res.sources == []
+    after = {r: NO_RESULT_TOTAL.value(reason=r) for r in reasons}
+    assert sum(after.values()) - sum(before.values()) == 1
+    assert after["no_docs"] == before["no_docs"] + 1
+    assert NO_ELIGIBLE_TOTAL.value() == no_eligible_before + 1
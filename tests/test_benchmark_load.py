@@ -0,0 +1,40 @@
+from __future__ import annotations
+
+import src.api.main as api
+import src.rag.chain as chain
+from src.api.benchmark_load import compare_reports, run_benchmark
+
+
+def test_load_benchmark_reports_each_concurrency_level():
+    before = (chain._SHARED_CACHE, chain.ANSWER_CACHE, api.LIMITER, api.WARMUP)
+
+    report = run_benchmark(n_events=200, concurrency_levels=(1, 4), requests_per_level=8, llm_latency_s=0.01)
+
+    assert [r["concurrency"] for r in report["levels"]] == [1, 4]
+    for level in report["levels"]:
+        assert level["status_counts"] == {"200": 8}
+        assert level["latency_ms"]["p50"] <= level["latency_ms"]["p95"] <= level["latency_ms"]["p99"]
+        assert level["throughput_rps"] > 0
+    # le LLM factice est bien appelé (questions proches des événements synthétiques)
+    assert report["llm_calls"] > 0
+    # l'état de l'API est restauré après le run
+    assert (chain._SHARED_CACHE, chain.ANSWER_CACHE, api.LIMITER, api.WARMUP) == before
+
+    lines = compare_reports(report, report)
+    assert len(lines) == 3 and "+0.0%" in lines[1]
+
+
+def test_uvicorn_mode_does_not_start_the_warmup(monkeypatch):
+    import os
+
+    from src.api.warmup import Warmup
+
+    started = []
+    monkeypatch.setattr(Warmup, "start", lambda self: started.append(True))
+    monkeypatch.delenv("RAG_WARMUP", raising=False)
+
+    report = run_benchmark(n_events=100, concurrency_levels=(2,), requests_per_level=4, llm_latency_s=0.0, mode="uvicorn")
+
+    assert report["levels"][0]["status_counts"] == {"200": 4}
+    assert started == []
+    assert "RAG_WARMUP" not in os.environ
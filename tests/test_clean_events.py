@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+from datetime import datetime, timezone
+
+import pandas as pd
+
+from src.preprocessing.benchmark_clean import (
+    legacy_build_document_text,
+    legacy_to_dataframe,
+    make_synthetic_events,
+    run_benchmark,
+)
+from src.indexing.prepare_documents import build_documents, load_index_ready
+from src.preprocessing.clean_events import build_document_texts, filter_events, finalize_index_frame, to_dataframe
+from src.preprocessing.storage import INDEX_COLUMNS, read_index_ready, read_past_year, read_upcoming, write_index_ready
+
+
+def test_vectorized_path_matches_row_by_row_implementation():
+    result = run_benchmark(100, seed=1)
+    assert result["rows"] == 98  # 1 événement sur 50 n'a pas de date
+
+
+def test_edge_cases_match_legacy():
+    events = make_synthetic_events(5)
+    events[0]["title"] = "monolingue"  # pas un dict: title.fr absent
+    events[1]["firstTiming"]["begin"] = ""
+    events[2]["firstTiming"]["begin"] = "pas une date"
+    events[3]["keywords"] = {"fr": None}
+    events[4]["location"] = {"name": None, "city": "Orsay"}
+
+    new = to_dataframe(events)
+    old = legacy_to_dataframe(events)
+    pd.testing.assert_frame_equal(old, new[old.columns], check_dtype=False)
+    assert build_document_texts(new) == new.apply(legacy_build_document_text, axis=1).tolist()
+
+
+def test_parquet_roundtrip_keeps_types_and_serves_views(tmp_path):
+    now = datetime(2024, 6, 1, tzinfo=timezone.utc)
+    events = make_synthetic_events(60, seed=2)
+    events[1]["location"]["postalCode"] = 91400  # numérique dans le JSON source
+    df = finalize_index_frame(filter_events(to_dataframe(events), now))
+
+    path = write_index_ready(df, tmp_path / "events.parquet")
+    loaded = read_index_ready(path)
+
+    assert list(loaded.columns) == INDEX_COLUMNS
+    assert isinstance(loaded["first_begin_dt"].dtype, pd.DatetimeTZDtype)
+    assert loaded["uid"].tolist() == df["uid"].tolist()
+    assert "91400" in set(loaded["location_postal"])
+
+    # projection: seules les colonnes demandées sont lues
+    assert list(read_index_ready(path, columns=["uid", "document"]).columns) == ["uid", "document"]
+
+    upcoming = read_upcoming(path, now, columns=["uid"])
+    past = read_past_year(path, now, columns=["uid"])
+    assert sorted(upcoming["uid"]) == sorted(df.loc[df["first_begin_dt"] >= now, "uid"])
+    assert len(upcoming) + len(past) == len(df)
+
+
+def test_parquet_accepts_choice_fields_as_objects(tmp_path):
+    now = datetime(2024, 6, 1, tzinfo=timezone.utc)
+    events = make_synthetic_events(5, seed=3)[1:]  # le premier n'a pas de date
+    for ev in events:
+        ev["firstTiming"]["begin"] = "2024-07-01T10:00:00+02:00"  # dans la fenêtre: les 4 lignes sont gardées
+    events[0]["thematique"] = [{"id": 4, "label": {"fr": "Sciences"}}]
+    events[1]["thematique"] = 7  # valeur unique au lieu d'une liste
+    events[2]["type-devenement"] = {"id": 2, "label": {"fr": "Conférence"}}
+    events[3]["type-devenement"] = [1, 3]
+    df = finalize_index_frame(filter_events(to_dataframe(events), now))
+
+    loaded = read_index_ready(write_index_ready(df, tmp_path / "events.parquet")).set_index("uid")
+    uid = [str(ev["uid"]) for ev in events]
+    assert list(loaded.loc[uid[0], "thematique"]) == ['{"id": 4, "label": {"fr": "Sciences"}}']
+    assert list(loaded.loc[uid[1], "thematique"]) == ["7"]
+    assert loaded.loc[uid[2], "type_devenement"] == '{"id": 2, "label": {"fr": "Conférence"}}'
+    assert loaded.loc[uid[3], "type_devenement"] == "[1, 3]"
+
+
+def test_documents_from_parquet_keep_iso_dates_in_metadata(tmp_path):
+    now = datetime(2024, 6, 1, tzinfo=timezone.utc)
+    df = finalize_index_frame(filter_events(to_dataframe(make_synthetic_events(20)), now))
+    path = write_index_ready(df, tmp_path / "events.parquet")
+
+    docs = build_documents(load_index_ready(path))
+    md = docs[0].metadata
+    assert isinstance(md["first_begin_dt"], str) and md["first_begin_dt"].endswith("Z")
+    assert md["first_begin_ts"] == int(pd.Timestamp(md["first_begin_dt"]).timestamp())
@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+
+import src.preprocessing.clean_events as clean_events
+from src.preprocessing.storage import read_index_ready
+from src.ingestion.delta_sync import (
+    fetch_updated_events,
+    max_updated_at,
+    merge_delta,
+)
+
+from tests.conftest import make_raw_event
+
+
+NOW = datetime(2030, 6, 1, tzinfo=timezone.utc)
+
+
+def _updated(i: int, updated_at: str, **extra) -> dict:
+    ev = make_raw_event(i, NOW + timedelta(days=10))
+    ev.update({"updatedAt": updated_at, **extra})
+    return ev
+
+
+class FakeClient:
+    def __init__(self, events):
+        self.events = events
+        self.filters = []
+
+    def fetch_page(self, agenda_uid, size=100, after=None, filters=None):
+        self.filters.append(filters)
+        since = datetime.fromisoformat((filters or {}).get("updatedAt[gte]", "1970-01-01T00:00:00+00:00"))
+        events = [e for e in self.events if datetime.fromisoformat(e["updatedAt"]) >= since]
+        return {"events": events, "after": None}
+
+
+def _index_ready(tmp_path, monkeypatch):
+    """Jeu "index ready" initial écrit puis relu comme le ferait une synchro suivante."""
+    monkeypatch.setattr(clean_events, "OUT_DIR", tmp_path)
+    events = [make_raw_event(i, NOW + timedelta(days=i)) for i in range(4)]
+    events.append(make_raw_event(9, NOW - timedelta(days=360)))  # sortira de la fenêtre d'un an
+    df = clean_events.finalize_index_frame(clean_events.filter_events(clean_events.to_dataframe(events), NOW))
+    return read_index_ready(clean_events.export_index(df))
+
+
+def test_fetch_only_requests_events_updated_since_watermark():
+    client = FakeClient([_updated(1, "2030-05-01T10:00:00+02:00"), _updated(2, "2030-05-20T08:00:00+00:00")])
+    events = fetch_updated_events(client, ["agenda-a"], since="2030-05-10T00:00:00+00:00")
+
+    assert [e["uid"] for e in events] == [2]
+    assert client.filters[0] == {"updatedAt[gte]": "2030-05-10T00:00:00+00:00", "sort": "updatedAt.asc"}
+    assert max_updated_at(events, "2030-05-10T00:00:00+00:00") == "2030-05-20T08:00:00+00:00"
+    assert max_updated_at([], "2030-05-10T00:00:00+00:00") == "2030-05-10T00:00:00+00:00"
+
+
+def test_merge_upserts_by_uid_and_handles_cancellations(tmp_path, monkeypatch):
+    current = _index_ready(tmp_path, monkeypatch)
+    later = NOW + timedelta(days=10)  # 9 a maintenant plus d'un an
+
+    changed = _updated(1, "2030-06-02T00:00:00+00:00")
+    changed["title"] = {"fr": "Conférence 1 (nouvelle salle)"}
+    events = [
+        changed,
+        _updated(2, "2030-06-02T00:00:00+00:00", status=6),  # annulé
+        _updated(3, "2030-06-02T00:00:00+00:00", deletedAt="2030-06-02T00:00:00+00:00"),
+        _updated(7, "2030-06-02T00:00:00+00:00"),  # nouveau
+    ]
+    merged, changes = merge_delta(current, events, later)
+
+    assert changes == {"upserted": ["1", "7"], "removed": ["2", "3", "9"]}
+    assert sorted(merged["uid"]) == ["0", "1", "7"]
+    assert merged.loc[merged["uid"] == "1", "title_fr"].item() == "Conférence 1 (nouvelle salle)"
+    assert merged["uid"].is_unique
+
+    # le résultat s'exporte et se relit avec le même schéma
+    reloaded = read_index_ready(clean_events.export_index(merged))
+    assert list(reloaded.columns) == list(current.columns)
+    assert sorted(reloaded["uid"]) == ["0", "1", "7"]
+
+
+def test_merge_without_changes_keeps_index(tmp_path, monkeypatch):
+    current = _index_ready(tmp_path, monkeypatch)
+    merged, changes = merge_delta(current, [], NOW)
+    assert changes == {"upserted": [], "removed": []}
+    assert sorted(merged["uid"]) == sorted(current["uid"])
@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from src.indexing.embedding_cache import CachedEmbeddings
+
+from tests.conftest import HashingEmbeddings
+
+
+def test_repeated_query_skips_the_model():
+    base = HashingEmbeddings()
+    emb = CachedEmbeddings(base, max_entries=8)
+
+    first = emb.embed_query("concerts à Orsay ce week-end")
+    again = emb.embed_query("concerts à Orsay ce week-end")
+
+    assert first == again
+    assert base.query_calls == 1
+    assert emb.stats()["hits"] == 1
+
+
+def test_embed_documents_only_encodes_missing_texts_in_one_call():
+    base = HashingEmbeddings()
+    emb = CachedEmbeddings(base, max_entries=8)
+
+    emb.embed_documents(["a", "b"])
+    out = emb.embed_documents(["b", "c", "a", "d"])
+
+    assert base.documents_calls == 2
+    assert out == [base._vec(t) for t in ["b", "c", "a", "d"]]
+
+
+def test_lru_is_bounded():
+    base = HashingEmbeddings()
+    emb = CachedEmbeddings(base, max_entries=2)
+    for q in ["q1", "q2", "q1", "q3"]:  # q2 est le moins récemment utilisé
+        emb.embed_query(q)
+
+    assert emb.stats()["entries"] == 2
+    emb.embed_query("q1")
+    emb.embed_query("q2")
+    assert base.query_calls == 4  # q1, q2, q3, puis q2 évincé
+
+
+def test_cache_is_persisted_between_restarts(tmp_path):
+    path = tmp_path / "query_embeddings.npz"
+    emb = CachedEmbeddings(HashingEmbeddings(), max_entries=8, persist_path=path)
+    vector = emb.embed_query("exposition campus")
+    emb.save()
+
+    base = HashingEmbeddings()
+    restarted = CachedEmbeddings(base, max_entries=8, persist_path=path)
+    assert restarted.embed_query("exposition campus") == vector
+    assert base.query_calls == 0
+
+
+def test_concurrent_saves_leave_a_readable_file(tmp_path):
+    path = tmp_path / "query_embeddings.npz"
+    emb = CachedEmbeddings(HashingEmbeddings(), max_entries=64, persist_path=path)
+    for i in range(32):
+        emb.embed_query(f"question {i}")
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda _: emb.save(), range(32)))
+
+    restarted = CachedEmbeddings(HashingEmbeddings(), max_entries=64, persist_path=path)
+    assert restarted.stats()["entries"] == 32
+    assert list(tmp_path.iterdir()) == [path]
+
+
+def test_query_embeddings_model_is_built_once_under_concurrency(monkeypatch):
+    import src.indexing.faiss_store as faiss_store
+
+    built = []
+
+    def slow_embeddings(model_name=None):
+        built.append(model_name)
+        time.sleep(0.2)
+        return HashingEmbeddings()
+
+    monkeypatch.setattr(faiss_store, "_QUERY_EMBEDDINGS", {})
+    monkeypatch.setattr(faiss_store, "get_embeddings", slow_embeddings)
+    monkeypatch.delenv("RAG_EMBED_CACHE_PATH", raising=False)
+
+    barrier = threading.Barrier(8)
+
+    def first_call(_):
+        barrier.wait()
+        return faiss_store.get_query_embeddings()
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        instances = list(pool.map(first_call, range(8)))
+
+    assert len(built) == 1
+    assert all(e is instances[0] for e in instances)
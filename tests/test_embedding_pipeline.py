@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+from langchain_core.documents import Document
+
+from src.indexing.build_faiss_index import STATS_PREFIX, build_index, print_stats
+from src.indexing.embedding_pipeline import embed_into_vectorstore
+from src.indexing.faiss_store import resolve_index_dir
+from src.indexing.manifest import load_manifest
+from src.indexing.prepare_documents import iter_documents
+from src.rag.index import _parse_index_stats
+
+from tests.conftest import HashingEmbeddings, make_events_df
+
+
+def _docs(n: int):
+    return [Document(page_content=f"conférence numéro {i}", metadata={"uid": f"evt-{i}"}) for i in range(n)]
+
+
+def test_embeds_in_batches_and_reports_throughput():
+    emb = HashingEmbeddings()
+    vs, stats = embed_into_vectorstore(_docs(10), emb, ids=[f"id-{i}" for i in range(10)], batch_size=4)
+
+    assert emb.documents_calls == 3  # 4 + 4 + 2
+    assert vs.index.ntotal == 10
+    assert vs.index_to_docstore_id[9] == "id-9"
+    assert (stats["chunks"], stats["batches"], stats["batch_size"]) == (10, 3, 4)
+    assert stats["chunks_per_s"] > 0
+    assert stats["peak_rss_mb"] is None or stats["peak_rss_mb"] > 0
+
+
+def test_streaming_batches_match_one_shot_index():
+    docs = _docs(7)
+    batched, _ = embed_into_vectorstore(docs, HashingEmbeddings(), batch_size=2)
+    one_shot, _ = embed_into_vectorstore(docs, HashingEmbeddings(), batch_size=100)
+
+    for q in ["conférence numéro 3", "numéro 6"]:
+        a = [d.metadata["uid"] for d in batched.similarity_search(q, k=3)]
+        b = [d.metadata["uid"] for d in one_shot.similarity_search(q, k=3)]
+        assert a == b
+
+
+def test_build_stats_reach_rebuild_details(tmp_path, capsys):
+    stats = build_index(make_events_df(5), HashingEmbeddings(), tmp_path / "faiss_events", batch_size=2)
+    assert stats["embedding"]["batches"] == 3
+
+    print_stats(stats)
+    out = capsys.readouterr().out
+    assert out.splitlines()[-1].startswith(STATS_PREFIX)
+    assert _parse_index_stats(out)["embedding"]["chunks"] == 5
+
+
+def test_build_from_row_batches_matches_single_frame(tmp_path):
+    df = make_events_df(7)
+    whole = build_index(df, HashingEmbeddings(), tmp_path / "whole", batch_size=3)
+    emb = HashingEmbeddings()
+    frames = (df.iloc[i: i + 2] for i in range(0, len(df), 2))  # lots de 2 lignes, consommés une fois
+    streamed = build_index(frames, emb, tmp_path / "streamed", batch_size=3)
+
+    assert (streamed["rows"], streamed["chunks"]) == (whole["rows"], whole["chunks"]) == (7, 7)
+    assert emb.documents_calls == 3  # lots fixes de 3 chunks, indépendants des lots de lignes
+    assert load_manifest(resolve_index_dir(tmp_path / "streamed")) == load_manifest(resolve_index_dir(tmp_path / "whole"))
+
+
+def test_iter_documents_is_lazy():
+    docs = iter_documents(make_events_df(1000))
+    first = next(docs)
+    assert first.metadata["uid"] == "evt-0"
+    assert first.metadata["agenda_url"].startswith("https://openagenda.com/fr/")
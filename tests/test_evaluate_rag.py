@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import pytest
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from src.eval.evaluate_rag import extract_pred_uids, parse_sweep, predict, run_sweep, score_predictions
+from src.eval.llm_cache import DiskCachedLLM
+
+from tests.conftest import FakeResponse
+
+
+class CountingLLM:
+    def __init__(self, model: str = "mistral-small-latest", temperature: float = 0.2):
+        self.model = model
+        self.temperature = temperature
+        self.calls = 0
+
+    def invoke(self, messages):
+        self.calls += 1
+        return FakeResponse(content=f"Réponse {self.calls}.")
+
+
+GOLD = [
+    {"id": 1, "question": "conférence numéro 2", "expected_uids": ["evt-2"]},
+    {"id": 2, "question": "conférence numéro 8", "expected_uids": ["evt-8"]},
+    {"id": 3, "question": "match de rugby sous-marin", "expected_uids": []},
+]
+
+
+def test_disk_cache_reuses_answers_for_same_prompt_model_and_temperature(tmp_path):
+    messages = [SystemMessage(content="système"), HumanMessage(content="question")]
+    base = CountingLLM()
+    first = DiskCachedLLM(base, tmp_path).invoke(messages)
+
+    # nouveau process simulé: même dossier de cache
+    cached = DiskCachedLLM(base, tmp_path)
+    assert cached.invoke(messages).content == first.content
+    assert base.calls == 1 and cached.stats()["hits"] == 1
+
+    DiskCachedLLM(CountingLLM(temperature=0.7), tmp_path).invoke(messages)
+    DiskCachedLLM(base, tmp_path).invoke(messages + [HumanMessage(content="suite")])
+    assert base.calls == 2
+
+
+def test_retrieval_only_predicts_same_uids_without_llm(shared_components, tmp_path, monkeypatch):
+    import src.rag.chain as chain
+
+    llm = CountingLLM()
+    vs, meta, prompt, _, version = shared_components
+    monkeypatch.setattr(chain, "_SHARED_CACHE", (vs, meta, prompt, llm, version))
+
+    full, stats = predict(GOLD, workers=4, llm_cache_dir=tmp_path)
+    assert llm.calls > 0 and stats["misses"] == llm.calls
+
+    calls = llm.calls
+    fast, _ = predict(GOLD, retrieval_only=True)
+    assert llm.calls == calls
+    assert [extract_pred_uids(r) for r in fast] == [extract_pred_uids(r) for r in full]
+
+    # relance: toutes les réponses viennent du cache disque
+    _, stats = predict(GOLD, workers=4, llm_cache_dir=tmp_path)
+    assert llm.calls == calls and stats["hits"] == calls
+
+    results, summary = score_predictions(GOLD, fast)
+    assert summary["n"] == 3 and [r["id"] for r in results] == [1, 2, 3]
+
+
+def test_sweep_scores_each_parameter_combination(shared_components):
+    combos = parse_sweep(["k_final=1,5", "max_distance=0.5,1.3"])
+    assert combos[0] == {"k_final": 1, "max_distance": 0.5} and len(combos) == 4
+
+    rows = run_sweep(GOLD, combos)
+    assert [r["params"] for r in rows] == combos
+    assert all(r["summary"]["n"] == 3 for r in rows)
+
+    with pytest.raises(ValueError):
+        parse_sweep(["temperature=0.1"])
@@ -1,7 +1,8 @@
 from pathlib import Path
 
 from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_community.vectorstores import FAISS
+
+from src.indexing.faiss_store import open_vectorstore, resolve_index_dir
 
 
 INDEX_DIR = Path("data/index/faiss_events")
@@ -14,19 +15,19 @@ def test_faiss_index_dir_exists():
 
 def test_faiss_loads():
     embeddings = HuggingFaceEmbeddings(model_name=EMBED_MODEL)
-    vs = FAISS.load_local(str(INDEX_DIR), embeddings, allow_dangerous_deserialization=True)
+    vs = open_vectorstore(resolve_index_dir(INDEX_DIR), embeddings)
     assert vs is not None
 
 
 def test_faiss_has_vectors():
     embeddings = HuggingFaceEmbeddings(model_name=EMBED_MODEL)
-    vs = FAISS.load_local(str(INDEX_DIR), embeddings, allow_dangerous_deserialization=True)
+    vs = open_vectorstore(resolve_index_dir(INDEX_DIR), embeddings)
     assert vs.index.ntotal > 0
 
 
 def test_similarity_search_returns_k_docs():
     embeddings = HuggingFaceEmbeddings(model_name=EMBED_MODEL)
-    vs = FAISS.load_local(str(INDEX_DIR), embeddings, allow_dangerous_deserialization=True)
+    vs = open_vectorstore(resolve_index_dir(INDEX_DIR), embeddings)
 
     k = 5
     docs = vs.similarity_search("conférence", k=k)
@@ -38,7 +39,7 @@ def test_similarity_search_returns_k_docs():
 
 def test_metadata_contains_uid_and_date():
     embeddings = HuggingFaceEmbeddings(model_name=EMBED_MODEL)
-    vs = FAISS.load_local(str(INDEX_DIR), embeddings, allow_dangerous_deserialization=True)
+    vs = open_vectorstore(resolve_index_dir(INDEX_DIR), embeddings)
 
     docs = vs.similarity_search("conférence", k=3)
     for d in docs:
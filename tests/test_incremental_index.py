@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+from src.indexing.build_faiss_index import build_index
+from src.indexing.faiss_store import open_vectorstore, resolve_index_dir
+from src.indexing.incremental_index import update_index
+from src.indexing.manifest import load_manifest
+from src.indexing.metadata_index import load_metadata_index
+
+from tests.conftest import HashingEmbeddings, make_events_df
+
+
+def test_update_only_reembeds_changed_events(tmp_path):
+    index_dir = tmp_path / "faiss_events"
+    build_index(make_events_df(6), HashingEmbeddings(), index_dir)
+
+    df = make_events_df(7).drop(index=[0])  # evt-0 retiré, evt-6 ajouté
+    df.loc[df["uid"] == "evt-3", "document"] = "Titre: événement 3\nDescription: concert annulé puis reprogrammé"
+
+    emb = HashingEmbeddings()
+    stats = update_index(df, emb, index_dir)
+
+    assert (stats["added"], stats["changed"], stats["removed"]) == (1, 1, 1)
+    assert stats["embedded_chunks"] == 2
+    assert emb.documents_calls == 1
+
+    current_dir = resolve_index_dir(index_dir)
+    vs = open_vectorstore(current_dir, emb)
+    contents = {
+        vs.docstore.search(_id).metadata["uid"]: vs.docstore.search(_id).page_content
+        for _id in vs.index_to_docstore_id.values()
+    }
+    assert vs.index.ntotal == 6
+    assert sorted(contents) == sorted(df["uid"])
+    assert "reprogrammé" in contents["evt-3"]
+
+    assert set(load_manifest(current_dir)["events"]) == set(df["uid"])
+    assert load_metadata_index(current_dir).size == vs.index.ntotal
+
+    # la recherche retrouve bien le nouvel événement
+    top = vs.similarity_search("conférence numéro 6", k=1)[0]
+    assert top.metadata["uid"] == "evt-6"
+
+
+def test_update_is_noop_when_nothing_changed(tmp_path):
+    index_dir = tmp_path / "faiss_events"
+    build_index(make_events_df(4), HashingEmbeddings(), index_dir)
+
+    emb = HashingEmbeddings()
+    stats = update_index(make_events_df(4), emb, index_dir)
+
+    assert stats["embedded_chunks"] == 0
+    assert emb.documents_calls == 0
+
+
+def test_update_without_manifest_falls_back_to_full_build(tmp_path):
+    stats = update_index(make_events_df(3), HashingEmbeddings(), tmp_path / "faiss_events")
+    assert stats["mode"] == "full"
+    assert stats["chunks"] == 3
+
+
+def test_migrated_index_keeps_incremental_updates(tmp_path, monkeypatch):
+    import src.indexing.migrate_index as migrate_index
+
+    index_dir = tmp_path / "faiss_events"
+    build_index(make_events_df(4), HashingEmbeddings(), index_dir)
+    params = load_manifest(resolve_index_dir(index_dir))["params"]
+
+    monkeypatch.setattr(migrate_index, "DEFAULT_INDEX_DIR", index_dir)
+    monkeypatch.setattr("src.indexing.faiss_store.get_query_embeddings", lambda model_name=None: HashingEmbeddings())
+    migrate_index.main()
+
+    manifest = load_manifest(resolve_index_dir(index_dir))
+    assert manifest["params"] == params and set(manifest["events"]) == {f"evt-{i}" for i in range(4)}
+
+    emb = HashingEmbeddings()
+    stats = update_index(make_events_df(4), emb, index_dir)
+    assert stats["mode"] != "full" and stats["embedded_chunks"] == 0
@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+from src.indexing.benchmark_index_types import run_report
+from src.indexing.benchmark_scaling import format_table, run_scaling
+from src.indexing.build_faiss_index import build_index
+from src.indexing.faiss_store import open_vectorstore, resolve_index_dir
+from src.indexing.incremental_index import update_index
+from src.indexing.index_factory import INDEX_TYPES, IndexConfig, create_index, index_config_from_env
+from src.indexing.manifest import load_manifest
+from src.indexing.metadata_index import make_search_params
+
+from tests.conftest import HashingEmbeddings, make_events_df
+
+
+def _vectors(n: int, dim: int = 32) -> np.ndarray:
+    return np.random.default_rng(0).standard_normal((n, dim)).astype(np.float32)
+
+
+@pytest.mark.parametrize("kind", INDEX_TYPES)
+def test_each_index_type_finds_its_own_vectors(kind):
+    x = _vectors(600)
+    index = create_index(IndexConfig(kind, nprobe=64), x)
+    assert index.ntotal == 600
+
+    _, ids = index.search(x[:20], 1)
+    assert (ids[:, 0] == np.arange(20)).mean() >= 0.9
+
+    # pré-filtrage par bitmap accepté quel que soit le type (IVF: SearchParametersIVF)
+    mask = np.zeros(600, dtype=bool)
+    mask[::2] = True
+    params, _keepalive = make_search_params(mask, index)
+    _, ids = index.search(x[:5], 3, params=params)
+    assert all(i % 2 == 0 for i in ids.ravel() if i != -1)
+
+
+def test_unknown_index_type_is_rejected(monkeypatch):
+    monkeypatch.setenv("RAG_INDEX_TYPE", "annoy")
+    with pytest.raises(ValueError):
+        index_config_from_env()
+
+
+def test_index_type_is_recorded_in_manifest(tmp_path):
+    root = tmp_path / "faiss_events"
+    stats = build_index(make_events_df(300), HashingEmbeddings(), root, index_config=IndexConfig("sq8"))
+    assert stats["index"] == {"kind": "sq8"}
+
+    index_dir = resolve_index_dir(root)
+    assert load_manifest(index_dir)["params"]["index"] == {"kind": "sq8"}
+    vs = open_vectorstore(index_dir, HashingEmbeddings())
+    assert type(vs.index).__name__ == "IndexScalarQuantizer"
+    assert vs.similarity_search("conférence numéro 42", k=1)[0].metadata["uid"] == "evt-42"
+
+    # changer de type d'index impose une reconstruction complète
+    stats = update_index(make_events_df(300), HashingEmbeddings(), root, index_config=IndexConfig("flat"))
+    assert stats["mode"] == "full"
+
+
+def test_incremental_update_on_hnsw_rebuilds_graph_without_reembedding(tmp_path):
+    root = tmp_path / "faiss_events"
+    config = IndexConfig("hnsw", hnsw_m=8)
+    build_index(make_events_df(12), HashingEmbeddings(), root, index_config=config)
+
+    emb = HashingEmbeddings()
+    stats = update_index(make_events_df(13).drop(index=[0]), emb, root, index_config=config)
+    assert (stats["added"], stats["removed"], stats["embedded_chunks"]) == (1, 1, 1)
+
+    vs = open_vectorstore(resolve_index_dir(root), emb)
+    uids = {vs.docstore.search(vs.index_to_docstore_id[i]).metadata["uid"] for i in range(vs.index.ntotal)}
+    assert vs.index.ntotal == 12 and "evt-0" not in uids and "evt-12" in uids
+    assert vs.similarity_search("conférence numéro 5", k=1)[0].metadata["uid"] == "evt-5"
+
+
+def test_incremental_update_on_ivfpq_keeps_ids_contiguous(tmp_path):
+    root = tmp_path / "faiss_events"
+    config = IndexConfig("ivfpq", nprobe=64)
+    build_index(make_events_df(300), HashingEmbeddings(), root, index_config=config)
+
+    # IVF garde ses ids après remove_ids: la suppression passe par une reconstruction
+    emb = HashingEmbeddings()
+    stats = update_index(make_events_df(301).drop(index=[50, 51, 52]), emb, root, index_config=config)
+    assert (stats["added"], stats["removed"], stats["embedded_chunks"]) == (1, 3, 1)
+
+    vs = open_vectorstore(resolve_index_dir(root), emb)
+    assert vs.index.ntotal == 298
+    assert sorted(vs.index_to_docstore_id) == list(range(298))
+    uids = [vs.docstore.search(vs.index_to_docstore_id[row]).metadata["uid"] for row in range(298)]
+    assert len(set(uids)) == 298 and "evt-50" not in uids and "evt-300" in uids
+
+    # tout id renvoyé par FAISS existe dans le docstore, et le voisin d'un événement retiré reste à sa place
+    queries = np.asarray(emb.embed_documents([f"conférence numéro {i}" for i in range(301)]), dtype=np.float32)
+    _, found = vs.index.search(queries, 5)
+    assert set(found.ravel().tolist()) <= set(vs.index_to_docstore_id)
+    assert vs.similarity_search("conférence numéro 53", k=1)[0].metadata["uid"] == "evt-53"
+
+
+def test_report_compares_against_flat():
+    x = _vectors(800)
+    report = run_report(x, {"sampled": x[:50]}, [f"evt-{i}" for i in range(800)], configs=[IndexConfig("flat"), IndexConfig("ivfpq", nprobe=1)])
+
+    flat, ivfpq = report["results"]
+    assert flat["sampled"]["recall@5"] == 1.0
+    assert ivfpq["sampled"]["recall@5"] < 1.0
+    assert ivfpq["size_mb"] < flat["size_mb"]
+
+
+def test_scaling_report_covers_each_size_and_index_type():
+    report = run_scaling(sizes=(500, 1500), kinds=("flat", "sq8"), n_queries=32, batch_sizes=(1, 16), dim=32)
+
+    assert [(r["vectors"], r["index"]["kind"]) for r in report["results"]] == [
+        (500, "flat"), (500, "sq8"), (1500, "flat"), (1500, "sq8"),
+    ]
+    for r in report["results"]:
+        assert set(r["latency"]) == {"1", "16"}
+        assert r["latency"]["16"]["batches"] == 2
+    assert all(r["recall@5"] == 1.0 for r in report["results"] if r["index"]["kind"] == "flat")
+    assert format_table(report).count("\n") == 2 + len(report["results"])
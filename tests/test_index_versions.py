@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import threading
+
+from langchain_community.vectorstores import FAISS
+
+import src.rag.chain as chain
+from src.indexing.build_faiss_index import build_index
+from src.indexing.faiss_store import (
+    CURRENT_FILE,
+    VERSIONS_DIR,
+    current_version,
+    load_vectorstore,
+    open_vectorstore,
+    resolve_index_dir,
+)
+from src.indexing.incremental_index import update_index
+from src.indexing.prepare_documents import build_documents
+
+from tests.conftest import FakeLLM, HashingEmbeddings, make_events_df
+
+
+def test_build_publishes_new_version_without_touching_current(tmp_path):
+    root = tmp_path / "faiss_events"
+    first = build_index(make_events_df(24), HashingEmbeddings(), root)
+    first_dir = resolve_index_dir(root)
+    assert current_version(root) == first["version"]
+    assert (first_dir / "index.faiss").exists()
+
+    second = build_index(make_events_df(10), HashingEmbeddings(), root)
+    assert current_version(root) == second["version"] != first["version"]
+    # l'ancienne version reste intacte pour les lecteurs qui l'ont déjà ouverte
+    old = open_vectorstore(first_dir, HashingEmbeddings())
+    assert old.index.ntotal == first["chunks"]
+    assert not (root / CURRENT_FILE).with_suffix(".tmp").exists()
+
+
+def test_old_versions_are_pruned(tmp_path):
+    root = tmp_path / "faiss_events"
+    for n in range(5):
+        build_index(make_events_df(5 + n), HashingEmbeddings(), root)
+    versions = sorted(p.name for p in (root / VERSIONS_DIR).iterdir())
+    assert len(versions) == 3
+    assert versions[-1] == current_version(root)
+
+
+def test_legacy_layout_is_still_loaded_then_replaced(tmp_path):
+    root = tmp_path / "faiss_events"
+    # ancien format: fichiers de l'index directement dans root, pas de CURRENT
+    FAISS.from_documents(build_documents(make_events_df(24)), HashingEmbeddings()).save_local(str(root))
+    assert resolve_index_dir(root) == root
+
+    stats = update_index(make_events_df(24), HashingEmbeddings(), root)
+    assert stats["mode"] == "full"
+    assert resolve_index_dir(root) != root
+    assert not (root / "index.faiss").exists()
+
+
+def test_reload_swaps_components_while_queries_run(tmp_path, monkeypatch):
+    root = tmp_path / "faiss_events"
+    build_index(make_events_df(8), HashingEmbeddings(), root)
+
+    monkeypatch.setattr(chain, "DEFAULT_INDEX_DIR", root)
+    monkeypatch.setattr(chain, "load_vectorstore", lambda index_dir: load_vectorstore(index_dir, model_name="hash"))
+    monkeypatch.setattr(chain, "get_llm", lambda: FakeLLM())
+    monkeypatch.setattr("src.indexing.faiss_store.get_query_embeddings", lambda model_name: HashingEmbeddings())
+    monkeypatch.setattr(chain, "_SHARED_CACHE", None)
+
+    vs_before, _, prompt, llm, version_before = chain.get_shared_components()
+    assert vs_before.index.ntotal == 8
+
+    build_index(make_events_df(24), HashingEmbeddings(), root)
+
+    errors = []
+    stop = threading.Event()
+
+    def ask():
+        while not stop.is_set():
+            try:
+                chain.answer_question("conférence", allowed_cities={"Orsay"})
+            except Exception as e:  # pragma: no cover - le test échoue via errors
+                errors.append(e)
+
+    workers = [threading.Thread(target=ask) for _ in range(4)]
+    for w in workers:
+        w.start()
+    version = chain.reload_shared_components()
+    stop.set()
+    for w in workers:
+        w.join()
+
+    vs_after, _, prompt_after, llm_after, version_after = chain.get_shared_components()
+    assert not errors
+    assert version == version_after != version_before
+    assert vs_after.index.ntotal == 24
+    assert prompt_after is prompt and llm_after is llm
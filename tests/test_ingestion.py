@@ -0,0 +1,202 @@
+from __future__ import annotations
+
+import json
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from src.ingestion.client import OpenAgendaClient, RateLimiter
+from src.ingestion.fetch_openagenda_all import (
+    cursor_path_for,
+    fetch_agendas,
+    parse_agenda_uids,
+    stream_events_to_jsonl,
+)
+from src.preprocessing.clean_events import load_clean_events
+
+from tests.conftest import make_raw_event
+
+
+class FakeAgenda:
+    """Pagination par curseur sur une liste d'événements; peut échouer à une page donnée."""
+
+    def __init__(self, n: int, page_size: int, fail_at_page: int | None = None):
+        now = datetime.now(timezone.utc)
+        self.events = [make_raw_event(i, now + timedelta(days=i)) for i in range(n)]
+        self.page_size = page_size
+        self.fail_at_page = fail_at_page
+        self.calls = []
+
+    def __call__(self, after):
+        start = after or 0
+        self.calls.append(after)
+        if self.fail_at_page is not None and start // self.page_size + 1 == self.fail_at_page:
+            raise RuntimeError("OpenAgenda API error 503")
+        page = self.events[start:start + self.page_size]
+        nxt = start + self.page_size if start + self.page_size < len(self.events) else None
+        return {"events": page, "after": nxt}
+
+
+def _uids(path):
+    return [json.loads(line)["uid"] for line in path.read_text(encoding="utf-8").splitlines()]
+
+
+def test_stream_writes_one_event_per_line(tmp_path):
+    out = tmp_path / "events.jsonl"
+    stats = stream_events_to_jsonl(FakeAgenda(25, page_size=10), out)
+
+    assert stats == {"path": str(out), "pages": 3, "events": 25}
+    assert _uids(out) == list(range(25))
+    assert not cursor_path_for(out).exists()
+
+
+def test_stream_resumes_from_saved_cursor_after_crash(tmp_path):
+    out = tmp_path / "events.jsonl"
+    with pytest.raises(RuntimeError):
+        stream_events_to_jsonl(FakeAgenda(25, page_size=10, fail_at_page=3), out)
+    assert _uids(out) == list(range(20))
+
+    # une page à moitié écrite avant le crash est tronquée à la reprise
+    with out.open("a", encoding="utf-8") as f:
+        f.write('{"uid": 20, "tit')
+
+    agenda = FakeAgenda(25, page_size=10)
+    stats = stream_events_to_jsonl(agenda, out)
+
+    assert agenda.calls == [20]  # reprise directe à la page 3
+    assert stats["events"] == 25
+    assert _uids(out) == list(range(25))
+
+
+def test_stream_does_not_refetch_when_crash_followed_last_page(tmp_path):
+    out = tmp_path / "events.jsonl"
+    stream_events_to_jsonl(FakeAgenda(25, page_size=10), out)
+    # crash entre l'écriture du curseur de la dernière page et sa suppression
+    cursor = {"after": None, "offset": out.stat().st_size, "pages": 3, "events": 25}
+    cursor_path_for(out).write_text(json.dumps(cursor), encoding="utf-8")
+
+    agenda = FakeAgenda(25, page_size=10)
+    stats = stream_events_to_jsonl(agenda, out)
+
+    assert agenda.calls == []
+    assert stats == {"path": str(out), "pages": 3, "events": 25}
+    assert _uids(out) == list(range(25))
+    assert not cursor_path_for(out).exists()
+
+
+def test_clean_consumes_jsonl_in_chunks(tmp_path):
+    now = datetime.now(timezone.utc)
+    raw = tmp_path / "events.jsonl"
+    events = [make_raw_event(i, now + timedelta(days=(i % 4 - 2) * 200)) for i in range(10)]
+    events[3]["title"] = {"fr": "abc"}  # titre trop court
+    raw.write_text("\n".join(json.dumps(e) for e in events) + "\n", encoding="utf-8")
+
+    df, n_raw = load_clean_events(raw, now, chunk_size=3)
+
+    assert n_raw == 10
+    # -400 j exclu (plus d'un an), titre trop court exclu
+    expected = [i for i in range(10) if i % 4 != 0 and i != 3]
+    assert sorted(df["uid"]) == expected
+
+
+class StubOpenAgenda(BaseHTTPRequestHandler):
+    """Serveur OpenAgenda minimal: pagination par curseur, une 503 puis une 429 avant de répondre."""
+
+    agendas = {}
+    failures = {}
+    requests = []
+    page_size = 4
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        agenda = url.path.split("/")[2]
+        after = int(parse_qs(url.query).get("after", ["0"])[0])
+        type(self).requests.append((agenda, after, self.headers.get("key")))
+
+        pending = type(self).failures.get((agenda, after), [])
+        if pending:
+            status = pending.pop(0)
+            self.send_response(status)
+            self.send_header("Retry-After", "0")
+            self.end_headers()
+            return
+
+        events = type(self).agendas[agenda]
+        nxt = after + self.page_size
+        body = json.dumps({"events": events[after:nxt], "after": nxt if nxt < len(events) else None}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub_server():
+    now = datetime.now(timezone.utc)
+    StubOpenAgenda.agendas = {
+        "agenda-a": [make_raw_event(i, now) for i in range(10)],
+        "agenda-b": [make_raw_event(100 + i, now) for i in range(6)],
+    }
+    StubOpenAgenda.failures = {("agenda-a", 4): [503, 429]}
+    StubOpenAgenda.requests = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubOpenAgenda)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_fetch_agendas_concurrently_with_retries(stub_server, tmp_path):
+    client = OpenAgendaClient("secret", base_url=stub_server, rate_per_s=0, backoff_factor=0)
+    out = tmp_path / "events.jsonl"
+
+    stats = fetch_agendas(client, parse_agenda_uids("agenda-a, agenda-b,agenda-a"), out, size=4)
+
+    assert stats["agendas"] == {"agenda-a": 10, "agenda-b": 6}
+    lines = [json.loads(line) for line in out.read_text(encoding="utf-8").splitlines()]
+    assert [e["uid"] for e in lines] == list(range(10)) + list(range(100, 106))
+    assert {e["agendaUid"] for e in lines[10:]} == {"agenda-b"}
+    # la page en erreur a été rejouée deux fois par la session (503 puis 429)
+    assert [r[1] for r in StubOpenAgenda.requests if r[0] == "agenda-a"].count(4) == 3
+    assert all(key == "secret" for _, _, key in StubOpenAgenda.requests)
+
+
+def test_retries_go_through_the_rate_limiter(stub_server, tmp_path):
+    client = OpenAgendaClient("secret", base_url=stub_server, rate_per_s=0, backoff_factor=0)
+    waits = []
+    client.limiter.wait = lambda: waits.append(time.monotonic())
+
+    stats = fetch_agendas(client, ["agenda-a"], tmp_path / "events.jsonl", size=4)
+
+    assert stats["agendas"] == {"agenda-a": 10}
+    # 3 pages + 2 tentatives rejouées (503 puis 429): une attente du limiteur par requête envoyée
+    assert len(StubOpenAgenda.requests) == 5
+    assert len(waits) == 5
+
+
+def test_fetch_fails_after_exhausting_retries(stub_server, tmp_path):
+    StubOpenAgenda.failures = {("agenda-b", 0): [500] * 10}
+    client = OpenAgendaClient("secret", base_url=stub_server, rate_per_s=0, max_retries=2, backoff_factor=0)
+
+    with pytest.raises(RuntimeError, match="agenda-b"):
+        fetch_agendas(client, ["agenda-a", "agenda-b"], tmp_path / "events.jsonl", size=4)
+    # l'agenda réussi reste disponible, sans curseur à reprendre
+    assert (tmp_path / "agendas" / "agenda-a.jsonl").exists()
+    assert not (tmp_path / "events.jsonl").exists()
+
+
+def test_rate_limiter_spaces_requests():
+    limiter = RateLimiter(rate_per_s=50)
+    start = time.monotonic()
+    for _ in range(6):
+        limiter.wait()
+    assert time.monotonic() - start >= 5 / 50 * 0.9
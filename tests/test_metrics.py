@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+import asyncio
+
+from src.rag.metrics import (
+    Counter,
+    Histogram,
+    Registry,
+    observe_stage,
+    run_with_context,
+    server_timing_header,
+    span,
+    start_request_timings,
+)
+
+
+def test_histogram_renders_cumulative_buckets():
+    hist = Histogram("t_seconds", "aide", labels=("stage",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 2.0):
+        hist.observe(value, stage="llm")
+
+    lines = hist.render()
+    assert '# TYPE t_seconds histogram' in lines
+    assert 't_seconds_bucket{stage="llm",le="0.1"} 1' in lines
+    assert 't_seconds_bucket{stage="llm",le="1"} 2' in lines
+    assert 't_seconds_bucket{stage="llm",le="+Inf"} 3' in lines
+    assert 't_seconds_sum{stage="llm"} 2.55' in lines
+    assert 't_seconds_count{stage="llm"} 3' in lines
+
+
+def test_registry_renders_counters_and_skips_failing_gauges():
+    registry = Registry()
+    counter = registry.register(Counter("t_total", "aide", labels=("kind",)))
+    counter.inc(3, kind="fetched")
+    counter.inc(kind="kept")
+    registry.gauge("t_ok", "aide", lambda: 2)
+    registry.gauge("t_broken", "aide", lambda: 1 / 0)
+
+    text = registry.render()
+    assert 't_total{kind="fetched"} 3' in text
+    assert 't_total{kind="kept"} 1' in text
+    assert "t_ok 2" in text
+    assert "t_broken" not in text
+
+
+def test_request_timings_follow_executor_threads():
+    def work():
+        with span("search"):
+            pass
+        observe_stage("filter", 0.002)
+
+    async def run():
+        timings = start_request_timings()
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, run_with_context(work))
+        observe_stage("filter", 0.001)
+        return timings
+
+    timings = asyncio.run(run())
+    assert set(timings) == {"search", "filter"}
+    assert abs(timings["filter"] - 0.003) < 1e-9
+    assert server_timing_header({"llm": 0.25}) == "llm;dur=250.0"
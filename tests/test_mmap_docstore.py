@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+from langchain_community.vectorstores import FAISS
+
+from src.indexing.build_faiss_index import build_index
+from src.indexing.faiss_store import open_vectorstore, resolve_index_dir
+from src.indexing.index_factory import IndexConfig
+from src.indexing.mmap_docstore import MmapDocstore
+from src.indexing.prepare_documents import build_documents
+
+from tests.conftest import HashingEmbeddings, make_events_df
+
+
+def test_build_writes_mmap_docstore_without_pickle(tmp_path):
+    root = tmp_path / "faiss_events"
+    build_index(make_events_df(12), HashingEmbeddings(), root)
+    index_dir = resolve_index_dir(root)
+    assert not (index_dir / "index.pkl").exists()
+
+    vs = open_vectorstore(index_dir, HashingEmbeddings())
+    assert isinstance(vs.docstore, MmapDocstore)
+    assert len(vs.docstore) == vs.index.ntotal == 12
+
+    top = vs.similarity_search("conférence numéro 7", k=1)[0]
+    assert top.metadata["uid"] == "evt-7"
+    assert isinstance(top.metadata["first_begin_ts"], int)
+    assert vs.docstore.search("missing#0") == "ID missing#0 not found."
+
+
+def test_mmap_docstore_matches_in_memory_docstore(tmp_path):
+    docs = build_documents(make_events_df(9))
+    reference = FAISS.from_documents(docs, HashingEmbeddings())
+    root = tmp_path / "faiss_events"
+    build_index(make_events_df(9), HashingEmbeddings(), root)
+    vs = open_vectorstore(resolve_index_dir(root), HashingEmbeddings())
+
+    for q in ["conférence numéro 2", "Palaiseau"]:
+        a = [(d.page_content, d.metadata) for d in vs.similarity_search(q, k=3)]
+        b = [(d.page_content, d.metadata) for d in reference.similarity_search(q, k=3)]
+        assert a == b
+
+
+def test_writable_copy_supports_updates(tmp_path):
+    root = tmp_path / "faiss_events"
+    build_index(make_events_df(4), HashingEmbeddings(), root)
+    vs = open_vectorstore(resolve_index_dir(root), HashingEmbeddings(), writable=True)
+
+    vs.delete(["evt-0#0"])
+    vs.add_texts(["nouvel événement"], metadatas=[{"uid": "evt-9"}], ids=["evt-9#0"])
+    assert vs.index.ntotal == 4
+    assert vs.docstore.search("evt-9#0").metadata["uid"] == "evt-9"
+
+
+def test_legacy_pickle_index_is_still_opened(tmp_path):
+    FAISS.from_documents(build_documents(make_events_df(3)), HashingEmbeddings()).save_local(str(tmp_path))
+    vs = open_vectorstore(tmp_path, HashingEmbeddings())
+    assert not isinstance(vs.docstore, MmapDocstore)
+    assert vs.index.ntotal == 3
+
+
+def test_load_vectorstore_maps_index_and_records_load_stats(tmp_path, monkeypatch):
+    import src.indexing.faiss_store as faiss_store
+
+    root = tmp_path / "faiss_events"
+    build_index(make_events_df(300), HashingEmbeddings(), root, index_config=IndexConfig("sq8"))
+    monkeypatch.setattr(faiss_store, "get_query_embeddings", lambda model_name: HashingEmbeddings())
+
+    vs = faiss_store.load_vectorstore(root, mmap=True)
+    assert vs.similarity_search("conférence numéro 42", k=1)[0].metadata["uid"] == "evt-42"
+
+    stats = faiss_store.load_stats()
+    assert stats["mmap"] is True
+    assert (stats["index_type"], stats["vectors"]) == ("IndexScalarQuantizer", 300)
+    assert stats["load_s"] >= 0
+
+    monkeypatch.setenv("RAG_INDEX_MMAP", "0")
+    faiss_store.load_vectorstore(root)
+    assert faiss_store.load_stats()["mmap"] is False
+
+
+def test_writable_open_never_maps_the_index(tmp_path):
+    root = tmp_path / "faiss_events"
+    build_index(make_events_df(4), HashingEmbeddings(), root)
+    vs = open_vectorstore(resolve_index_dir(root), HashingEmbeddings(), writable=True, mmap=True)
+    vs.add_texts(["nouvel événement"], metadatas=[{"uid": "evt-9"}], ids=["evt-9#0"])
+    assert vs.index.ntotal == 5
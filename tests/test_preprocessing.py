@@ -1,11 +1,9 @@
-from pathlib import Path
 from datetime import datetime, timedelta, timezone
 
 import pandas as pd
 
-
-PROCESSED_DIR = Path("data/processed")
-INDEX_READY = PROCESSED_DIR / "events_index_ready.jsonl"
+from src.indexing.prepare_documents import load_index_ready
+from src.preprocessing.storage import INDEX_READY_PATH as INDEX_READY
 
 
 def test_index_ready_file_exists():
@@ -13,12 +11,12 @@ def test_index_ready_file_exists():
 
 
 def test_index_ready_loads_and_not_empty():
-    df = pd.read_json(INDEX_READY, lines=True)
+    df = load_index_ready(INDEX_READY, columns=None)
     assert len(df) > 0, "events_index_ready is empty"
 
 
 def test_required_columns_present():
-    df = pd.read_json(INDEX_READY, lines=True)
+    df = load_index_ready(INDEX_READY, columns=None)
     required = {
         "uid",
         "title_fr",
@@ -30,12 +28,12 @@ def test_required_columns_present():
 
 
 def test_no_missing_dates():
-    df = pd.read_json(INDEX_READY, lines=True)
+    df = load_index_ready(INDEX_READY, columns=None)
     assert df["first_begin_dt"].notna().all(), "Some events have missing first_begin_dt"
 
 
 def test_document_not_empty_for_most_rows():
-    df = pd.read_json(INDEX_READY, lines=True)
+    df = load_index_ready(INDEX_READY, columns=None)
     # On accepte qu'une petite minorité soit pauvre, mais pas la majorité
     non_empty_ratio = (df["document"].fillna("").str.strip().str.len() > 0).mean()
     assert non_empty_ratio >= 0.98, f"Too many empty documents: ratio={non_empty_ratio:.3f}"
@@ -47,7 +45,7 @@ def test_time_window_is_within_one_year_or_upcoming():
     - events du dernier an (>= now-365j et < now)
     - events à venir (>= now)
     """
-    df = pd.read_json(INDEX_READY, lines=True)
+    df = load_index_ready(INDEX_READY, columns=None)
 
     # Pandas charge souvent les dates en tz-aware déjà; sinon on force utc
     dts = pd.to_datetime(df["first_begin_dt"], utc=True, errors="coerce")
@@ -27,3 +27,21 @@ def test_no_result_returns_empty_sources():
     res = answer_question("concert de métal à gif-sur-yvette ce soir", llm_override=FakeLLM())
     # soit 0 sources, soit tu as encore du bruit -> à toi de fixer la règle attendue
     assert isinstance(res.sources, list)
+
+
+def test_answer_questions_batches_embedding_and_keeps_order(shared_components):
+    from src.rag.chain import answer_questions
+
+    vs = shared_components[0]
+    questions = ["conférence numéro 1", "conférence numéro 13", "conférence numéro 5"]
+    calls_before = vs.embedding_function.documents_calls
+
+    batch = answer_questions(questions, allowed_cities={"Orsay", "Gif-sur-Yvette"})
+
+    # un seul embed_documents pour tout le batch
+    assert vs.embedding_function.documents_calls == calls_before + 1
+    assert len(batch) == len(questions)
+    for q, res in zip(questions, batch):
+        single = answer_question(q, allowed_cities={"Orsay", "Gif-sur-Yvette"})
+        assert res.answer == single.answer
+        assert [s["metadata"]["uid"] for s in res.sources] == [s["metadata"]["uid"] for s in single.sources]
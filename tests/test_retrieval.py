@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+import math
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from src.indexing.metadata_index import (
+    MISSING_TS,
+    begin_ts_of,
+    build_metadata_index,
+    ensure_epoch_metadata,
+    load_or_build_metadata_index,
+    save_metadata_index,
+)
+from src.indexing.prepare_documents import build_documents
+from src.rag.retrieval_scored import RETRIEVAL_STATS, ScoredFilteredRetriever
+
+
+ALLOWED = {"Orsay", "Gif-sur-Yvette"}
+
+
+def _is_eligible(md, now) -> bool:
+    city = (md.get("location_city") or "").strip()
+    if city and city not in ALLOWED:
+        return False
+    dt = pd.to_datetime(md.get("first_begin_dt"), utc=True)
+    return pd.notna(dt) and dt >= now
+
+
+def test_metadata_index_aligned_with_faiss_rows(tiny_vectorstore):
+    meta = build_metadata_index(tiny_vectorstore)
+    assert meta.size == tiny_vectorstore.index.ntotal
+
+    for i in range(meta.size):
+        doc = tiny_vectorstore.docstore.search(tiny_vectorstore.index_to_docstore_id[i])
+        city = doc.metadata.get("location_city") or ""
+        assert meta.cities[meta.city_codes[i]] == city
+        if doc.metadata.get("first_begin_dt") is None:
+            assert meta.begin_ts[i] == MISSING_TS
+
+
+def test_mask_matches_post_filter_rules(tiny_vectorstore):
+    now = datetime.now(timezone.utc)
+    meta = build_metadata_index(tiny_vectorstore)
+    mask = meta.mask(ALLOWED, min_begin_ts=math.ceil(now.timestamp()))
+
+    for i in range(meta.size):
+        doc = tiny_vectorstore.docstore.search(tiny_vectorstore.index_to_docstore_id[i])
+        assert mask[i] == _is_eligible(doc.metadata, now)
+
+
+def test_prefiltered_retrieve_returns_exact_top_k_of_eligible_rows(tiny_vectorstore):
+    now = datetime.now(timezone.utc)
+    retriever = ScoredFilteredRetriever(
+        vectorstore=tiny_vectorstore,
+        allowed_cities=ALLOWED,
+        k_final=3,
+        max_distance=1e9,
+        metadata_index=build_metadata_index(tiny_vectorstore),
+    )
+    question = "conférence à Orsay"
+    kept = retriever.retrieve(question)
+
+    # référence: recherche exhaustive puis filtrage
+    everything = tiny_vectorstore.similarity_search_with_score(question, k=tiny_vectorstore.index.ntotal)
+    expected = [d.metadata["uid"] for d, _ in everything if _is_eligible(d.metadata, now)][:3]
+
+    assert [d.metadata["uid"] for d, _ in kept] == expected
+    assert all(_is_eligible(d.metadata, now) for d, _ in kept)
+
+
+def test_prefiltered_retrieve_empty_when_nothing_eligible(tiny_vectorstore):
+    retriever = ScoredFilteredRetriever(
+        vectorstore=tiny_vectorstore,
+        allowed_cities={"Sceaux"},
+        max_distance=1e9,
+        metadata_index=build_metadata_index(tiny_vectorstore),
+    )
+    # seules les villes non renseignées restent éligibles
+    for doc, _ in retriever.retrieve("conférence"):
+        assert not doc.metadata.get("location_city")
+
+
+def test_metadata_index_roundtrip_and_rebuild_on_mismatch(tiny_vectorstore, tmp_path):
+    meta = build_metadata_index(tiny_vectorstore)
+    save_metadata_index(meta, tmp_path)
+
+    loaded = load_or_build_metadata_index(tiny_vectorstore, tmp_path)
+    assert loaded.cities == meta.cities
+    assert np.array_equal(loaded.city_codes, meta.city_codes)
+    assert np.array_equal(loaded.begin_ts, meta.begin_ts)
+
+    # index sans fichier (ancien format): reconstruit depuis le docstore
+    rebuilt = load_or_build_metadata_index(tiny_vectorstore, tmp_path / "missing")
+    assert np.array_equal(rebuilt.begin_ts, meta.begin_ts)
+
+
+def test_begin_ts_prefers_precomputed_epoch_and_parses_legacy():
+    metadatas = [
+        {"first_begin_ts": 1700000000, "first_begin_dt": "garbage"},
+        {"first_begin_dt": "2023-11-14T22:13:20.000Z"},  # ancien index: pas de first_begin_ts
+        {"first_begin_ts": None},
+        {},
+    ]
+    assert begin_ts_of(metadatas).tolist() == [1700000000, 1700000000, MISSING_TS, MISSING_TS]
+
+
+def test_ensure_epoch_metadata_migrates_legacy_docs(tiny_vectorstore):
+    meta_before = build_metadata_index(tiny_vectorstore)
+
+    assert ensure_epoch_metadata(tiny_vectorstore) == tiny_vectorstore.index.ntotal
+    assert ensure_epoch_metadata(tiny_vectorstore) == 0
+
+    for _id in tiny_vectorstore.index_to_docstore_id.values():
+        assert "first_begin_ts" in tiny_vectorstore.docstore.search(_id).metadata
+    assert np.array_equal(build_metadata_index(tiny_vectorstore).begin_ts, meta_before.begin_ts)
+
+
+def test_build_documents_emits_epoch_metadata():
+    df = pd.DataFrame(
+        [
+            {"uid": "a", "document": "Titre: A", "first_begin_dt": "2023-11-14T22:13:20.000Z"},
+            {"uid": "b", "document": "Titre: B", "first_begin_dt": None},
+        ]
+    )
+    docs = build_documents(df)
+    assert [d.metadata["first_begin_ts"] for d in docs] == [1700000000, None]
+
+
+def test_post_filter_widens_k_fetch_only_when_needed(tiny_vectorstore):
+    meta = build_metadata_index(tiny_vectorstore)
+    common = dict(vectorstore=tiny_vectorstore, allowed_cities={"Gif-sur-Yvette"}, k_final=3, max_distance=1e9)
+    expected = ScoredFilteredRetriever(metadata_index=meta, **common).retrieve("conférence numéro 2")
+
+    before = RETRIEVAL_STATS.snapshot()
+    kept = ScoredFilteredRetriever(k_fetch=2, **common).retrieve("conférence numéro 2")
+    after = RETRIEVAL_STATS.snapshot()
+
+    # k_fetch=2 ne suffit pas: élargissements successifs jusqu'à retrouver le top-3 exact
+    assert [d.metadata["uid"] for d, _ in kept] == [d.metadata["uid"] for d, _ in expected]
+    assert after["widened"] == before["widened"] + 1
+    assert after["searches"] > before["searches"] + 1
+
+
+def test_relaxed_threshold_reuses_first_search(tiny_vectorstore):
+    before = RETRIEVAL_STATS.snapshot()
+    # seuil très bas: rien ne passe, et aucun candidat plus lointain ne pourrait passer
+    kept = ScoredFilteredRetriever(vectorstore=tiny_vectorstore, k_fetch=4, max_distance=0.0).retrieve("atelier")
+    after = RETRIEVAL_STATS.snapshot()
+
+    assert kept == []
+    assert after["searches"] == before["searches"] + 1
+    assert after["relaxed"] == before["relaxed"] + 1
+    assert after["widened"] == before["widened"]